@@ -1,14 +1,31 @@
 import uuid
-from fastapi import APIRouter, Request, BackgroundTasks, Query, HTTPException, Depends
-from fastapi.responses import FileResponse
-import os
+import asyncio
+import json
+from fastapi import APIRouter, Request, Query, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import HttpUrl, Field, BaseModel
 from typing import Optional
-from models.schemas import ApiResponse
-from database.operations import create_download_record, get_download_progress
-from services.info_service import get_video_info
-from services.download_service import download_video
+from models.schemas import ApiResponse, BatchInfoRequest
+from database.operations import get_download_progress, get_cache_stats
+from database.cache_maintenance import get_cache_maintenance
+from database.progress_buffer import get_progress_buffer
+from services.info_service import (
+    get_video_info_async, get_info_flight_stats, get_info_refresh_stats, get_info_executor_stats
+)
+from services.batch_service import stream_batch_info
+from services.playlist_service import get_playlist_page_async, resolve_playlist_entries
+from services.download_queue import get_download_queue
+from services.download_pipeline import get_download_pipeline
+from services.download_service import audio_format_spec
+from services.artifact_store import get_artifact_store
+from services.bandwidth import get_bandwidth_scheduler
+from services.progress_stream import ProgressSubscription, stream_progress_sse, get_stream_connections
 from utils.proxy_manager import get_proxy
+from utils.bounded_executor import QueueFullError
+from utils.client_identity import client_identity, is_api_key_client
+from utils.resolved_info import get_resolved_info_store
+from utils.ydl_pool import get_ydl_pool
+from utils.startup_profiler import get_startup_profiler
 import config
 
 router = APIRouter()
@@ -16,6 +33,10 @@ router = APIRouter()
 class DownloadOptions(BaseModel):
     """Yuklash uchun qo'shimcha parametrlar"""
     use_proxy: Optional[bool] = Field(True, description="Proxy ishlatish")
+    audio_format: Optional[str] = Field(
+        "mp3", description="MP3 sifati uchun: mp3 yoki original (m4a/opus, qayta kodlashsiz)"
+    )
+    audio_bitrate: Optional[int] = Field(None, description="MP3 bitreyti (kbit/s)")
 
 
 # ----- YOUTUBE ENDPOINTLARI -----
@@ -31,12 +52,24 @@ async def get_youtube_info_route(request: Request, url: HttpUrl):
                 error="URL youtube.com yoki youtu.be dan bo'lishi kerak"
             )
         
-        video_info = get_video_info(str(url))
+        video_info = await get_video_info_async(str(url))
         return ApiResponse(
             status=True,
             message="Video ma'lumotlari muvaffaqiyatli olindi",
             data=video_info
         )
+    except asyncio.TimeoutError:
+        return ApiResponse(
+            status=False,
+            message="Video ma'lumotlarini olish vaqti tugadi",
+            error=f"{config.INFO_TIMEOUT} sekund ichida javob olinmadi"
+        )
+    except QueueFullError as e:
+        return ApiResponse(
+            status=False,
+            message="Server band, keyinroq urinib ko'ring",
+            error=str(e)
+        )
     except Exception as e:
         return ApiResponse(
             status=False,
@@ -44,11 +77,67 @@ async def get_youtube_info_route(request: Request, url: HttpUrl):
             error=str(e)
         )
 
+@router.get("/youtube/playlist", response_model=ApiResponse, tags=["YouTube"])
+@config.limiter.limit("10/minute")
+async def get_youtube_playlist_route(
+    request: Request,
+    url: HttpUrl,
+    cursor: Optional[str] = Query(None, description="Oldingi sahifadagi next_cursor"),
+    limit: Optional[int] = Query(None, description="Sahifadagi yozuvlar soni"),
+    resolve: bool = Query(False, description="Yozuvlar uchun formatlarni ham olish")
+):
+    try:
+        page = await get_playlist_page_async(str(url), cursor, limit)
+        if resolve:
+            page = await resolve_playlist_entries(page)
+        
+        return ApiResponse(
+            status=True,
+            message="Playlist ma'lumotlari olindi",
+            data=page
+        )
+    except asyncio.TimeoutError:
+        return ApiResponse(
+            status=False,
+            message="Playlist ma'lumotlarini olish vaqti tugadi",
+            error=f"{config.INFO_TIMEOUT} sekund ichida javob olinmadi"
+        )
+    except QueueFullError as e:
+        return ApiResponse(
+            status=False,
+            message="Server band, keyinroq urinib ko'ring",
+            error=str(e)
+        )
+    except Exception as e:
+        return ApiResponse(
+            status=False,
+            message="Playlist ma'lumotlarini olishda xatolik",
+            error=str(getattr(e, "detail", e))
+        )
+
+@router.post("/youtube/batch", response_model=None, tags=["YouTube"])
+@config.limiter.limit("5/minute")
+async def get_youtube_batch_info_route(request: Request, batch: BatchInfoRequest):
+    """
+    Bir nechta URL uchun ma'lumotlarni NDJSON oqimi sifatida qaytarish
+    (har bir URL uchun bitta qator, tayyor bo'lishi bilan)
+    """
+    if not batch.urls or len(batch.urls) > config.BATCH_MAX_URLS:
+        return ApiResponse(
+            status=False,
+            message="Noto'g'ri URL lar ro'yxati",
+            error=f"1 dan {config.BATCH_MAX_URLS} tagacha URL yuborish mumkin"
+        )
+    
+    return StreamingResponse(
+        stream_batch_info(batch.urls),
+        media_type="application/x-ndjson"
+    )
+
 @router.post("/youtube/download", response_model=ApiResponse, tags=["YouTube"])
 @config.limiter.limit("3/minute")
 async def download_youtube_video_route(
     request: Request,
-    background_tasks: BackgroundTasks,
     url: HttpUrl,
     format_id: str,
     options: Optional[DownloadOptions] = None
@@ -63,26 +152,31 @@ async def download_youtube_video_route(
         
         download_id = str(uuid.uuid4())
         
-        create_download_record(download_id, str(url), format_id)
-        
         use_proxy = options.use_proxy if options else True
         
-        background_tasks.add_task(
-            download_video, 
-            download_id, 
-            str(url), 
-            format_id=format_id, 
-            use_proxy=use_proxy
+        queue_status = get_download_queue().enqueue(
+            download_id,
+            str(url),
+            format_id=format_id,
+            use_proxy=use_proxy,
+            client_id=client_identity(request)
         )
         
         return ApiResponse(
             status=True,
-            message="Yuklash boshlandi",
+            message="Yuklash navbatga qo'shildi",
             data={
                 "download_id": download_id,
-                "using_proxy": use_proxy
+                "using_proxy": use_proxy,
+                **queue_status
             }
         )
+    except QueueFullError as e:
+        return ApiResponse(
+            status=False,
+            message="Server band, keyinroq urinib ko'ring",
+            error=str(e)
+        )
     except Exception as e:
         return ApiResponse(
             status=False,
@@ -94,7 +188,6 @@ async def download_youtube_video_route(
 @config.limiter.limit("3/minute")
 async def download_youtube_by_quality_route(
     request: Request,
-    background_tasks: BackgroundTasks,
     url: HttpUrl,
     quality: str = Query(..., description="Sifatni tanlang", enum=config.SUPPORTED_QUALITIES),
     options: Optional[DownloadOptions] = None
@@ -109,27 +202,48 @@ async def download_youtube_by_quality_route(
         
         download_id = str(uuid.uuid4())
         
-        create_download_record(download_id, str(url), "", quality)
-        
         use_proxy = options.use_proxy if options else True
         
-        background_tasks.add_task(
-            download_video, 
-            download_id, 
-            str(url), 
-            quality=quality, 
-            use_proxy=use_proxy
+        audio_format = None
+        if quality == "MP3":
+            requested_format = (options.audio_format if options else None) or "mp3"
+            bitrate = options.audio_bitrate if options else None
+            if requested_format not in config.AUDIO_FORMATS or \
+                    (bitrate is not None and bitrate not in config.AUDIO_MP3_BITRATES):
+                return ApiResponse(
+                    status=False,
+                    message="Noto'g'ri audio formati",
+                    error=f"audio_format: {', '.join(config.AUDIO_FORMATS)}; "
+                          f"audio_bitrate: {', '.join(map(str, config.AUDIO_MP3_BITRATES))}"
+                )
+            audio_format = audio_format_spec(requested_format, bitrate)
+        
+        queue_status = get_download_queue().enqueue(
+            download_id,
+            str(url),
+            quality=quality,
+            use_proxy=use_proxy,
+            audio_format=audio_format,
+            client_id=client_identity(request)
         )
         
         return ApiResponse(
             status=True,
-            message=f"{quality} sifatda yuklash boshlandi",
+            message=f"{quality} sifatda yuklash navbatga qo'shildi",
             data={
                 "download_id": download_id, 
                 "quality": quality,
-                "using_proxy": use_proxy
+                "audio_format": audio_format,
+                "using_proxy": use_proxy,
+                **queue_status
             }
         )
+    except QueueFullError as e:
+        return ApiResponse(
+            status=False,
+            message="Server band, keyinroq urinib ko'ring",
+            error=str(e)
+        )
     except Exception as e:
         return ApiResponse(
             status=False,
@@ -137,6 +251,97 @@ async def download_youtube_by_quality_route(
             error=str(e)
         )
 
+def _parse_download_ids(ids: str) -> list:
+    # Tartib saqlanadi, takrorlar tashlanadi
+    return list(dict.fromkeys(item.strip() for item in ids.split(",") if item.strip()))
+
+# /youtube/progress/{download_id} dan oldin: aks holda "stream" ID deb qabul qilinadi
+@router.get("/youtube/progress/stream", tags=["YouTube"])
+@config.limiter.limit("10/minute")
+async def stream_download_progress_route(
+    request: Request,
+    ids: str = Query(..., description="Vergul bilan ajratilgan download_id lar")
+):
+    """
+    Yuklash progressi Server-Sent Events orqali: 'progress', 'final' (completed/error),
+    'missing' va oxirida 'done' hodisalari
+    """
+    download_ids = _parse_download_ids(ids)
+    if not download_ids or len(download_ids) > config.PROGRESS_STREAM_MAX_IDS:
+        return ApiResponse(
+            status=False,
+            message="Noto'g'ri ID lar ro'yxati",
+            error=f"1 dan {config.PROGRESS_STREAM_MAX_IDS} tagacha download_id yuborish mumkin"
+        )
+    
+    return StreamingResponse(
+        stream_progress_sse(download_ids, client_identity(request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/youtube/progress/ws")
+async def progress_websocket_route(websocket: WebSocket, ids: str = ""):
+    """
+    Yuklash progressi WebSocket orqali: ID lar query da yoki
+    {"subscribe": [...]} / {"unsubscribe": [...]} xabarlari bilan beriladi
+
+    Bitta IP yoki API kalitdan PROGRESS_STREAM_MAX_CONNECTIONS dan ortiq ulanish
+    xato kadri bilan yopiladi (slowapi WebSocket ni cheklamaydi).
+    """
+    await websocket.accept()
+    client = client_identity(websocket)
+    connections = get_stream_connections()
+    if not connections.acquire(client):
+        await websocket.send_json({"event": "error", "error": f"Ochiq ulanishlar juda ko'p ({connections.max_per_client})"})
+        await websocket.close(code=1008)
+        return
+    
+    subscription = ProgressSubscription(until_done=False)
+    subscription.add(_parse_download_ids(ids))
+    
+    # Xato kadrlari qabul qiluvchi taskdan ham yuboriladi: yuborishlar ketma-ket bo'lishi uchun
+    send_lock = asyncio.Lock()
+    
+    async def send(frame: dict):
+        async with send_lock:
+            await websocket.send_json(frame)
+    
+    async def receive_commands():
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    await send({"event": "error", "error": "Xabar JSON obyekt bo'lishi kerak"})
+                    continue
+                subscribe = message.get("subscribe", [])
+                unsubscribe = message.get("unsubscribe", [])
+                if not all(isinstance(requested, list) and all(isinstance(item, str) for item in requested)
+                           for requested in (subscribe, unsubscribe)):
+                    await send({"event": "error", "error": "subscribe va unsubscribe satrlar ro'yxati bo'lishi kerak"})
+                    continue
+                subscription.add(subscribe)
+                subscription.remove(unsubscribe)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            subscription.close()
+    
+    receiver = asyncio.create_task(receive_commands())
+    try:
+        async for event, payload in subscription.events():
+            await send({"event": event, **payload})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        subscription.close()
+        connections.release(client)
+
 @router.get("/youtube/progress/{download_id}", response_model=ApiResponse, tags=["YouTube"])
 @config.limiter.limit("30/minute")
 async def get_download_progress_route(request: Request, download_id: str):
@@ -150,6 +355,17 @@ async def get_download_progress_route(request: Request, download_id: str):
                 error=f"{download_id} ID bilan yuklash topilmadi"
             )
         
+        if progress.get('status') == 'queued':
+            # Ergashuvchi yuklash uchun yetakchining navbatdagi o'rni
+            queue_id = progress.get('leader_id') or download_id
+            progress.update(get_download_queue().queue_status(queue_id) or {})
+        
+        if progress.get('status') not in ('completed', 'error'):
+            # Tarmoq, ffmpeg va yakunlash bosqichlaridagi navbat chuqurligi
+            progress['stage_depth'] = get_download_queue().stage_depth()
+            # Tarmoqdan yuklayotgan bo'lsa, tarmoq kengligidagi joriy ulushi
+            progress['bandwidth'] = get_bandwidth_scheduler().allocation(progress.get('leader_id') or download_id)
+        
         return ApiResponse(
             status=True,
             message="Yuklash holati olindi",
@@ -202,19 +418,78 @@ async def get_proxy_status_route(request: Request):
             error=str(e)
         )
 
+@router.get("/youtube/clients/usage", response_model=ApiResponse, tags=["YouTube"])
+@config.limiter.limit("30/minute")
+async def get_client_usage_route(request: Request, all_clients: bool = False):
+    """
+    Mijoz bo'yicha yuklash hisoblagichlari, navbatdagi/faol vazifalar va kvotalar
+
+    all_clients=true faqat ma'lum X-API-Key bilan barcha mijozlarni qaytaradi
+    (identifikatorlarda IP manzillar bor), aks holda faqat so'rov yuborgan mijoz
+    """
+    try:
+        client = client_identity(request)
+        queue = get_download_queue()
+        show_all = all_clients and is_api_key_client(client)
+        usage = await asyncio.to_thread(queue.client_usage, None if show_all else client)
+        return ApiResponse(
+            status=True,
+            message="Mijozlar statistikasi olindi",
+            data={"client": client, "usage": usage}
+        )
+    except Exception as e:
+        return ApiResponse(
+            status=False,
+            message="Mijozlar statistikasini olishda xatolik",
+            error=str(e)
+        )
+
+@router.get("/youtube/stats", response_model=ApiResponse, tags=["YouTube"])
+@config.limiter.limit("10/minute")
+async def get_youtube_stats_route(request: Request):
+    try:
+        return ApiResponse(
+            status=True,
+            message="Statistika olindi",
+            data={
+                "info_singleflight": get_info_flight_stats(),
+                "info_cache_memory": get_cache_stats(),
+                "info_cache_db": get_cache_maintenance().stats(),
+                "info_refresh": get_info_refresh_stats(),
+                "info_executor": get_info_executor_stats(),
+                "resolved_info": get_resolved_info_store().stats(),
+                "ydl_pool": get_ydl_pool().stats(),
+                "startup": get_startup_profiler().report(top=10),
+                "download_queue": get_download_queue().stats(),
+                "download_pipeline": get_download_pipeline().stats(),
+                "download_progress": get_progress_buffer().stats(),
+                "progress_streams": get_stream_connections().stats(),
+                "download_bandwidth": get_bandwidth_scheduler().stats(),
+                "artifacts": get_artifact_store().stats()
+            }
+        )
+    except Exception as e:
+        return ApiResponse(
+            status=False,
+            message="Statistikani olishda xatolik",
+            error=str(e)
+        )
+
 @router.get("/downloads/{filename}", response_model=None, tags=["YouTube"])
 @config.limiter.limit("10/minute")
 async def get_downloaded_file_route(request: Request, filename: str):
-    file_path = os.path.join(config.DOWNLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+    # Alias fayl omboridagi yo'lga aylantiriladi (eski fayllar ham topiladi)
+    resolved = get_artifact_store().resolve(filename)
+    if resolved is None:
         return ApiResponse(
             status=False,
             message="Fayl topilmadi",
             error=f"{filename} fayli mavjud emas"
         )
     
+    file_path, download_name = resolved
     return FileResponse(
         path=file_path,
-        filename=filename,
+        filename=download_name,
         media_type="application/octet-stream"
     )
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Kesh qiymatlari formatlarini solishtirish: hajm va o'qish (decode) vaqti
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_payload_codec
+"""
+import json
+import random
+import time
+import zlib
+
+from utils import payload_codec
+from utils.payload_codec import FORMAT_ZLIB, FORMAT_ZSTD, FORMAT_ZSTD_DICT, zstandard
+
+QUALITIES = ["MP3", "144p", "240p", "360p", "480p", "720p", "1080p", "2K", "4K"]
+WORDS = ("video official music live remix subscribe channel new episode full hd "
+         "instagram telegram follow links description song lyrics podcast").split()
+
+
+def _synthetic_payloads(count: int = 300) -> list:
+    """Kesh jadvali bo'sh bo'lsa, get_video_info natijasiga o'xshash namunalar"""
+    rng = random.Random(42)
+    payloads = []
+    for i in range(count):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(300, 2500)))
+        payloads.append({
+            "url": f"https://www.youtube.com/watch?v={i:011d}",
+            "title": " ".join(rng.choice(WORDS) for _ in range(8)).title(),
+            "description": description,
+            "duration": rng.randint(30, 7200),
+            "thumbnail": f"https://i.ytimg.com/vi/{i:011d}/maxresdefault.jpg",
+            "author": rng.choice(WORDS).title(),
+            "view_count": rng.randint(0, 10 ** 9),
+            "like_count": rng.randint(0, 10 ** 7),
+            "formats": [
+                {"format_id": str(rng.randint(130, 400)), "quality": q,
+                 "ext": "m4a" if q == "MP3" else "mp4", "filesize": rng.randint(10 ** 5, 10 ** 9)}
+                for q in QUALITIES
+            ],
+        })
+    return payloads
+
+
+def _load_payloads() -> list:
+    try:
+        samples = payload_codec.sample_payloads_from_cache()
+    except Exception:
+        samples = []
+    if len(samples) >= 50:
+        return [json.loads(s) for s in samples]
+    return _synthetic_payloads()
+
+
+def _time_decode(values, decode, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            decode(value)
+        best = min(best, time.perf_counter() - started)
+    return best / len(values) * 1e6
+
+
+def main():
+    payloads = _load_payloads()
+    train, test = payloads[::2], payloads[1::2]
+
+    variants = {"json matn (hozirgi)": [json.dumps(p) for p in test]}
+
+    compact = [json.dumps(p, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for p in test]
+    variants["zlib"] = [bytes([FORMAT_ZLIB]) + zlib.compress(raw, 6) for raw in compact]
+
+    if zstandard is not None:
+        level = payload_codec.config.CACHE_COMPRESSION_LEVEL
+        plain = zstandard.ZstdCompressor(level=level)
+        variants["zstd"] = [bytes([FORMAT_ZSTD]) + plain.compress(raw) for raw in compact]
+
+        samples = [json.dumps(p, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for p in train]
+        dictionary = zstandard.ZstdCompressionDict(payload_codec.train_dictionary(samples))
+        # Benchmark lug'ati ishlayotgan lug'atni almashtirmasligi uchun vaqtincha o'rnatiladi
+        payload_codec._zstd_dict, payload_codec._dict_loaded = dictionary, True
+        with_dict = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+        variants["zstd + lug'at"] = [bytes([FORMAT_ZSTD_DICT]) + with_dict.compress(raw) for raw in compact]
+    else:
+        print("zstandard o'rnatilmagan: faqat zlib solishtiriladi")
+
+    baseline = sum(len(v) for v in variants["json matn (hozirgi)"]) / len(test)
+    print(f"Namunalar: {len(test)} (o'rgatish uchun: {len(train)})")
+    header = ("format", "o'rtacha hajm", "nisbat", "decode, mks")
+    print(f"{header[0]:<22}{header[1]:>16}{header[2]:>10}{header[3]:>14}")
+    for name, values in variants.items():
+        avg_size = sum(len(v) for v in values) / len(values)
+        decode_us = _time_decode(values, payload_codec.decode_payload)
+        print(f"{name:<22}{avg_size:>16.0f}{avg_size / baseline:>10.2f}{decode_us:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
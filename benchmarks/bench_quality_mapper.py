@@ -0,0 +1,151 @@
+"""
+Sifat bo'yicha formatlarni guruhlash: eski if/elif + sort va yangi jadvalli usul
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_quality_mapper [korpus.json ...]
+
+Korpus - format ro'yxatlari: [{"duration": ..., "formats": [...]}, ...].
+Haqiqiy ro'yxatlarni `yt-dlp -J <url>` natijasidan qo'shish mumkin.
+"""
+import json
+import os
+import sys
+import time
+
+from utils.quality_mapper import build_quality_formats, map_resolution_to_standard
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "format_lists.json")
+
+
+def legacy_map_resolution_to_standard(format_data):
+    """Oldingi if/elif zanjiri (solishtirish uchun o'zgarishsiz)"""
+    resolution = format_data.get('resolution')
+    format_note = format_data.get('format_note', '')
+    height = format_data.get('height')
+
+    if format_data.get('vcodec') == 'none' and format_data.get('acodec') != 'none':
+        return "MP3"
+
+    if height is not None:
+        if height <= 144:
+            return "144p"
+        elif height <= 240:
+            return "240p"
+        elif height <= 360:
+            return "360p"
+        elif height <= 480:
+            return "480p"
+        elif height <= 720:
+            return "720p"
+        elif height <= 1080:
+            return "1080p"
+        elif height <= 1440:
+            return "2K"
+        elif height <= 2160:
+            return "4K"
+
+    for text in (format_note, resolution):
+        if isinstance(text, str) and text:
+            if '144p' in text:
+                return "144p"
+            elif '240p' in text:
+                return "240p"
+            elif '360p' in text:
+                return "360p"
+            elif '480p' in text:
+                return "480p"
+            elif '720p' in text:
+                return "720p"
+            elif '1080p' in text:
+                return "1080p"
+            elif '1440p' in text or '2k' in text.lower():
+                return "2K"
+            elif '2160p' in text or '4k' in text.lower():
+                return "4K"
+    return None
+
+
+def legacy_build_quality_formats(formats, duration=None):
+    """Oldingi get_video_info ichidagi sort + bir nechta o'tishli tanlov"""
+    seen_qualities = set()
+    result = []
+    quality_order = {
+        "MP3": 0, "144p": 1, "240p": 2, "360p": 3, "480p": 4,
+        "720p": 5, "1080p": 6, "2K": 7, "4K": 8
+    }
+    sorted_formats = sorted(
+        formats,
+        key=lambda x: (
+            0 if x.get("acodec") != "none" and x.get("vcodec") != "none" else 1,
+            -(x.get("height") or 0)
+        )
+    )
+    for format_data in sorted_formats:
+        quality = legacy_map_resolution_to_standard(format_data)
+        if quality is None or quality in seen_qualities:
+            continue
+        filesize = format_data.get("filesize")
+        if filesize is None:
+            filesize = format_data.get("file_size")
+        if filesize is None:
+            filesize = format_data.get("filesize_approx")
+        if filesize is None and duration and format_data.get("tbr"):
+            filesize = int((format_data.get("tbr", 0) * duration * 1000) / 8)
+        result.append({
+            "format_id": format_data.get("format_id"),
+            "quality": quality,
+            "ext": format_data.get("ext", ""),
+            "filesize": filesize
+        })
+        seen_qualities.add(quality)
+    return sorted(result, key=lambda x: quality_order.get(x["quality"], 999))
+
+
+def _load_corpus(paths):
+    corpus = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        corpus.extend(data if isinstance(data, list) else [data])
+    return [item for item in corpus if item.get("formats")]
+
+
+def _best_time(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in corpus:
+            fn(item["formats"], item.get("duration"))
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv):
+    corpus = _load_corpus(argv or [DEFAULT_CORPUS])
+    format_count = sum(len(item["formats"]) for item in corpus)
+
+    # 1) Natijalar bir xilligini tekshirish
+    mismatches = 0
+    for item in corpus:
+        for format_data in item["formats"]:
+            if map_resolution_to_standard(format_data) != legacy_map_resolution_to_standard(format_data):
+                mismatches += 1
+        if build_quality_formats(item["formats"], item.get("duration")) != \
+                legacy_build_quality_formats(item["formats"], item.get("duration")):
+            mismatches += 1
+
+    # 2) Tezlikni o'lchash
+    repeat = 200
+    legacy = _best_time(legacy_build_quality_formats, corpus, repeat)
+    current = _best_time(build_quality_formats, corpus, repeat)
+
+    print(f"Korpus: {len(corpus)} video, {format_count} format")
+    print(f"Farqlar: {mismatches}")
+    print(f"Eski usul:  {legacy / len(corpus) * 1e6:8.1f} mks/video")
+    print(f"Yangi usul: {current / len(corpus) * 1e6:8.1f} mks/video")
+    print(f"Tezlashish: {legacy / current:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+"""
+YoutubeDL ni har so'rovda qurish va havzadan olishni solishtirish
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_ydl_pool
+"""
+import copy
+import time
+
+from yt_dlp import YoutubeDL
+
+from utils.ydl_pool import PROFILES, YdlPool
+
+# Profil va shu profil bilan odatda beriladigan format
+CASES = (
+    ("info", None),
+    ("probe", "best[height<=720][height>480]"),
+    ("download", "137+140/137+bestaudio/best"),
+)
+
+
+def _fresh(profile: str, ydl_format):
+    params = copy.deepcopy(PROFILES[profile])
+    if ydl_format:
+        params['format'] = ydl_format
+    # Tarmoq so'rovidan oldin yt-dlp baribir quradigan qismlar ham hisobga olinadi
+    with YoutubeDL(params) as ydl:
+        ydl.cookiejar
+        ydl._request_director
+
+
+def _pooled(pool: YdlPool, profile: str, ydl_format):
+    with pool.checkout(profile, format=ydl_format, progress_hooks=[lambda d: None]) as ydl:
+        ydl.cookiejar
+        ydl._request_director
+
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main(repeat: int = 20):
+    pool = YdlPool()
+    header = ("profil", "yangi, ms", "havza, ms", "tejash, ms")
+    print(f"{header[0]:<16}{header[1]:>12}{header[2]:>12}{header[3]:>12}")
+    for profile, ydl_format in CASES:
+        fresh_ms = _time(lambda: _fresh(profile, ydl_format), repeat)
+        _pooled(pool, profile, ydl_format)  # birinchi qurilish hisobga olinmaydi
+        pooled_ms = _time(lambda: _pooled(pool, profile, ydl_format), repeat)
+        print(f"{profile:<16}{fresh_ms:>12.2f}{pooled_ms:>12.3f}{fresh_ms - pooled_ms:>12.2f}")
+
+    print(pool.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import os
 from slowapi import Limiter
-from slowapi.util import get_remote_address
+from utils.client_identity import rate_limit_key
 
 DB_PATH = "database/video_api.sql"
 
@@ -10,7 +10,124 @@ os.makedirs("database", exist_ok=True)
 
 CACHE_TIMEOUT = 3600  # 1 soat
 
-limiter = Limiter(key_func=get_remote_address)
+# Stale-while-revalidate: CACHE_TIMEOUT (soft TTL) o'tgach eski ma'lumot darhol
+# qaytariladi va fonda yangilanadi, CACHE_HARD_TIMEOUT dan keyin esa kutiladi
+CACHE_STALE_WHILE_REVALIDATE = True
+CACHE_HARD_TIMEOUT = 6 * 3600  # 6 soat
+
+# SQLite kesh jadvali chegaralari va fondagi tozalovchi
+CACHE_MAX_ROWS = 50000
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+CACHE_SWEEP_INTERVAL = 600  # sekund
+CACHE_SWEEP_BATCH = 500  # bitta tranzaksiyada o'chiriladigan yozuvlar
+CACHE_VACUUM_PAGES = 2000  # bitta incremental_vacuum da qaytariladigan sahifalar
+
+# Kesh qiymatlarini siqish (zstandard o'rnatilgan bo'lsa zstd, aks holda zlib)
+CACHE_COMPRESSION_LEVEL = 6
+CACHE_ZSTD_DICT_PATH = "database/cache_payload.dict"
+
+# Jarayon ichidagi kesh (SQLite keshi oldida)
+MEMORY_CACHE_MAX_ENTRIES = 1000
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+
+# Yuklash progressi xotirada yig'iladi va shu oraliqda bazaga yoziladi (yakuniy holatlar darhol)
+PROGRESS_FLUSH_INTERVAL = 1.0  # sekund
+
+# Progress oqimi (SSE / WebSocket)
+PROGRESS_STREAM_FPS = 2  # bitta ulanishga sekundiga yuboriladigan kadrlar
+PROGRESS_STREAM_MAX_IDS = 50  # bitta ulanishda kuzatiladigan yuklashlar
+PROGRESS_STREAM_RESYNC = 15  # sekund; yangilanish bo'lmasa, holat qayta o'qiladi (keep-alive ham)
+PROGRESS_STREAM_MAX_CONNECTIONS = 5  # bitta IP yoki API kalitdan bir vaqtda ochiq SSE/WebSocket ulanishlari
+
+# Video ma'lumotlarini olish uchun alohida pool (event loop bloklanmasligi uchun)
+INFO_POOL_WORKERS = 8
+INFO_QUEUE_MAX = 200
+INFO_TIMEOUT = 30  # sekund
+
+# extract_info natijasini info -> format tanlash -> yuklash orasida qayta ishlatish
+RESOLVED_INFO_MAX_ENTRIES = 200
+RESOLVED_INFO_DEFAULT_TTL = 1800  # URL larda muddat topilmasa (sekund)
+RESOLVED_INFO_MAX_TTL = 4 * 3600
+RESOLVED_INFO_SAFETY_MARGIN = 600  # imzo muddati tugashidan oldin zaxira (sekund)
+
+# Qayta ishlatiladigan YoutubeDL obyektlari (profil va proxy bo'yicha)
+YDL_POOL_MAX_IDLE_PER_KEY = 4
+YDL_POOL_MAX_IDLE = 32
+
+# Ishga tushish: lifespan ichida qizdirish va vaqt byudjeti
+WARMUP_ENABLED = True
+WARMUP_EXTRACTORS = ("Youtube", "YoutubeTab")
+WARMUP_YDL_PROFILES = {"info": 2, "probe": 1, "playlist": 1, "download": 3}
+WARMUP_CACHE_PRELOAD = 500  # xotiraga oldindan yuklanadigan kesh yozuvlari
+STARTUP_BUDGET_SECONDS = 10.0
+
+# Yuklangan fayllar ombori: kalit bo'yicha nomlanadi va LRU tartibida o'chiriladi
+ARTIFACT_MAX_BYTES = 20 * 1024 * 1024 * 1024  # 20 GB
+ARTIFACT_MIN_FREE_BYTES = 2 * 1024 * 1024 * 1024  # diskda kamida 2 GB bo'sh joy
+ARTIFACT_SWEEP_INTERVAL = 300  # sekund
+
+# Yuklash navbati (downloads jadvali asosida)
+DOWNLOAD_WORKERS = 3  # bir vaqtda ishlaydigan yuklashlar
+DOWNLOAD_QUEUE_MAX = 500  # navbatda kutishi mumkin bo'lgan yuklashlar
+DOWNLOAD_POLL_INTERVAL = 5  # boshqa jarayon qo'shgan vazifalarni tekshirish (sekund)
+# Kichik qiymat - oldinroq; audio va kichik sifatlar katta videolardan oldin
+DOWNLOAD_PRIORITY = {
+    "MP3": 0, "144p": 1, "240p": 1, "360p": 1, "480p": 2,
+    "720p": 2, "1080p": 3, "2K": 4, "4K": 4,
+}
+DOWNLOAD_DEFAULT_PRIORITY = 2  # format_id bilan yuklash
+DOWNLOAD_PRIORITY_AGING = 300  # har 300 sekund kutish bitta sinfga teng (och qolmaslik uchun)
+DOWNLOAD_HEAVY_PRIORITY = 3  # shu sinfdan boshlab og'ir yuklash hisoblanadi
+DOWNLOAD_MAX_HEAVY = 1  # bir vaqtda ishlaydigan og'ir yuklashlar
+DOWNLOAD_DEFAULT_DURATION = 60  # o'rtacha yuklash vaqti hali ma'lum bo'lmasa (sekund)
+# Qayta ishga tushganda uzilgan yuklashlarni .part fayllardan davom ettirish
+DOWNLOAD_RESUME_MAX_AGE = 6 * 3600  # bundan eski qisman fayllar tashlab yuboriladi (sekund)
+DOWNLOAD_MAX_RESUMES = 3  # bitta yuklash necha marta davom ettiriladi
+# Mijozlar: API kalit (X-API-Key) -> mijoz nomi, muhitdan "kalit:nom,kalit2:nom2" ko'rinishida.
+# Kalitsiz so'rovlar X-Client-Id sarlavhasi (IP bilan birga) yoki IP bo'yicha ajratiladi
+API_KEYS = dict(
+    item.split(":", 1) for item in os.getenv("API_KEYS", "").split(",") if ":" in item
+)
+# Bir mijozning bir vaqtda tarmoqdan yuklanayotgan va navbatda turgan vazifalari
+DOWNLOAD_CLIENT_MAX_ACTIVE = 2
+DOWNLOAD_CLIENT_MAX_QUEUED = 50
+# Bitta IP yoki API kalit ostidagi barcha X-Client-Id lar uchun umumiy chegara
+DOWNLOAD_GROUP_MAX_ACTIVE = 4
+DOWNLOAD_GROUP_MAX_QUEUED = 100
+# mijoz yoki guruh -> chegaralar, masalan {"key:bot": {"group_max_active": 8, "group_max_queued": 500}}
+DOWNLOAD_CLIENT_QUOTAS = {}
+# Mijozlar orasida deficit round-robin: har navbatda mijozga qo'shiladigan kredit va vazifa narxi (sinf bo'yicha)
+DOWNLOAD_DRR_QUANTUM = 2
+DOWNLOAD_DRR_COST = {0: 1, 1: 1, 2: 2, 3: 4, 4: 8}
+# Tarmoq kengligi (bayt/sekund, 0 - cheklanmagan): umumiy chegara faol yuklashlar orasida vazn bo'yicha bo'linadi
+DOWNLOAD_BANDWIDTH_BPS = 0
+DOWNLOAD_BANDWIDTH_BURST = 4 * 1024 * 1024  # token bucket hajmi (bayt)
+DOWNLOAD_JOB_MAX_BPS = 0  # bitta yuklash chegarasi
+DOWNLOAD_CLASS_MAX_BPS = {}  # navbat sinfi -> shu sinfdagi yuklashlar jami chegarasi, masalan {4: 5 * 1024 * 1024}
+DOWNLOAD_BANDWIDTH_WEIGHTS = {0: 4, 1: 3, 2: 2, 3: 1, 4: 1}  # navbat sinfi -> ulush vazni (MP3 4K dan 4 barobar)
+# Yuklash bosqichlari: tarmoq (navbat ishchilari) -> ffmpeg (jarayonlar havzasi) -> yakunlash
+DOWNLOAD_CONVERT_WORKERS = os.cpu_count() or 1  # parallel ffmpeg jarayonlari (yadrolar soni)
+DOWNLOAD_CONVERT_QUEUE_MAX = 200  # ffmpeg bosqichida kutishi mumkin bo'lgan vazifalar
+DOWNLOAD_FINALIZE_WORKERS = 2
+FFMPEG_PATH = "ffmpeg"
+# Bitta ffmpeg ishlatadigan threadlar: jarayonlar o'zaro yadrolar uchun kurashmasligi uchun
+FFMPEG_THREADS = max(1, (os.cpu_count() or 1) // DOWNLOAD_CONVERT_WORKERS)
+
+# MP3 sifatidagi audio: "original" - m4a/opus qayta kodlashsiz, "mp3" - bitreyt bo'yicha o'giriladi.
+# Natija (video, bitreyt) bo'yicha omborda saqlanadi; yuklangan original ham keyingi bitreytlar uchun qoladi
+AUDIO_FORMATS = ("mp3", "original")
+AUDIO_MP3_BITRATES = (128, 192, 320)
+AUDIO_DEFAULT_BITRATE = 192
+
+# Bir nechta URL uchun ma'lumot olish (batch)
+BATCH_MAX_URLS = 200
+BATCH_CONCURRENCY = 8  # bitta batch uchun parallel extract_info soni
+
+# Playlist va kanallarni sahifalab olish
+PLAYLIST_PAGE_SIZE = 50
+PLAYLIST_MAX_PAGE_SIZE = 200
+
+limiter = Limiter(key_func=rate_limit_key)
 
 SUPPORTED_QUALITIES = ["144p", "240p", "360p", "480p", "720p", "1080p", "2K", "4K", "MP3"]
 
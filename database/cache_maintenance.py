@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from typing import Optional
+from database.connection import get_db_connection
+from database.operations import flush_cache_access_times, get_cache_hard_timeout
+import config
+
+logger = logging.getLogger('cache_maintenance')
+
+
+class CacheMaintenance:
+    """
+    Kesh jadvalini tartibda saqlash tizimi:
+    - Muddati o'tgan yozuvlarni partiyalab o'chirish
+    - Yozuvlar soni/hajmi chegarasidan oshsa, eng uzoq ishlatilmaganlarini chiqarish
+    - Bo'shagan sahifalarni incremental VACUUM bilan qaytarish
+    """
+
+    def __init__(self, interval: int = config.CACHE_SWEEP_INTERVAL, batch_size: int = config.CACHE_SWEEP_BATCH,
+                 max_rows: int = config.CACHE_MAX_ROWS, max_bytes: int = config.CACHE_MAX_BYTES):
+        """
+        :param interval: Tozalash oralig'i (sekundda)
+        :param batch_size: Bitta tranzaksiyada o'chiriladigan yozuvlar soni
+        :param max_rows: Jadvaldagi maksimal yozuvlar soni
+        :param max_bytes: Jadvaldagi ma'lumotlarning maksimal hajmi (bayt)
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "runs": 0,
+            "expired_deleted": 0,
+            "evicted": 0,
+            "access_times_flushed": 0,
+            "vacuum_pages_freed": 0,
+            "rows": 0,
+            "bytes": 0,
+            "file_bytes": 0,
+            "free_pages": 0,
+            "last_run": None,
+            "last_duration": None,
+        }
+
+    def start(self):
+        """Fondagi tozalovchini ishga tushirish"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._sweeper_thread, daemon=True)
+        self._thread.start()
+
+    def _sweeper_thread(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Keshni tozalashda xatolik: {str(e)}")
+            time.sleep(self.interval)
+
+    def run_once(self) -> dict:
+        """Bitta to'liq tozalash sikli"""
+        started = time.time()
+
+        flushed = flush_cache_access_times()
+        expired = self._delete_expired()
+        evicted = self._enforce_budget()
+        freed = self._incremental_vacuum()
+        snapshot = self._measure()
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["access_times_flushed"] += flushed
+            self._stats["expired_deleted"] += expired
+            self._stats["evicted"] += evicted
+            self._stats["vacuum_pages_freed"] += freed
+            self._stats.update(snapshot)
+            self._stats["last_run"] = started
+            self._stats["last_duration"] = round(time.time() - started, 4)
+
+        if expired or evicted:
+            logger.info(f"Kesh tozalandi: {expired} muddati o'tgan, {evicted} chiqarilgan")
+
+        return self.stats()
+
+    def _delete_batches(self, select_sql: str, params: tuple, limit: Optional[int] = None) -> int:
+        """select_sql qaytargan rowid larni partiyalab o'chirish (qisqa yozish bloklari)"""
+        deleted = 0
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            while limit is None or deleted < limit:
+                batch = self.batch_size if limit is None else min(self.batch_size, limit - deleted)
+                cursor.execute(
+                    f"DELETE FROM cache WHERE rowid IN ({select_sql} LIMIT ?)",
+                    params + (batch,)
+                )
+                conn.commit()
+                if cursor.rowcount <= 0:
+                    break
+                deleted += cursor.rowcount
+        finally:
+            conn.close()
+        return deleted
+
+    def _delete_expired(self) -> int:
+        cutoff = time.time() - get_cache_hard_timeout()
+        return self._delete_batches("SELECT rowid FROM cache WHERE timestamp < ?", (cutoff,))
+
+    def _enforce_budget(self) -> int:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache")
+        rows, total_bytes = cursor.fetchone()
+        conn.close()
+
+        excess_rows = max(rows - self.max_rows, 0)
+        if total_bytes > self.max_bytes and rows:
+            # Hajm bo'yicha oshib ketgan qismni o'rtacha yozuv hajmi orqali baholaymiz
+            avg_size = total_bytes / rows
+            excess_rows = max(excess_rows, int((total_bytes - self.max_bytes) / avg_size) + 1)
+
+        if not excess_rows:
+            return 0
+
+        return self._delete_batches(
+            "SELECT rowid FROM cache ORDER BY last_access ASC", (), limit=excess_rows
+        )
+
+    def _incremental_vacuum(self) -> int:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA freelist_count")
+            before = cursor.fetchone()[0]
+            if not before:
+                return 0
+            # executescript pragma ni oxirigacha bajaradi (execute faqat bitta qadam qiladi)
+            conn.executescript(f"PRAGMA incremental_vacuum({int(config.CACHE_VACUUM_PAGES)});")
+            cursor.execute("PRAGMA freelist_count")
+            after = cursor.fetchone()[0]
+            return before - after
+        finally:
+            conn.close()
+
+    def _measure(self) -> dict:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache")
+        rows, total_bytes = cursor.fetchone()
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        free_pages = cursor.fetchone()[0]
+        conn.close()
+
+        return {
+            "rows": rows,
+            "bytes": total_bytes,
+            "file_bytes": page_count * page_size,
+            "free_pages": free_pages,
+        }
+
+    def stats(self) -> dict:
+        """Kesh hajmi va tozalash metrikalari"""
+        with self._lock:
+            return dict(self._stats, max_rows=self.max_rows, max_bytes=self.max_bytes)
+
+
+# Singleton instance
+_cache_maintenance = None
+
+def get_cache_maintenance() -> CacheMaintenance:
+    """CacheMaintenance singleton olish"""
+    global _cache_maintenance
+
+    if _cache_maintenance is None:
+        _cache_maintenance = CacheMaintenance()
+
+    return _cache_maintenance
@@ -6,6 +6,13 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
+def _add_column_if_missing(cursor, table, column, definition):
+    """Eski bazalar uchun jadvalga yangi ustun qo'shish"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = {row['name'] for row in cursor.fetchall()}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
 def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -25,17 +32,100 @@ def init_db():
         filename TEXT,
         error_message TEXT,
         created_at TEXT NOT NULL,
-        updated_at TEXT NOT NULL
+        updated_at TEXT NOT NULL,
+        video_key TEXT,
+        selected_quality TEXT,
+        priority INTEGER DEFAULT 0,
+        use_proxy INTEGER DEFAULT 1,
+        queued_at REAL,
+        started_at REAL,
+        finished_at REAL,
+        dedup_key TEXT,
+        leader_id TEXT,
+        owner TEXT,
+        resume_count INTEGER DEFAULT 0,
+        stage TEXT,
+        stage_timings TEXT,
+        pp_path TEXT,
+        audio_format TEXT,
+        cache_hit TEXT,
+        convert_seconds REAL,
+        client_id TEXT
     )
     ''')
     
+    _add_column_if_missing(cursor, 'downloads', 'video_key', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'selected_quality', 'TEXT')
+    # Yuklash navbati uchun
+    _add_column_if_missing(cursor, 'downloads', 'priority', 'INTEGER DEFAULT 0')
+    _add_column_if_missing(cursor, 'downloads', 'use_proxy', 'INTEGER DEFAULT 1')
+    _add_column_if_missing(cursor, 'downloads', 'queued_at', 'REAL')
+    _add_column_if_missing(cursor, 'downloads', 'started_at', 'REAL')
+    _add_column_if_missing(cursor, 'downloads', 'finished_at', 'REAL')
+    # Bir xil yuklashlarni birlashtirish: ergashuvchi yozuvlar yetakchiga bog'lanadi
+    _add_column_if_missing(cursor, 'downloads', 'dedup_key', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'leader_id', 'TEXT')
+    # Uzilgan yuklashlarni tiklash: qaysi jarayon bajarayotgani va necha marta davom ettirilgani
+    _add_column_if_missing(cursor, 'downloads', 'owner', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'resume_count', 'INTEGER DEFAULT 0')
+    # Bosqichli yuklash: joriy bosqich (fetch/convert/done) va har bosqich vaqtlari (JSON)
+    _add_column_if_missing(cursor, 'downloads', 'stage', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'stage_timings', 'TEXT')
+    # ffmpeg yo'li: direct / remux / transcode
+    _add_column_if_missing(cursor, 'downloads', 'pp_path', 'TEXT')
+    # Audio profili (original / mp3-<bitreyt>), kesh natijasi (output / source) va ffmpeg vaqti
+    _add_column_if_missing(cursor, 'downloads', 'audio_format', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'cache_hit', 'TEXT')
+    _add_column_if_missing(cursor, 'downloads', 'convert_seconds', 'REAL')
+    # So'rov yuborgan mijoz (API kalit, X-Client-Id yoki IP): mijozlar orasida navbat adolati va kvotalar
+    _add_column_if_missing(cursor, 'downloads', 'client_id', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_downloads_video_key ON downloads (video_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads (status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_downloads_dedup_key ON downloads (dedup_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_downloads_leader_id ON downloads (leader_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_downloads_client_status ON downloads (client_id, status)')
+    
+    # Yuklangan fayllar ombori (alias - /downloads/{filename} dagi nom)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS artifacts (
+        key TEXT PRIMARY KEY,
+        alias TEXT UNIQUE NOT NULL,
+        path TEXT NOT NULL,
+        video_key TEXT,
+        profile TEXT,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        title TEXT
+    )
+    ''')
+    # Keshdagi fayldan yangi artefakt yasalganda alias uchun
+    _add_column_if_missing(cursor, 'artifacts', 'title', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_artifacts_last_access ON artifacts (last_access)')
+    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS cache (
         url TEXT PRIMARY KEY,
         data TEXT NOT NULL,
-        timestamp REAL NOT NULL
+        timestamp REAL NOT NULL,
+        last_access REAL,
+        size INTEGER
     )
     ''')
     
+    # Kesh tozalovchisi uchun: oxirgi murojaat vaqti va yozuv hajmi
+    _add_column_if_missing(cursor, 'cache', 'last_access', 'REAL')
+    _add_column_if_missing(cursor, 'cache', 'size', 'INTEGER')
+    cursor.execute('UPDATE cache SET last_access = timestamp, size = length(data) WHERE size IS NULL')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_timestamp ON cache (timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache (last_access)')
+    
     conn.commit()
+    
+    # Bo'shagan sahifalarni bosqichma-bosqich qaytarish uchun (bir marta VACUUM kerak)
+    cursor.execute('PRAGMA auto_vacuum')
+    if cursor.fetchone()[0] != 2:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+    
     conn.close()
\ No newline at end of file
@@ -1,10 +1,78 @@
 from datetime import datetime
 import json
+import logging
+import threading
 import time
 from database.connection import get_db_connection
+from database.progress_buffer import get_progress_buffer
+from utils.url_canonical import cache_key
+from utils.memory_cache import MemoryCache
+from utils.payload_codec import encode_payload, decode_payload
 import config
 
-def create_download_record(download_id, url, format_id, quality=None):
+logger = logging.getLogger('operations')
+
+# Eng ko'p so'raladigan videolar uchun SQLite ga murojaat qilmaslik
+_memory_cache = MemoryCache(
+    max_entries=config.MEMORY_CACHE_MAX_ENTRIES,
+    max_bytes=config.MEMORY_CACHE_MAX_BYTES,
+    ttl=max(config.CACHE_TIMEOUT, config.CACHE_HARD_TIMEOUT)
+)
+
+# Kesh o'qishlarida last_access ni har safar yozmaslik uchun:
+# murojaat vaqtlari yig'iladi va tozalovchi ularni bitta tranzaksiyada yozadi
+_access_lock = threading.Lock()
+_access_times = {}
+
+def _touch_cache_key(key):
+    with _access_lock:
+        _access_times[key] = time.time()
+
+def flush_cache_access_times():
+    """Yig'ilgan murojaat vaqtlarini cache.last_access ga yozish"""
+    global _access_times
+    with _access_lock:
+        pending, _access_times = _access_times, {}
+    
+    if not pending:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany(
+        'UPDATE cache SET last_access = ? WHERE url = ?',
+        [(accessed_at, key) for key, accessed_at in pending.items()]
+    )
+    
+    conn.commit()
+    conn.close()
+    
+    return len(pending)
+
+def get_cache_hard_timeout():
+    """Kesh yozuvi umuman ishlatilmaydigan muddat (sekundda)"""
+    if config.CACHE_STALE_WHILE_REVALIDATE:
+        return max(config.CACHE_TIMEOUT, config.CACHE_HARD_TIMEOUT)
+    return config.CACHE_TIMEOUT
+
+# Ergashuvchi yuklash yetakchidan oladigan maydonlar
+_FOLLOWER_FIELDS = (
+    'status', 'progress', 'eta', 'speed', 'downloaded_bytes', 'total_bytes', 'filename',
+    'error_message', 'format_id', 'selected_quality', 'started_at', 'finished_at', 'stage', 'stage_timings',
+    'pp_path',
+)
+
+# Progress javoblarida (so'rov, SSE, WebSocket) tashqariga berilmaydigan maydonlar:
+# client_id - so'rov yuborgan mijozning IP manzili yoki API kalit nomi
+_PRIVATE_FIELDS = ('client_id',)
+
+# Yetakchi hali tugamagan holatlar ('processing' - fayllar yuklangan, ffmpeg bosqichi davom etmoqda;
+# 'finished' - eski yozuvlar uchun)
+_IN_FLIGHT_STATUSES = ('queued', 'starting', 'downloading', 'finished', 'processing')
+
+def create_download_record(download_id, url, format_id, quality=None, status='pending', priority=0, use_proxy=True,
+                           dedup_key=None, leader_id=None, audio_format=None, client_id=None):
     """Ma'lumotlar bazasida yangi yuklash yozuvini yaratish"""
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -12,69 +80,148 @@ def create_download_record(download_id, url, format_id, quality=None):
     now = datetime.now().isoformat()
     
     cursor.execute('''
-    INSERT INTO downloads (id, url, format_id, quality, status, created_at, updated_at)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (download_id, url, format_id, quality, 'pending', now, now))
+    INSERT INTO downloads (id, url, format_id, quality, status, created_at, updated_at, video_key,
+                           priority, use_proxy, queued_at, dedup_key, leader_id, audio_format, client_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (download_id, url, format_id, quality, status, now, now, cache_key(url),
+          priority, int(use_proxy), time.time(), dedup_key, leader_id, audio_format, client_id))
     
     conn.commit()
     conn.close()
 
 def update_download_progress(download_id, **kwargs):
+    """Progress hook yangilanishlari xotirada yig'iladi, qolganlari darhol yoziladi (ProgressBuffer)"""
+    get_progress_buffer().update(download_id, kwargs)
+
+def _read_download(download_id):
+    # Progress yozayotgan yuklash xotiradan, qolganlari bazadan
+    record = get_progress_buffer().get(download_id)
+    if record is not None:
+        return record
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    update_fields = []
-    params = []
+    cursor.execute('SELECT * FROM downloads WHERE id = ?', (download_id,))
+    record = cursor.fetchone()
     
-    for key, value in kwargs.items():
-        if key != 'id':
-            update_fields.append(f"{key} = ?")
-            params.append(value)
+    conn.close()
     
-    update_fields.append("updated_at = ?")
-    params.append(datetime.now().isoformat())
+    return dict(record) if record else None
+
+def get_download_progress(download_id):
+    progress = _read_download(download_id)
+    if progress is None:
+        return None
     
-    params.append(download_id)
+    if progress['status'] == 'following':
+        leader = _read_download(progress['leader_id'])
+        if leader is not None:
+            # Ergashuvchi o'z ID si bilan yetakchining joriy holatini ko'radi
+            progress.update({field: leader[field] for field in _FOLLOWER_FIELDS})
     
-    sql = f"UPDATE downloads SET {', '.join(update_fields)} WHERE id = ?"
-    cursor.execute(sql, params)
+    for field in _PRIVATE_FIELDS:
+        progress.pop(field, None)
     
-    conn.commit()
-    conn.close()
+    if progress.get('stage_timings'):
+        progress['stage_timings'] = json.loads(progress['stage_timings'])
+    
+    return progress
 
-def get_download_progress(download_id):
+def find_dedup_leader(dedup_key, in_flight=True):
+    """
+    Shu kalit bilan yetakchi yuklashni topish
+    
+    :param in_flight: True - davom etayotgani, False - muvaffaqiyatli tugagani
+    :return: downloads yozuvi yoki None
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM downloads WHERE id = ?', (download_id,))
+    statuses = _IN_FLIGHT_STATUSES if in_flight else ('completed',)
+    cursor.execute(f'''
+    SELECT * FROM downloads
+    WHERE dedup_key = ? AND leader_id IS NULL AND status IN ({', '.join('?' * len(statuses))})
+    ORDER BY created_at DESC
+    LIMIT 1
+    ''', (dedup_key,) + statuses)
     record = cursor.fetchone()
     
     conn.close()
     
-    if not record:
-        return None
+    return dict(record) if record else None
+
+def finish_followers(leader_id):
+    """Yetakchi tugagach, ergashuvchi yozuvlarga yakuniy holatni yozish"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM downloads WHERE id = ?', (leader_id,))
+    leader = cursor.fetchone()
+    
+    updated = 0
+    if leader is not None:
+        assignments = ', '.join(f"{field} = ?" for field in _FOLLOWER_FIELDS)
+        cursor.execute(
+            f"UPDATE downloads SET {assignments}, updated_at = ? WHERE leader_id = ? AND status = 'following'",
+            [leader[field] for field in _FOLLOWER_FIELDS] + [datetime.now().isoformat(), leader_id]
+        )
+        updated = cursor.rowcount
+        conn.commit()
+    
+    conn.close()
+    
+    return updated
+
+def detach_evicted_files(filenames):
+    """Ombordan o'chirilgan fayllarga ishora qiluvchi yuklash yozuvlaridan fayl nomini olib tashlash"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    return dict(record)
+    cursor.executemany(
+        "UPDATE downloads SET filename = NULL, error_message = ?, updated_at = ? WHERE filename = ?",
+        [("Fayl disk kvotasi sababli o'chirildi, qayta yuklang", datetime.now().isoformat(), filename)
+         for filename in filenames]
+    )
+    updated = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return updated
 
-def save_to_cache(url, data):
+def save_to_cache(key, data):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    json_data = json.dumps(data)
+    payload, raw_size = encode_payload(data)
+    timestamp = time.time()
     
     cursor.execute('''
-    INSERT OR REPLACE INTO cache (url, data, timestamp)
-    VALUES (?, ?, ?)
-    ''', (url, json_data, time.time()))
+    INSERT OR REPLACE INTO cache (url, data, timestamp, last_access, size)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (key, payload, timestamp, timestamp, len(payload)))
     
     conn.commit()
     conn.close()
+    
+    _memory_cache.set(key, data, raw_size, timestamp)
 
-def get_from_cache(url):
+def get_cache_entry(key):
+    """
+    Kesh yozuvini vaqt belgisi bilan olish (hard TTL ichida)
+    
+    :return: (data, timestamp) yoki None
+    """
+    entry = _memory_cache.get_entry(key)
+    if entry is not None:
+        _touch_cache_key(key)
+        return entry
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT data, timestamp FROM cache WHERE url = ?', (url,))
+    cursor.execute('SELECT data, timestamp FROM cache WHERE url = ?', (key,))
     record = cursor.fetchone()
     
     conn.close()
@@ -82,10 +229,64 @@ def get_from_cache(url):
     if not record:
         return None
     
-    if time.time() - record['timestamp'] > config.CACHE_TIMEOUT:
+    if time.time() - record['timestamp'] > get_cache_hard_timeout():
+        return None
+    
+    try:
+        data, raw_size = decode_payload(record['data'])
+    except Exception as e:
+        # O'qib bo'lmaydigan yozuv (masalan, lug'at almashgan) - kesh yo'q deb hisoblanadi
+        logger.warning(f"Kesh yozuvini o'qib bo'lmadi: {key}, Xatolik: {str(e)}")
         return None
     
-    return json.loads(record['data'])
+    _memory_cache.set(key, data, raw_size, record['timestamp'])
+    _touch_cache_key(key)
+    
+    return data, record['timestamp']
+
+def get_from_cache(key):
+    """Faqat yangi (soft TTL ichidagi) kesh ma'lumotini olish"""
+    entry = get_cache_entry(key)
+    if entry is None:
+        return None
+    
+    data, timestamp = entry
+    if time.time() - timestamp > config.CACHE_TIMEOUT:
+        return None
+    
+    return data
+
+def preload_memory_cache(limit):
+    """
+    Oxirgi ishlatilgan kesh yozuvlarini xotiraga oldindan yuklash
+    
+    :return: Yuklangan yozuvlar soni
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT url, data, timestamp FROM cache WHERE timestamp >= ? ORDER BY last_access DESC LIMIT ?',
+        (time.time() - get_cache_hard_timeout(), limit)
+    )
+    records = cursor.fetchall()
+    
+    conn.close()
+    
+    loaded = 0
+    for record in records:
+        try:
+            data, raw_size = decode_payload(record['data'])
+        except Exception:
+            continue
+        _memory_cache.set(record['url'], data, raw_size, record['timestamp'])
+        loaded += 1
+    
+    return loaded
+
+def get_cache_stats():
+    """Xotiradagi kesh statistikasi (hit/miss/eviction)"""
+    return _memory_cache.stats()
 
 def clear_cache_db():
     """Barcha kesh yozuvlarini tozalash"""
@@ -95,4 +296,6 @@ def clear_cache_db():
     cursor.execute('DELETE FROM cache')
     
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+    
+    _memory_cache.clear()
\ No newline at end of file
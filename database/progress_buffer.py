@@ -0,0 +1,210 @@
+from datetime import datetime
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from database.connection import get_db_connection
+import config
+
+logger = logging.getLogger('progress_buffer')
+
+# yt-dlp progress hook yozadigan maydonlar: faqat shulardan iborat yangilanishlar xotirada yig'iladi
+_BUFFERED_FIELDS = frozenset({'status', 'progress', 'eta', 'speed', 'downloaded_bytes', 'total_bytes', 'filename'})
+_BUFFERED_STATUSES = ('downloading', 'finished')
+
+
+class ProgressBuffer:
+    """
+    Yuklash progressining xotiradagi reyestri:
+    - progress hook yangilanishlari faqat xotiradagi yozuvni o'zgartiradi,
+      fon thread o'zgarganlarini har PROGRESS_FLUSH_INTERVAL da bitta tranzaksiyada yozadi
+    - Yakuniy holatlar (completed, error) va boshqa barcha yangilanishlar darhol yoziladi,
+      shu yozuvning yozilmagan progressi ham birga yoziladi
+    - get() davom etayotgan yuklash holatini bazaga murojaat qilmasdan qaytaradi
+    - Har bir yangilanish obunachilarga (progress oqimlari) download_id bilan xabar qilinadi
+    """
+
+    def __init__(self, interval: float = config.PROGRESS_FLUSH_INTERVAL):
+        """
+        :param interval: Yig'ilgan progressni bazaga yozish oralig'i (sekundda)
+        """
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        # Yozilayotgan partiya va darhol yozish tartibini saqlaydi: eski progress yakuniy holat ustiga yozilmaydi
+        self._write_lock = threading.Lock()
+        self._records: Dict[str, dict] = {}
+        self._dirty: Dict[str, dict] = {}
+        self._thread = None
+        # Yangilanishda chaqiriladigan funksiyalar (yozishda nusxalanadi, o'qish qulfsiz)
+        self._listeners: List[Callable[[str], None]] = []
+
+        self.updates = 0
+        self.buffered = 0
+        self.written_through = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.reads_from_memory = 0
+
+    def start(self):
+        """Fondagi yozuvchini ishga tushirish"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._flusher_thread, daemon=True)
+        self._thread.start()
+
+    def _flusher_thread(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Yuklash progressini yozishda xatolik: {str(e)}")
+
+    def subscribe(self, listener: Callable[[str], None]):
+        """Yangilanishlarni kuzatish (listener yuklash threadida chaqiriladi, tez bo'lishi kerak)"""
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def unsubscribe(self, listener: Callable[[str], None]):
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item is not listener]
+
+    def _publish(self, download_id: str):
+        for listener in self._listeners:
+            try:
+                listener(download_id)
+            except Exception as e:
+                logger.warning(f"Progress obunachisida xatolik: {str(e)}")
+
+    @staticmethod
+    def _bufferable(fields: dict) -> bool:
+        return fields.keys() <= _BUFFERED_FIELDS and fields.get('status', 'downloading') in _BUFFERED_STATUSES
+
+    def update(self, download_id: str, fields: dict):
+        """Yuklash yozuvini yangilash (progress - xotirada, qolganlari - darhol bazaga)"""
+        bufferable = self._bufferable(fields)
+        fields = dict(fields, updated_at=datetime.now().isoformat())
+        with self._lock:
+            self.updates += 1
+
+        if bufferable:
+            if download_id not in self._records:
+                record = self._load(download_id)
+                if record is None:
+                    # Yozuv bazada yo'q: UPDATE hech narsa qilmaydi, xotirada ham saqlanmaydi
+                    return
+                with self._lock:
+                    self._records.setdefault(download_id, record)
+            with self._lock:
+                record = self._records.get(download_id)
+                if record is not None:
+                    record.update(fields)
+                    self._dirty.setdefault(download_id, {}).update(fields)
+                    self.buffered += 1
+            if record is not None:
+                self._publish(download_id)
+                return
+
+        with self._write_lock:
+            with self._lock:
+                pending = self._dirty.pop(download_id, {})
+                # Holat bazada o'zgaradi (navbat ishchisi ham to'g'ridan-to'g'ri yozadi): xotiradagi nusxa eskiradi
+                self._records.pop(download_id, None)
+                self.written_through += 1
+            pending.update(fields)
+            conn = get_db_connection()
+            try:
+                self._write(conn.cursor(), download_id, pending)
+                conn.commit()
+            finally:
+                conn.close()
+        self._publish(download_id)
+
+    @staticmethod
+    def _load(download_id: str) -> Optional[dict]:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM downloads WHERE id = ?', (download_id,))
+            record = cursor.fetchone()
+        finally:
+            conn.close()
+        return dict(record) if record else None
+
+    @staticmethod
+    def _write(cursor, download_id: str, fields: dict):
+        fields = {key: value for key, value in fields.items() if key != 'id'}
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        cursor.execute(f"UPDATE downloads SET {assignments} WHERE id = ?", list(fields.values()) + [download_id])
+
+    def flush(self) -> int:
+        """
+        Yig'ilgan progressni bitta tranzaksiyada yozish
+
+        :return: Yozilgan yozuvlar soni
+        """
+        with self._write_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return 0
+
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                for download_id, fields in pending.items():
+                    self._write(cursor, download_id, fields)
+                conn.commit()
+            except Exception:
+                # Yozilmagan progress keyingi safar (yangiroq qiymatlar ustun) yoziladi
+                with self._lock:
+                    for download_id, fields in pending.items():
+                        self._dirty[download_id] = dict(fields, **self._dirty.get(download_id, {}))
+                raise
+            finally:
+                conn.close()
+
+        with self._lock:
+            self.flushes += 1
+            self.rows_flushed += len(pending)
+        return len(pending)
+
+    def get(self, download_id: str) -> Optional[dict]:
+        """Xotiradagi yozuv nusxasi (yuklash hozir progress yozmayotgan bo'lsa None)"""
+        with self._lock:
+            record = self._records.get(download_id)
+            if record is None:
+                return None
+            self.reads_from_memory += 1
+            return dict(record)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "tracked": len(self._records),
+                "pending": len(self._dirty),
+                "updates": self.updates,
+                "buffered": self.buffered,
+                "written_through": self.written_through,
+                "flushes": self.flushes,
+                "rows_flushed": self.rows_flushed,
+                # Bazaga yozilmasdan ustma-ust tushgan yangilanishlar
+                "coalesced": max(self.buffered - self.rows_flushed - len(self._dirty), 0),
+                "reads_from_memory": self.reads_from_memory,
+                "subscribers": len(self._listeners),
+            }
+
+
+# Singleton instance
+_progress_buffer = None
+
+def get_progress_buffer() -> ProgressBuffer:
+    """ProgressBuffer singleton olish"""
+    global _progress_buffer
+
+    if _progress_buffer is None:
+        _progress_buffer = ProgressBuffer()
+
+    return _progress_buffer
@@ -1,3 +1,9 @@
+# Import vaqtlarini o'lchash boshqa importlardan oldin yoqiladi
+from utils.startup_profiler import get_startup_profiler
+get_startup_profiler().install()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,9 +12,16 @@ import os
 
 # Ma'lumotlar bazasini ishga tushirish
 from database.connection import init_db
+from database.cache_maintenance import get_cache_maintenance
+from database.progress_buffer import get_progress_buffer
 from models.schemas import ApiResponse
+from services.warmup import run_warmup
+from services.download_queue import get_download_queue
+from services.download_pipeline import get_download_pipeline
+from services.artifact_store import get_artifact_store
 
 # Config va Limiter import qilish
+import config
 from config import limiter
 from slowapi.errors import RateLimitExceeded
 
@@ -19,11 +32,47 @@ from api.youtube import router as youtube_router
 os.makedirs("downloads", exist_ok=True)
 os.makedirs("database", exist_ok=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """So'rovlarni qabul qilishdan oldin bazani tayyorlash va qizdirish"""
+    profiler = get_startup_profiler()
+    
+    # Ma'lumotlar bazasini ishga tushirish
+    with profiler.phase("init_db"):
+        init_db()
+    
+    # Kesh jadvalini fonda tozalab turish
+    get_cache_maintenance().start()
+    
+    # Yuklash progressini partiyalab yozish
+    get_progress_buffer().start()
+    
+    # Yuklangan fayllar kvotasini fonda nazorat qilish
+    get_artifact_store().start()
+    
+    # Yuklash navbati ishchilari (oldingi ishga tushirishdan qolgan navbat ham olinadi)
+    with profiler.phase("download_recovery"):
+        get_download_queue().recover()
+    get_download_queue().start()
+    
+    if config.WARMUP_ENABLED:
+        await asyncio.to_thread(run_warmup)
+    
+    profiler.finish(config.STARTUP_BUDGET_SECONDS)
+    yield
+    
+    # ffmpeg jarayonlarini to'xtatish ('processing' yozuvlar keyingi ishga tushishda tiklanadi)
+    get_download_pipeline().shutdown()
+    
+    # Xotirada qolgan progressni yozib qo'yish
+    get_progress_buffer().flush()
+
 # FastAPI appni ishga tushirish
 app = FastAPI(
     title="Tez Yuklash API",
     description="Ijtimoiy tarmoqlardan video va audio yuklash yoki ma'lumot olish uchun API.",
-    version="1.0.1"
+    version="1.0.1",
+    lifespan=lifespan
 )
 
 @app.get("/", response_model=ApiResponse, tags=["Asosiy"])
@@ -51,9 +100,6 @@ app.state.limiter = limiter
 # Routerlarni qo'shish
 app.include_router(youtube_router)
 
-# Ma'lumotlar bazasini ishga tushirish
-init_db()
-
 # ----- XATO QAYTA ISHLASH -----
 
 @app.exception_handler(Exception)
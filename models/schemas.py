@@ -24,6 +24,9 @@ class VideoInfo(BaseModel):
     like_count: Optional[int] = None
     formats: Optional[List[FormatInfo]] = None
 
+class BatchInfoRequest(BaseModel):
+    urls: List[str] = Field(..., description="YouTube URL lar ro'yxati")
+
 class DownloadProgress(BaseModel):
     id: str
     url: str
@@ -0,0 +1,362 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from yt_dlp.utils import sanitize_filename
+from database.connection import get_db_connection
+from database.operations import detach_evicted_files
+import config
+
+logger = logging.getLogger('artifact_store')
+
+
+class ArtifactStore:
+    """
+    Yuklangan fayllar ombori:
+    - Fayl nomi (video, sifat/format, postprocessing profili) kalitidan olinadi,
+      shuning uchun turli videolar nomi to'qnashmaydi
+    - Fayllar kalit xeshi bo'yicha ichki papkalarga bo'linadi (ab/cd/<xesh>.<ext>)
+    - /downloads/{filename} uchun o'qiladigan alias saqlanadi
+    - Disk kvotasi yoki bo'sh joy chegarasi buzilsa, eng uzoq ishlatilmaganlari o'chiriladi
+      (davom etayotgan yuklashlar o'qiydigan fayllar pin() bilan himoyalanadi)
+    """
+
+    def __init__(self, root: str = config.DOWNLOAD_DIR, max_bytes: int = config.ARTIFACT_MAX_BYTES,
+                 min_free_bytes: int = config.ARTIFACT_MIN_FREE_BYTES,
+                 interval: int = config.ARTIFACT_SWEEP_INTERVAL):
+        """
+        :param root: Fayllar saqlanadigan papka
+        :param max_bytes: Ombordagi fayllarning maksimal umumiy hajmi
+        :param min_free_bytes: Diskda qolishi kerak bo'lgan minimal bo'sh joy
+        :param interval: Fondagi tekshiruv oralig'i (sekundda)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._thread = None
+        # xesh -> pin() soni: o'chirilmaydigan fayllar
+        self._pinned: Dict[str, int] = {}
+        self.registered = 0
+        self.served = 0
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.missing_removed = 0
+        self.stale_partials_removed = 0
+
+    @staticmethod
+    def digest(artifact_key: str) -> str:
+        return hashlib.sha1(artifact_key.encode('utf-8')).hexdigest()
+
+    def output_base(self, artifact_key: str) -> str:
+        """Kalitga mos bo'lingan yo'l, kengaytmasiz (ab/cd/<xesh>)"""
+        digest = self.digest(artifact_key)
+        directory = os.path.join(self.root, digest[:2], digest[2:4])
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, digest)
+
+    def output_template(self, artifact_key: str, part: Optional[str] = None) -> str:
+        """
+        yt-dlp outtmpl: kalitga mos bo'lingan yo'l, kengaytmani yt-dlp qo'yadi
+
+        :param part: Oraliq fayl qo'shimchasi (masalan, "f%(format_id)s" - alohida formatlar uchun)
+        """
+        base = self.output_base(artifact_key)
+        return f"{base}.{part}.%(ext)s" if part else f"{base}.%(ext)s"
+
+    def register(self, artifact_key: str, path: str, title: Optional[str] = None,
+                 video_key: Optional[str] = None, profile: Optional[str] = None) -> str:
+        """
+        Tayyor faylni omborga yozish
+
+        :return: /downloads/{filename} uchun alias
+        """
+        digest = self.digest(artifact_key)
+        ext = os.path.splitext(path)[1]
+        name = sanitize_filename(title or "", restricted=False) or digest[:12]
+        alias = f"{name} [{digest[:8]}]{ext}"
+        now = time.time()
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT path FROM artifacts WHERE key = ?', (digest,))
+        previous = cursor.fetchone()
+        cursor.execute('''
+        INSERT OR REPLACE INTO artifacts (key, alias, path, video_key, profile, size, created_at, last_access, title)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (digest, alias, path, video_key, profile, os.path.getsize(path), now, now, title))
+        conn.commit()
+        conn.close()
+
+        # Avval boshqa kengaytma bilan saqlangan fayl qolib ketmasligi uchun
+        if previous is not None and previous['path'] != path:
+            self._remove_file(previous['path'])
+
+        with self._lock:
+            self.registered += 1
+
+        # Hozirgina yozilgan fayl o'zi kvotadan katta bo'lsa ham o'chirilmaydi
+        self.enforce_quota(exclude=artifact_key)
+        return alias
+
+    def pin(self, artifact_key: str):
+        """Faylni kvota tozalashidan himoyalash (masalan, MP3 ga o'giriladigan original audio)"""
+        digest = self.digest(artifact_key)
+        with self._lock:
+            self._pinned[digest] = self._pinned.get(digest, 0) + 1
+
+    def unpin(self, artifact_key: str):
+        digest = self.digest(artifact_key)
+        with self._lock:
+            count = self._pinned.get(digest, 0) - 1
+            if count > 0:
+                self._pinned[digest] = count
+            else:
+                self._pinned.pop(digest, None)
+
+    def lookup(self, artifact_key: str, touch: bool = True) -> Optional[dict]:
+        """
+        Kalit bo'yicha tayyor faylni topish (fayli o'chirilgan yozuv hisobga olinmaydi)
+
+        :return: artifacts yozuvi (alias, path, title, ...) yoki None
+        """
+        digest = self.digest(artifact_key)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM artifacts WHERE key = ?', (digest,))
+        record = cursor.fetchone()
+        if record is not None and touch:
+            cursor.execute('UPDATE artifacts SET last_access = ? WHERE key = ?', (time.time(), digest))
+            conn.commit()
+        conn.close()
+
+        if record is None or not os.path.isfile(record['path']):
+            return None
+        return dict(record)
+
+    def _shard_dir(self, artifact_key: str) -> Tuple[str, str]:
+        digest = self.digest(artifact_key)
+        return os.path.join(self.root, digest[:2], digest[2:4]), digest
+
+    def partial_files(self, artifact_key: str) -> List[str]:
+        """Kalitga tegishli, lekin omborga yozilmagan fayllar (.part, alohida formatlar)"""
+        directory, digest = self._shard_dir(artifact_key)
+        if not os.path.isdir(directory):
+            return []
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT path FROM artifacts WHERE key = ?', (digest,))
+        record = cursor.fetchone()
+        conn.close()
+        registered = record['path'] if record else None
+
+        return [
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(f"{digest}.") and os.path.join(directory, name) != registered
+        ]
+
+    def discard_partials(self, artifact_key: str) -> int:
+        """Tashlab yuborilgan yuklashning qisman fayllarini o'chirish"""
+        paths = self.partial_files(artifact_key)
+        for path in paths:
+            self._remove_file(path)
+        return len(paths)
+
+    def resolve(self, filename: str, touch: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Alias bo'yicha fayl yo'lini topish
+
+        Omborga kirmagan eski fayllar (DOWNLOAD_DIR ildizida) ham qaytariladi.
+
+        :return: (fayl yo'li, yuklab olish nomi) yoki None
+        """
+        filename = os.path.basename(filename)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT key, path FROM artifacts WHERE alias = ?', (filename,))
+        record = cursor.fetchone()
+        if record is not None and os.path.isfile(record['path']):
+            if touch:
+                cursor.execute('UPDATE artifacts SET last_access = ? WHERE key = ?', (time.time(), record['key']))
+                conn.commit()
+            conn.close()
+            with self._lock:
+                self.served += touch
+            return record['path'], filename
+        conn.close()
+
+        legacy_path = os.path.join(self.root, filename)
+        if filename and os.path.isfile(legacy_path):
+            return legacy_path, filename
+        return None
+
+    def start(self):
+        """Fondagi kvota tekshiruvini ishga tushirish"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._sweeper_thread, daemon=True)
+        self._thread.start()
+
+    def _sweeper_thread(self):
+        while True:
+            try:
+                self._remove_missing()
+                self._remove_stale_partials()
+                self.enforce_quota()
+            except Exception as e:
+                logger.error(f"Fayl omborini tozalashda xatolik: {str(e)}")
+            time.sleep(self.interval)
+
+    def _remove_missing(self) -> int:
+        """Fayli qo'lda o'chirilgan yozuvlarni olib tashlash"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT key, path FROM artifacts')
+        missing = [(record['key'],) for record in cursor.fetchall() if not os.path.isfile(record['path'])]
+        if missing:
+            cursor.executemany('DELETE FROM artifacts WHERE key = ?', missing)
+            conn.commit()
+        conn.close()
+
+        with self._lock:
+            self.missing_removed += len(missing)
+        return len(missing)
+
+    def _remove_stale_partials(self) -> int:
+        """Omborga yozilmagan va DOWNLOAD_RESUME_MAX_AGE dan eski fayllarni o'chirish"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT path FROM artifacts')
+        registered = {record['path'] for record in cursor.fetchall()}
+        conn.close()
+
+        cutoff = time.time() - config.DOWNLOAD_RESUME_MAX_AGE
+        removed = 0
+        for directory, _, names in os.walk(self.root):
+            # Faqat ab/cd ko'rinishidagi ichki papkalar; ildizdagi eski fayllarga tegilmaydi
+            if os.path.relpath(directory, self.root).count(os.sep) != 1:
+                continue
+            for name in names:
+                path = os.path.join(directory, name)
+                if path in registered:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+
+        with self._lock:
+            self.stale_partials_removed += removed
+        return removed
+
+    def _free_bytes(self) -> int:
+        return shutil.disk_usage(self.root).free
+
+    def enforce_quota(self, exclude: Optional[str] = None) -> int:
+        """
+        Kvota yoki bo'sh joy chegarasi buzilgan bo'lsa, LRU tartibida o'chirish
+
+        Pin qilingan fayllar va exclude kaliti o'chirilmaydi; o'chirilgan fayl
+        nomi downloads yozuvlaridan ham olib tashlanadi.
+
+        :param exclude: O'chirilmaydigan kalit (hozirgina yozilgan fayl)
+        :return: O'chirilgan fayllar soni
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(SUM(size), 0) FROM artifacts')
+        total = cursor.fetchone()[0]
+
+        excess = max(total - self.max_bytes, self.min_free_bytes - self._free_bytes(), 0)
+        if excess <= 0:
+            conn.close()
+            return 0
+
+        with self._lock:
+            protected = set(self._pinned)
+        if exclude is not None:
+            protected.add(self.digest(exclude))
+
+        cursor.execute('SELECT key, alias, path, size FROM artifacts ORDER BY last_access ASC')
+        victims = []
+        for record in cursor.fetchall():
+            if excess <= 0:
+                break
+            if record['key'] in protected:
+                continue
+            victims.append(record)
+            excess -= record['size']
+
+        cursor.executemany('DELETE FROM artifacts WHERE key = ?', [(record['key'],) for record in victims])
+        conn.commit()
+        conn.close()
+
+        freed = 0
+        for record in victims:
+            self._remove_file(record['path'])
+            freed += record['size']
+        if victims:
+            detach_evicted_files([record['alias'] for record in victims])
+
+        with self._lock:
+            self.evicted += len(victims)
+            self.evicted_bytes += freed
+
+        if victims:
+            logger.info(f"Fayl omboridan {len(victims)} fayl o'chirildi ({freed} bayt)")
+        return len(victims)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Faylni o'chirib bo'lmadi: {path}, Xatolik: {str(e)}")
+
+    def stats(self) -> dict:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts')
+        count, total = cursor.fetchone()
+        conn.close()
+
+        with self._lock:
+            return {
+                "artifacts": count,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "free_bytes": self._free_bytes(),
+                "min_free_bytes": self.min_free_bytes,
+                "pinned": len(self._pinned),
+                "registered": self.registered,
+                "served": self.served,
+                "evicted": self.evicted,
+                "evicted_bytes": self.evicted_bytes,
+                "missing_removed": self.missing_removed,
+                "stale_partials_removed": self.stale_partials_removed,
+            }
+
+
+# Singleton instance
+_artifact_store = None
+
+def get_artifact_store() -> ArtifactStore:
+    """ArtifactStore singleton olish"""
+    global _artifact_store
+
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore()
+
+    return _artifact_store
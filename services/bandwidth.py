@@ -0,0 +1,180 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+import config
+
+
+class _Job:
+    def __init__(self, download_id: str, priority: int, weight: float, cap: float, params: dict):
+        self.download_id = download_id
+        self.priority = priority
+        self.weight = weight
+        self.cap = cap
+        # YoutubeDL.params: yuklovchi 'ratelimit' ni har blokda shu lug'atdan o'qiydi
+        self.params = params
+        self.allocated = math.inf
+        self.bytes = 0
+        self.started = time.monotonic()
+
+
+class BandwidthScheduler:
+    """
+    Navbat ishchilari orasida tarmoq kengligini taqsimlash:
+    - Faol yuklashlar sinf vazni bo'yicha adolatli ulush oladi (max-min): yuklash yoki
+      sinf chegarasiga yetganlardan qolgan ulush boshqalarga bo'linadi
+    - Ulush yt-dlp ning 'ratelimit' sozlamasiga yoziladi va har yuklash boshlanganda/tugaganda qayta hisoblanadi
+    - Umumiy chegara progress hookda token bucket bilan ham ushlanadi (ulushlar yig'indisi undan oshmaydi,
+      bucket - ratelimit hisobga olmaydigan yuklovchilar uchun)
+    """
+
+    def __init__(self, rate: int = config.DOWNLOAD_BANDWIDTH_BPS, burst: int = config.DOWNLOAD_BANDWIDTH_BURST,
+                 job_max: int = config.DOWNLOAD_JOB_MAX_BPS, class_max: Optional[Dict[int, int]] = None,
+                 weights: Optional[Dict[int, float]] = None):
+        """
+        :param rate: Umumiy chegara (bayt/sekund, 0 - cheklanmagan)
+        :param burst: Token bucket hajmi (bayt)
+        :param job_max: Bitta yuklash chegarasi (0 - cheklanmagan)
+        :param class_max: Navbat sinfi -> sinfdagi yuklashlar jami chegarasi
+        :param weights: Navbat sinfi -> vazn (ko'rsatilmagan sinf - 1)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.job_max = job_max
+        self.class_max = class_max if class_max is not None else config.DOWNLOAD_CLASS_MAX_BPS
+        self.weights = weights if weights is not None else config.DOWNLOAD_BANDWIDTH_WEIGHTS
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, _Job] = {}
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+
+        self.consumed_bytes = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.rebalances = 0
+
+    def register(self, download_id: str, priority: int, params: dict):
+        """Yuklash tarmoqqa chiqdi: ulushlar qayta hisoblanadi va params['ratelimit'] ga yoziladi"""
+        weight = self.weights.get(priority, 1)
+        job = _Job(download_id, priority, weight, self.job_max or math.inf, params)
+        with self._lock:
+            self._jobs[download_id] = job
+            self._rebalance()
+
+    def release(self, download_id: str):
+        with self._lock:
+            if self._jobs.pop(download_id, None) is not None:
+                self._rebalance()
+
+    def _rebalance(self):
+        # self._lock ushlab turilganda chaqiriladi.
+        # Progressive filling: barcha ochiq yuklashlar "vazn * daraja" oladi; daraja birinchi
+        # chegaraga (yuklash, sinf yoki umumiy) yetganda shu chegaradagilar qotiriladi.
+        remaining = self.rate if self.rate > 0 else math.inf
+        class_left = {priority: float(cap) for priority, cap in self.class_max.items() if cap > 0}
+        open_jobs = list(self._jobs.values())
+
+        while open_jobs:
+            level = remaining / sum(job.weight for job in open_jobs)
+            binding = None
+            for job in open_jobs:
+                if job.cap / job.weight < level:
+                    level, binding = job.cap / job.weight, [job]
+
+            class_weights = {}
+            for job in open_jobs:
+                if job.priority in class_left:
+                    class_weights[job.priority] = class_weights.get(job.priority, 0) + job.weight
+            for priority, weight in class_weights.items():
+                if class_left[priority] / weight < level:
+                    level = class_left[priority] / weight
+                    binding = [job for job in open_jobs if job.priority == priority]
+
+            if binding is None:
+                # Umumiy chegara (yoki hech qanday chegara) yetdi: qolganlarning hammasi shu darajada
+                for job in open_jobs:
+                    job.allocated = job.weight * level
+                break
+
+            for job in binding:
+                job.allocated = job.weight * level
+                remaining = max(remaining - job.allocated, 0.0)
+                if job.priority in class_left:
+                    class_left[job.priority] = max(class_left[job.priority] - job.allocated, 0.0)
+                open_jobs.remove(job)
+
+        for job in self._jobs.values():
+            job.params['ratelimit'] = max(int(job.allocated), 1) if math.isfinite(job.allocated) else None
+        self.rebalances += 1
+
+    def consume(self, download_id: str, nbytes: int):
+        """
+        Progress hookdan: yuklangan baytlarni umumiy bucketdan olish
+
+        Bucket bo'sh bo'lsa, chaqirgan (yuklash) thread yetishmagan baytlar tiklanguncha kutadi.
+        """
+        if nbytes <= 0:
+            return
+        with self._lock:
+            job = self._jobs.get(download_id)
+            if job is not None:
+                job.bytes += nbytes
+            self.consumed_bytes += nbytes
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._refilled) * self.rate, self.burst) - nbytes
+            self._refilled = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait > 0:
+                self.throttled += 1
+                self.throttled_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def allocation(self, download_id: str) -> Optional[dict]:
+        """Yuklashning joriy ulushi (progress ma'lumotlari uchun); tarmoqdan yuklamayotgan bo'lsa None"""
+        with self._lock:
+            job = self._jobs.get(download_id)
+            if job is None:
+                return None
+            elapsed = max(time.monotonic() - job.started, 1e-6)
+            return {
+                "allocated_bps": int(job.allocated) if math.isfinite(job.allocated) else None,
+                "weight": job.weight,
+                "priority": job.priority,
+                "average_bps": int(job.bytes / elapsed),
+                "active_jobs": len(self._jobs),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate_bps": self.rate or None,
+                "job_max_bps": self.job_max or None,
+                "class_max_bps": dict(self.class_max),
+                "weights": dict(self.weights),
+                "active_jobs": len(self._jobs),
+                "allocations": {
+                    download_id: int(job.allocated) if math.isfinite(job.allocated) else None
+                    for download_id, job in self._jobs.items()
+                },
+                "consumed_bytes": self.consumed_bytes,
+                "throttled": self.throttled,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "rebalances": self.rebalances,
+            }
+
+
+# Singleton instance
+_bandwidth_scheduler = None
+
+def get_bandwidth_scheduler() -> BandwidthScheduler:
+    """BandwidthScheduler singleton olish"""
+    global _bandwidth_scheduler
+
+    if _bandwidth_scheduler is None:
+        _bandwidth_scheduler = BandwidthScheduler()
+
+    return _bandwidth_scheduler
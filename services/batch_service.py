@@ -0,0 +1,83 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, List
+from services.info_service import get_cached_video_info, get_video_info_async
+import config
+
+
+def _is_youtube_url(url: str) -> bool:
+    return "youtube.com" in url or "youtu.be" in url
+
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 2)
+
+
+def _line(index: int, url: str, started: float, cached: bool, data=None, error=None, fetch_ms=None) -> str:
+    # elapsed_ms - batch boshidan shu qatorgacha, fetch_ms - extract_info vaqti
+    item = {
+        "index": index,
+        "url": url,
+        "status": error is None,
+        "cached": cached,
+        "elapsed_ms": _ms(started),
+    }
+    if fetch_ms is not None:
+        item["fetch_ms"] = fetch_ms
+    if error is None:
+        item["data"] = data
+    else:
+        item["error"] = error
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def _lookup_cache(urls: List[str]) -> list:
+    return [get_cached_video_info(url) if _is_youtube_url(url) else None for url in urls]
+
+
+async def stream_batch_info(urls: List[str]) -> AsyncIterator[str]:
+    """
+    Har bir URL uchun bitta NDJSON qator qaytarish
+
+    Avval keshdagi natijalar darhol beriladi, qolganlari BATCH_CONCURRENCY
+    chegarasida parallel olinadi va tugash tartibida uzatiladi.
+    """
+    started = time.perf_counter()
+    cached_items = await asyncio.to_thread(_lookup_cache, urls)
+
+    pending = []
+    for index, (url, cached) in enumerate(zip(urls, cached_items)):
+        if not _is_youtube_url(url):
+            yield _line(index, url, started, False, error="URL youtube.com yoki youtu.be dan bo'lishi kerak")
+        elif cached:
+            yield _line(index, url, started, True, data=cached)
+        else:
+            pending.append((index, url))
+
+    if not pending:
+        return
+
+    semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+    async def fetch(index: int, url: str) -> str:
+        async with semaphore:
+            fetch_started = time.perf_counter()
+            try:
+                data = await get_video_info_async(url)
+                return _line(index, url, started, False, data=data, fetch_ms=_ms(fetch_started))
+            except asyncio.TimeoutError:
+                return _line(index, url, started, False, fetch_ms=_ms(fetch_started),
+                             error=f"{config.INFO_TIMEOUT} sekund ichida javob olinmadi")
+            except Exception as e:
+                return _line(index, url, started, False, fetch_ms=_ms(fetch_started),
+                             error=str(getattr(e, "detail", e)))
+
+    tasks = [asyncio.create_task(fetch(index, url)) for index, url in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Mijoz ulanishni uzsa, qolgan vazifalar bekor qilinadi
+        for task in tasks:
+            task.cancel()
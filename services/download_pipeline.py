@@ -0,0 +1,252 @@
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+from database.operations import update_download_progress
+from services.download_service import finalize_download
+from services.postprocess import plan_steps, run_postprocess, PATH_DIRECT, PATH_REMUX, PATH_TRANSCODE
+from utils.bounded_executor import BoundedExecutor
+import config
+
+logger = logging.getLogger('download_pipeline')
+
+# (download_id, muvaffaqiyatli) - vazifa oxirgi bosqichdan chiqqanda chaqiriladi
+DoneCallback = Callable[[str, bool], None]
+
+
+class DownloadPipeline:
+    """
+    Yuklashning tarmoqdan keyingi bosqichlari:
+    - ffmpeg (birlashtirish, o'girish) yadrolar soniga teng jarayonlar havzasida bajariladi,
+      navbat ishchisi (tarmoq sloti) konvertatsiyani kutmaydi
+    - ffmpeg navbati to'lsa, tarmoq ishchisi bo'shagunicha kutadi (disk to'lib ketmasligi uchun)
+    - ffmpeg yo'li eng arzonidan tanlanadi (direct -> remux -> transcode) va har vazifaga yoziladi
+    - Yakunlash (omborga yozish, holatni yangilash) alohida kichik thread poolda
+    - Har bir bosqichning navbat chuqurligi va vaqtlari yig'iladi
+    """
+
+    def __init__(self, convert_workers: int = config.DOWNLOAD_CONVERT_WORKERS,
+                 convert_queue_max: int = config.DOWNLOAD_CONVERT_QUEUE_MAX,
+                 finalize_workers: int = config.DOWNLOAD_FINALIZE_WORKERS):
+        """
+        :param convert_workers: Parallel ffmpeg jarayonlari
+        :param convert_queue_max: ffmpeg bosqichida (navbat + bajarilayotgan) bo'lishi mumkin bo'lgan vazifalar
+        :param finalize_workers: Yakunlash threadlari
+        """
+        self.convert_workers = convert_workers
+        self.convert_queue_max = convert_queue_max
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._finalize = BoundedExecutor("download-finalize", finalize_workers, convert_queue_max)
+
+        self._cond = threading.Condition()
+        self._convert_pending = 0
+        self.converted = 0
+        self.convert_failed = 0
+        self.renamed = 0
+        self.convert_wait_total = 0.0
+        self.convert_wait_max = 0.0
+        self.convert_time_total = 0.0
+        # yo'l -> vazifalar soni, ffmpeg vaqti va CPU vaqti (qayta kodlashdan tejalganini o'lchash uchun)
+        self.paths = {path: {"jobs": 0, "seconds": 0.0, "cpu_seconds": 0.0}
+                      for path in (PATH_DIRECT, PATH_REMUX, PATH_TRANSCODE)}
+        # Tarmoqdan yuklanganlar (miss) va ombordagi original audiodan o'girilganlar (source)
+        self.cache = {"miss": 0, "source": 0}
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._cond:
+            if self._executor is None:
+                # spawn: ko'p threadli server jarayonidan fork qilish qulflarni meros qilib oladi
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.convert_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def submit(self, download_id: str, fetched: dict, timings: Dict[str, float], on_done: DoneCallback):
+        """
+        Tarmoqdan yuklangan vazifani ffmpeg va yakunlash bosqichlariga topshirish
+
+        :param fetched: fetch_download() natijasi
+        :param timings: Oldingi bosqichlar vaqtlari (shu lug'atga davom ettiriladi)
+        """
+        output, steps, path = plan_steps(fetched['profile'], fetched['streams'], fetched['output_base'])
+        if not steps:
+            with self._cond:
+                self.renamed += 1
+                self._count_path(path, 0.0, 0.0)
+            self._submit_finalize(download_id, fetched, output, True, timings, on_done,
+                                  {"pp_path": path, "convert_seconds": 0.0})
+            return
+
+        with self._cond:
+            while self._convert_pending >= self.convert_queue_max:
+                self._cond.wait()
+            self._convert_pending += 1
+
+        update_download_progress(
+            download_id, status='processing', stage='convert', pp_path=path, stage_timings=json.dumps(timings)
+        )
+        task = {
+            "steps": steps,
+            "inputs": fetched['inputs'],
+            "output": output,
+            "ffmpeg": config.FFMPEG_PATH,
+            "threads": config.FFMPEG_THREADS,
+            "path": path,
+        }
+        submitted_at = time.time()
+        try:
+            future = self._process_pool().submit(run_postprocess, task)
+        except Exception:
+            self._convert_finished()
+            raise
+        future.add_done_callback(
+            lambda f: self._on_converted(f, download_id, fetched, output, timings, submitted_at, on_done)
+        )
+
+    def _convert_finished(self):
+        with self._cond:
+            self._convert_pending -= 1
+            self._cond.notify()
+
+    def _on_converted(self, future: Future, download_id: str, fetched: dict, output: str,
+                      timings: Dict[str, float], submitted_at: float, on_done: DoneCallback):
+        # ProcessPoolExecutor ning boshqaruv threadida: og'ir ish yakunlash pooliga o'tkaziladi
+        self._convert_finished()
+        if future.cancelled():
+            # Server to'xtatilmoqda: yozuv 'processing' holatida qoladi va keyingi ishga tushishda tiklanadi
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            with self._cond:
+                self.convert_failed += 1
+            self._fail(download_id, e, timings, on_done)
+            return
+
+        wait = max(result['started_at'] - submitted_at, 0.0)
+        with self._cond:
+            self.converted += 1
+            self.convert_wait_total += wait
+            self.convert_wait_max = max(self.convert_wait_max, wait)
+            self.convert_time_total += result['seconds']
+            self._count_path(result['path'], result['seconds'], result['cpu_seconds'])
+
+        timings['convert_wait'] = round(wait, 3)
+        timings['convert'] = result['seconds']
+        timings['convert_cpu'] = result['cpu_seconds']
+        timings.update({f"convert.{name}": seconds for name, seconds in result['steps'].items()})
+        # Stream copy rad etilib qayta kodlangan bo'lsa, yo'l yangilanadi
+        self._submit_finalize(download_id, fetched, output, False, timings, on_done,
+                              {"pp_path": result['path'], "convert_seconds": result['seconds']})
+
+    def _count_path(self, path: str, seconds: float, cpu_seconds: float):
+        # self._cond ushlab turilganda chaqiriladi
+        counters = self.paths[path]
+        counters["jobs"] += 1
+        counters["seconds"] += seconds
+        counters["cpu_seconds"] += cpu_seconds
+
+    def _submit_finalize(self, download_id: str, fetched: dict, output: str, rename: bool,
+                         timings: Dict[str, float], on_done: DoneCallback, fields: dict):
+        """:param fields: Yakuniy yozuvga qo'shiladigan maydonlar (pp_path, convert_seconds)"""
+        try:
+            self._finalize.submit(self._finalize_job, download_id, fetched, output, rename,
+                                  timings, time.time(), on_done, fields)
+        except Exception as e:
+            self._fail(download_id, e, timings, on_done)
+
+    def _finalize_job(self, download_id: str, fetched: dict, output: str, rename: bool,
+                      timings: Dict[str, float], submitted_at: float, on_done: DoneCallback, fields: dict):
+        started = time.time()
+        timings['finalize_wait'] = round(started - submitted_at, 3)
+        try:
+            alias = finalize_download(fetched, output, rename)
+        except Exception as e:
+            self._fail(download_id, e, timings, on_done)
+            return
+
+        timings['finalize'] = round(time.time() - started, 3)
+        cache_hit = fetched.get('cache_hit', 'miss')
+        with self._cond:
+            self.cache[cache_hit] = self.cache.get(cache_hit, 0) + 1
+        update_download_progress(
+            download_id,
+            status='completed',
+            progress=100,
+            filename=alias,
+            stage='done',
+            stage_timings=json.dumps(timings),
+            cache_hit=cache_hit,
+            **fields
+        )
+        on_done(download_id, True)
+
+    @staticmethod
+    def _fail(download_id: str, error: Exception, timings: Dict[str, float], on_done: DoneCallback):
+        logger.warning(f"Yuklashni yakunlab bo'lmadi: {download_id}, Xatolik: {str(error)}")
+        try:
+            update_download_progress(
+                download_id, status='error', error_message=str(error), stage_timings=json.dumps(timings)
+            )
+        finally:
+            on_done(download_id, False)
+
+    def depth(self) -> Dict[str, Dict[str, int]]:
+        """ffmpeg va yakunlash bosqichlaridagi navbat chuqurligi"""
+        with self._cond:
+            pending = self._convert_pending
+        finalize = self._finalize.stats()
+        return {
+            "convert": {
+                "queued": max(pending - self.convert_workers, 0),
+                "running": min(pending, self.convert_workers),
+            },
+            "finalize": {"queued": finalize['queued'], "running": finalize['running']},
+        }
+
+    def stats(self) -> dict:
+        with self._cond:
+            done = self.converted
+            convert = {
+                "workers": self.convert_workers,
+                "max_pending": self.convert_queue_max,
+                "pending": self._convert_pending,
+                "converted": self.converted,
+                "failed": self.convert_failed,
+                "skipped": self.renamed,
+                "avg_wait_seconds": round(self.convert_wait_total / done, 3) if done else 0.0,
+                "max_wait_seconds": round(self.convert_wait_max, 3),
+                "avg_run_seconds": round(self.convert_time_total / done, 3) if done else 0.0,
+                "ffmpeg_threads": config.FFMPEG_THREADS,
+                "paths": {
+                    path: {name: round(value, 3) for name, value in counters.items()}
+                    for path, counters in self.paths.items()
+                },
+            }
+            cache = dict(self.cache)
+        return {"convert": convert, "finalize": self._finalize.stats(), "cache": cache}
+
+    def shutdown(self):
+        """Jarayonlar havzasini to'xtatish (tugallanmagan vazifalar keyingi ishga tushishda tiklanadi)"""
+        with self._cond:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+_download_pipeline = None
+
+def get_download_pipeline() -> DownloadPipeline:
+    """DownloadPipeline singleton olish"""
+    global _download_pipeline
+
+    if _download_pipeline is None:
+        _download_pipeline = DownloadPipeline()
+
+    return _download_pipeline
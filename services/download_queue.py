@@ -0,0 +1,706 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Set
+from database.connection import get_db_connection
+from database.operations import create_download_record, update_download_progress, find_dedup_leader, finish_followers
+from services.download_service import fetch_download, download_dedup_key, audio_source_key
+from services.download_pipeline import get_download_pipeline
+from services.artifact_store import get_artifact_store
+from utils.bounded_executor import QueueFullError
+from utils.client_identity import client_group
+import config
+
+logger = logging.getLogger('download_queue')
+
+# Navbat tartibi: sinf + navbatga qo'yilgan vaqt / DOWNLOAD_PRIORITY_AGING.
+# Kutish davom etgani sari vazifa oldinga siljiydi; kalit hozirgi vaqtga bog'liq emas.
+_ORDER_SQL = "priority + queued_at / ?"
+
+# Vazifani bajarayotgan jarayon (qayta ishga tushganda tirik/o'lik jarayonni ajratish uchun)
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Yakunlanmagan, lekin ishchi olgan holatlar ('processing' - ffmpeg bosqichi, fayllar diskda)
+_ACTIVE_STATUSES = ('starting', 'downloading', 'finished', 'processing')
+
+# Mijoz kvotasiga kiradigan holatlar: tarmoq sloti band (ffmpeg bosqichi kvotadan tashqarida)
+_FETCH_STATUSES = ('starting', 'downloading')
+
+
+def priority_for(quality: Optional[str]) -> int:
+    """Sifat bo'yicha navbat sinfi (kichik - oldinroq)"""
+    return config.DOWNLOAD_PRIORITY.get(quality, config.DOWNLOAD_DEFAULT_PRIORITY)
+
+
+_DEFAULT_LIMITS = {
+    "max_active": lambda: config.DOWNLOAD_CLIENT_MAX_ACTIVE,
+    "max_queued": lambda: config.DOWNLOAD_CLIENT_MAX_QUEUED,
+    "group_max_active": lambda: config.DOWNLOAD_GROUP_MAX_ACTIVE,
+    "group_max_queued": lambda: config.DOWNLOAD_GROUP_MAX_QUEUED,
+}
+
+
+def client_limit(client_id: Optional[str], name: str) -> int:
+    """
+    Kvota: DOWNLOAD_CLIENT_QUOTAS dagi qiymat yoki umumiy chegara
+
+    :param client_id: Mijoz (max_active, max_queued) yoki guruh (group_max_active, group_max_queued)
+    """
+    return config.DOWNLOAD_CLIENT_QUOTAS.get(client_id, {}).get(name, _DEFAULT_LIMITS[name]())
+
+
+def _eligible_heads(heads: Dict[Optional[str], dict], active: Dict[Optional[str], int]) -> Dict[Optional[str], dict]:
+    """Mijoz va uning guruhi (IP / API kalit) kvotasi to'lmagan mijozlarning navbat boshidagi vazifalari"""
+    group_active = {}
+    for client, count in active.items():
+        if client is not None:
+            group_active[client_group(client)] = group_active.get(client_group(client), 0) + count
+    return {
+        client: record for client, record in heads.items()
+        if client is None or (
+            active.get(client, 0) < client_limit(client, "max_active")
+            and group_active.get(client_group(client), 0) < client_limit(client_group(client), "group_max_active")
+        )
+    }
+
+
+def _drr_cost(priority: int) -> float:
+    return config.DOWNLOAD_DRR_COST.get(priority, 1)
+
+
+class _DrrState:
+    """
+    Deficit round-robin holati: navbat kelgan mijozga DOWNLOAD_DRR_QUANTUM kredit qo'shiladi va
+    krediti yetguncha uning vazifalari olinadi; og'ir vazifa qimmatroq turadi
+    """
+
+    def __init__(self):
+        self.ring = []
+        self.pos = 0
+        self.turn = False
+        self.deficit: Dict[Optional[str], float] = {}
+
+    def copy(self) -> "_DrrState":
+        state = _DrrState()
+        state.ring, state.pos, state.turn, state.deficit = list(self.ring), self.pos, self.turn, dict(self.deficit)
+        return state
+
+    def pick(self, eligible: Dict[Optional[str], dict], waiting: Set[Optional[str]]) -> Optional[dict]:
+        """
+        :param eligible: Kvotasi to'lmagan mijoz -> navbat boshidagi vazifasi
+        :param waiting: Navbatda vazifasi bor barcha mijozlar
+        """
+        # Navbati bo'shagan mijoz halqadan chiqadi va krediti saqlanmaydi
+        current = self.ring[self.pos] if self.pos < len(self.ring) else None
+        self.ring = [client for client in self.ring if client in waiting]
+        self.ring += sorted((client for client in waiting if client not in self.ring), key=str)
+        self.deficit = {client: value for client, value in self.deficit.items() if client in waiting}
+        if current in self.ring:
+            self.pos = self.ring.index(current)
+        else:
+            self.pos, self.turn = 0, False
+
+        if not eligible:
+            return None
+
+        # Eng qimmat vazifa ham shuncha aylanishda kredit yig'adi
+        rounds = math.ceil(max(_drr_cost(record['priority']) for record in eligible.values())
+                           / config.DOWNLOAD_DRR_QUANTUM) + 1
+        for _ in range(len(self.ring) * rounds):
+            client = self.ring[self.pos]
+            record = eligible.get(client)
+            if record is not None:
+                if not self.turn:
+                    self.deficit[client] = self.deficit.get(client, 0) + config.DOWNLOAD_DRR_QUANTUM
+                    self.turn = True
+                cost = _drr_cost(record['priority'])
+                if self.deficit[client] >= cost:
+                    self.deficit[client] -= cost
+                    return record
+            self.turn = False
+            self.pos = (self.pos + 1) % len(self.ring)
+        return None
+
+
+class DownloadQueue:
+    """
+    downloads jadvaliga asoslangan yuklash navbati:
+    - Belgilangan sondagi ishchi threadlar (parallel yt-dlp soni cheklangan)
+    - Mijozlar orasida deficit round-robin (vazifa narxi sinfga bog'liq), mijoz ichida -
+      sinflar bo'yicha tartib: audio va kichik sifatlar 4K dan oldin
+    - Har bir mijozning bir vaqtdagi va navbatdagi vazifalari cheklanadi
+    - Og'ir yuklashlar soni alohida cheklanadi
+    - Navbat bazada saqlanadi: qayta ishga tushganda 'queued' vazifalar yo'qolmaydi
+    - Bir xil yuklashlar bitta vazifaga ergashadi yoki tayyor fayldan darhol javob oladi
+    - Jarayon to'xtab qolsa, uzilgan yuklashlar .part fayllaridan davom ettiriladi
+    - Ishchilar faqat tarmoqdan yuklaydi; ffmpeg va yakunlash DownloadPipeline bosqichlarida
+    """
+
+    def __init__(self, workers: int = config.DOWNLOAD_WORKERS, max_queued: int = config.DOWNLOAD_QUEUE_MAX):
+        """
+        :param workers: Bir vaqtda tarmoqdan yuklaydigan ishchilar soni
+        :param max_queued: Navbatda kutishi mumkin bo'lgan yuklashlar soni
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._claim_lock = threading.Lock()
+        self._enqueue_lock = threading.Lock()
+        self._threads = []
+
+        self._lock = threading.Lock()
+        # download_id -> priority
+        self._running = {}
+        # download_id -> mijoz (tugaganda hisoblagichlar uchun)
+        self._job_clients = {}
+        # download_id -> pin qilingan MP3 manbasi (artifact kaliti)
+        self._pinned_sources = {}
+        # Mijozlar orasidagi deficit round-robin (self._claim_lock ostida)
+        self._drr = _DrrState()
+        # mijoz -> hisoblagichlar
+        self._clients: Dict[Optional[str], Dict[str, int]] = {}
+        self.enqueued = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.dedup_in_flight = 0
+        self.dedup_completed = 0
+        self.resumed = 0
+        self.abandoned = 0
+        self.avg_duration = None
+
+    def start(self):
+        """Ishchi threadlarni ishga tushirish"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_thread, name=f"download-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _wake(self):
+        with self._cond:
+            self._generation += 1
+            self._cond.notify()
+
+    def _queued_count(self) -> int:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM downloads WHERE status = 'queued'")
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+
+    @staticmethod
+    def _queued_in_group(group: str) -> Dict[str, int]:
+        """Guruhdagi (ip:<manzil> yoki key:<nom>, barcha X-Client-Id lar) mijozlarning navbatdagi vazifalari"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT client_id, COUNT(*) FROM downloads WHERE status = 'queued' "
+            "AND (client_id = ? OR substr(client_id, 1, ?) = ?) GROUP BY client_id",
+            (group, len(group) + 1, f"{group}/")
+        )
+        counts = {row[0]: row[1] for row in cursor.fetchall()}
+        conn.close()
+        return counts
+
+    def enqueue(self, download_id: str, url: str, format_id: str = "", quality: Optional[str] = None,
+                use_proxy: bool = True, audio_format: Optional[str] = None, client_id: Optional[str] = None) -> dict:
+        """
+        Yuklashni navbatga qo'yish
+
+        :param audio_format: MP3 sifati uchun audio_format_spec() qiymati
+        :param client_id: So'rov yuborgan mijoz (utils.client_identity)
+        :return: Navbatdagi o'rni va taxminiy boshlanish vaqti (birlashtirilgan bo'lsa - yetakchi ID si)
+        :raises QueueFullError: Navbat yoki mijozning navbatdagi kvotasi to'lgan bo'lsa
+        """
+        dedup_key = download_dedup_key(url, format_id, quality, audio_format)
+
+        with self._enqueue_lock:
+            attached = self._attach_duplicate(download_id, url, format_id, quality, use_proxy, dedup_key,
+                                              audio_format, client_id)
+            if attached is not None:
+                self._count_client(client_id, "deduplicated")
+                return attached
+
+            if self._queued_count() >= self.max_queued:
+                with self._lock:
+                    self.rejected += 1
+                self._count_client(client_id, "rejected")
+                raise QueueFullError(f"Yuklash navbati to'lgan ({self.max_queued})")
+
+            if client_id is not None:
+                # X-Client-Id almashtirib kvotani chetlab o'tmaslik uchun IP / API kalit bo'yicha ham
+                group = client_group(client_id)
+                queued = self._queued_in_group(group)
+                max_queued = client_limit(client_id, "max_queued")
+                group_max_queued = client_limit(group, "group_max_queued")
+                if queued.get(client_id, 0) >= max_queued or sum(queued.values()) >= group_max_queued:
+                    with self._lock:
+                        self.rejected += 1
+                    self._count_client(client_id, "rejected")
+                    raise QueueFullError(
+                        f"Navbatda sizning yuklashlaringiz juda ko'p ({max_queued}, IP/kalit bo'yicha {group_max_queued})"
+                    )
+
+            create_download_record(
+                download_id, url, format_id, quality,
+                status='queued', priority=priority_for(quality), use_proxy=use_proxy, dedup_key=dedup_key,
+                audio_format=audio_format, client_id=client_id
+            )
+
+        with self._lock:
+            self.enqueued += 1
+        self._count_client(client_id, "enqueued")
+        self._wake()
+
+        return self.queue_status(download_id) or {}
+
+    def _attach_duplicate(self, download_id: str, url: str, format_id: str, quality: Optional[str],
+                          use_proxy: bool, dedup_key: str, audio_format: Optional[str],
+                          client_id: Optional[str]) -> Optional[dict]:
+        """Tayyor fayl yoki davom etayotgan bir xil yuklash bo'lsa, yangi yozuvni unga bog'lash"""
+        artifacts = get_artifact_store()
+        finished = find_dedup_leader(dedup_key, in_flight=False)
+        if finished and finished['filename'] and artifacts.resolve(finished['filename'], touch=False):
+            create_download_record(
+                download_id, url, format_id, quality, status='completed', priority=priority_for(quality),
+                use_proxy=use_proxy, dedup_key=dedup_key, leader_id=finished['id'], audio_format=audio_format,
+                client_id=client_id
+            )
+            update_download_progress(
+                download_id,
+                progress=100,
+                filename=finished['filename'],
+                format_id=finished['format_id'],
+                selected_quality=finished['selected_quality'],
+                cache_hit='output',
+                finished_at=time.time()
+            )
+            with self._lock:
+                self.dedup_completed += 1
+            return {"deduplicated": "completed", "leader_id": finished['id']}
+
+        # Yuklash yozuvisiz omborga tushgan fayl (masalan, MP3 yuklashda saqlangan original audio)
+        artifact = artifacts.lookup(dedup_key, touch=False)
+        if artifact is not None:
+            create_download_record(
+                download_id, url, format_id, quality, status='completed', priority=priority_for(quality),
+                use_proxy=use_proxy, dedup_key=dedup_key, audio_format=audio_format, client_id=client_id
+            )
+            update_download_progress(
+                download_id, progress=100, filename=artifact['alias'], cache_hit='output', finished_at=time.time()
+            )
+            with self._lock:
+                self.dedup_completed += 1
+            return {"deduplicated": "completed", "leader_id": None}
+
+        leader = find_dedup_leader(dedup_key)
+        if leader:
+            create_download_record(
+                download_id, url, format_id, quality, status='following', priority=priority_for(quality),
+                use_proxy=use_proxy, dedup_key=dedup_key, leader_id=leader['id'], audio_format=audio_format,
+                client_id=client_id
+            )
+            with self._lock:
+                self.dedup_in_flight += 1
+            return dict(self.queue_status(leader['id']) or {}, deduplicated="in_flight", leader_id=leader['id'])
+
+        return None
+
+    def _claim(self) -> Optional[dict]:
+        """Navbatdan vazifa olish (mijozlar orasida DRR) va 'starting' holatiga o'tkazish"""
+        with self._claim_lock:
+            with self._lock:
+                heavy_running = sum(1 for p in self._running.values() if p >= config.DOWNLOAD_HEAVY_PRIORITY)
+
+            condition = "status = 'queued'"
+            params = [config.DOWNLOAD_PRIORITY_AGING]
+            if heavy_running >= config.DOWNLOAD_MAX_HEAVY:
+                condition += " AND priority < ?"
+                params.append(config.DOWNLOAD_HEAVY_PRIORITY)
+
+            conn = get_db_connection()
+            conn.isolation_level = None
+            cursor = conn.cursor()
+            try:
+                # Bir nechta jarayon bitta bazadan olsa ham vazifa ikki marta olinmaydi
+                cursor.execute("BEGIN IMMEDIATE")
+                # Har bir mijozning navbat boshidagi vazifasi (mijoz ichida avvalgi tartib)
+                cursor.execute(f"""
+                SELECT * FROM (
+                    SELECT id, url, format_id, quality, priority, use_proxy, queued_at, audio_format, client_id,
+                           ROW_NUMBER() OVER (PARTITION BY client_id ORDER BY {_ORDER_SQL}, queued_at) AS place
+                    FROM downloads WHERE {condition}
+                ) WHERE place = 1
+                """, params)
+                heads = {record['client_id']: record for record in cursor.fetchall()}
+                cursor.execute("SELECT DISTINCT client_id FROM downloads WHERE status = 'queued'")
+                waiting = {row[0] for row in cursor.fetchall()}
+                cursor.execute(
+                    f"SELECT client_id, COUNT(*) FROM downloads "
+                    f"WHERE status IN ({', '.join('?' * len(_FETCH_STATUSES))}) GROUP BY client_id",
+                    _FETCH_STATUSES
+                )
+                active = {row[0]: row[1] for row in cursor.fetchall()}
+
+                # Kvotasi (yoki IP / API kalit kvotasi) to'lgan mijozlar bu safar o'tkazib yuboriladi
+                eligible = _eligible_heads(heads, active)
+                record = self._drr.pick(eligible, waiting)
+                if record is not None:
+                    now = time.time()
+                    cursor.execute(
+                        "UPDATE downloads SET status = 'starting', stage = 'fetch', started_at = ?, updated_at = ?, "
+                        "owner = ? WHERE id = ?",
+                        (now, datetime.now().isoformat(), _OWNER, record['id'])
+                    )
+                cursor.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+            if record is None:
+                return None
+
+            job = dict(record)
+            with self._lock:
+                self._running[job['id']] = job['priority']
+                self._job_clients[job['id']] = job['client_id']
+            self._count_client(job['client_id'], "started")
+            return job
+
+    def _count_client(self, client_id: Optional[str], counter: str):
+        with self._lock:
+            counters = self._clients.setdefault(client_id, {
+                "enqueued": 0, "deduplicated": 0, "rejected": 0, "started": 0, "completed": 0, "failed": 0,
+            })
+            counters[counter] += 1
+
+    @staticmethod
+    def _owner_alive(owner: Optional[str]) -> bool:
+        """Vazifa egasi shu mashinadagi tirik boshqa jarayonmi"""
+        if not owner or owner == _OWNER:
+            return False
+        host, _, pid = owner.rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            # Boshqa mashinadagi jarayon holatini bilib bo'lmaydi
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def recover(self) -> dict:
+        """
+        Ishga tushganda uzilgan yuklashlarni qayta navbatga qo'yish
+
+        Fayl nomi kalitdan olingani uchun yt-dlp o'sha .part faylni topadi va
+        mavjud baytdan davom etadi. DOWNLOAD_RESUME_MAX_AGE dan eski yoki
+        DOWNLOAD_MAX_RESUMES dan ko'p davom ettirilgan yuklashlar tashlab yuboriladi.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM downloads WHERE leader_id IS NULL AND status IN ({', '.join('?' * len(_ACTIVE_STATUSES))})",
+            _ACTIVE_STATUSES
+        )
+        records = [dict(record) for record in cursor.fetchall()]
+        conn.close()
+
+        artifacts = get_artifact_store()
+        now = time.time()
+        resumed = abandoned = 0
+
+        for record in records:
+            if self._owner_alive(record['owner']):
+                continue
+
+            partials = artifacts.partial_files(record['dedup_key']) if record['dedup_key'] else []
+            partial_bytes = sum(os.path.getsize(path) for path in partials if os.path.isfile(path))
+            last_activity = max(
+                [os.path.getmtime(path) for path in partials if os.path.isfile(path)]
+                + [record['started_at'] or record['queued_at'] or 0]
+            )
+
+            if now - last_activity > config.DOWNLOAD_RESUME_MAX_AGE or \
+                    (record['resume_count'] or 0) >= config.DOWNLOAD_MAX_RESUMES:
+                if record['dedup_key']:
+                    artifacts.discard_partials(record['dedup_key'])
+                update_download_progress(
+                    record['id'],
+                    status='error',
+                    error_message="Yuklash server qayta ishga tushganda uzilib qoldi",
+                    finished_at=now
+                )
+                finish_followers(record['id'])
+                abandoned += 1
+                continue
+
+            # queued_at o'zgarmaydi: uzilgan yuklash navbatdagi o'rnini yo'qotmaydi
+            update_download_progress(
+                record['id'],
+                status='queued',
+                owner=None,
+                downloaded_bytes=partial_bytes or record['downloaded_bytes'],
+                resume_count=(record['resume_count'] or 0) + 1
+            )
+            resumed += 1
+            logger.info(f"Yuklash davom ettiriladi: {record['id']} ({partial_bytes} bayt tayyor)")
+
+        with self._lock:
+            self.resumed += resumed
+            self.abandoned += abandoned
+        if resumed:
+            self._wake()
+
+        return {"resumed": resumed, "abandoned": abandoned}
+
+    def _worker_thread(self):
+        while True:
+            with self._cond:
+                generation = self._generation
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Navbatdan vazifa olishda xatolik: {str(e)}")
+                job = None
+
+            if job is None:
+                with self._cond:
+                    if self._generation == generation:
+                        self._cond.wait(config.DOWNLOAD_POLL_INTERVAL)
+                continue
+
+            self._run(job)
+
+    def _run(self, job: dict):
+        # MP3 manbasi (original audio) vazifa tugaguncha kvota tozalashidan himoyalanadi
+        source_key = audio_source_key(job['url'], job['format_id'] or None, job['quality'], job['audio_format'])
+        if source_key:
+            get_artifact_store().pin(source_key)
+            with self._lock:
+                self._pinned_sources[job['id']] = source_key
+
+        started = time.time()
+        timings = {"fetch_wait": round(started - (job['queued_at'] or started), 3)}
+        fetched = None
+        try:
+            fetched = fetch_download(
+                job['id'],
+                job['url'],
+                format_id=job['format_id'] or None,
+                quality=job['quality'],
+                use_proxy=bool(job['use_proxy']),
+                audio_format=job['audio_format'],
+                priority=job['priority']
+            )
+            timings['fetch'] = round(time.time() - started, 3)
+            # ffmpeg navbati to'lgan bo'lsa, shu yerda kutiladi
+            get_download_pipeline().submit(job['id'], fetched, timings, self._job_done)
+        except Exception as e:
+            logger.warning(f"Yuklash bajarilmadi: {job['id']}, Xatolik: {str(getattr(e, 'detail', e))}")
+            if fetched is not None:
+                # fetch_download o'z xatolarini yozuvga yozadi; bu yerda faqat bosqichlarga topshirish xatosi
+                update_download_progress(job['id'], status='error', error_message=str(e))
+            self._job_done(job['id'], False)
+        finally:
+            duration = time.time() - started
+            with self._lock:
+                self._running.pop(job['id'], None)
+                if fetched is not None:
+                    # Taxminiy boshlanish vaqti uchun ishchi bandligining o'rtachasi (EMA)
+                    self.avg_duration = duration if self.avg_duration is None else \
+                        0.8 * self.avg_duration + 0.2 * duration
+            # Tarmoq sloti bo'shadi: kutayotgan (og'ir) vazifani olish mumkin
+            self._wake()
+
+    def _job_done(self, download_id: str, succeeded: bool):
+        """Vazifa oxirgi bosqichdan chiqdi (navbat ishchisi yoki DownloadPipeline threadida)"""
+        try:
+            update_download_progress(download_id, finished_at=time.time())
+            finish_followers(download_id)
+        except Exception as e:
+            logger.error(f"Yuklash yozuvini yangilashda xatolik: {str(e)}")
+
+        with self._lock:
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+            client_id = self._job_clients.pop(download_id, None)
+            source_key = self._pinned_sources.pop(download_id, None)
+        self._count_client(client_id, "completed" if succeeded else "failed")
+        if source_key:
+            get_artifact_store().unpin(source_key)
+
+    def stage_depth(self) -> dict:
+        """Har bir bosqichdagi navbat chuqurligi (tarmoq, ffmpeg, yakunlash)"""
+        queued = self._queued_count()
+        with self._lock:
+            running = len(self._running)
+        return dict({"fetch": {"queued": queued, "running": running}}, **get_download_pipeline().depth())
+
+    def queue_status(self, download_id: str, record: Optional[dict] = None) -> Optional[dict]:
+        """
+        Navbatdagi vazifaning o'rni va taxminiy boshlanish vaqti
+
+        O'rin _claim tartibida hisoblanadi: mijozlar DRR bilan navbatlashadi,
+        kvotasi to'lgan mijoz o'tkazib yuboriladi.
+
+        :param record: downloads yozuvi (bo'lsa qayta o'qilmaydi)
+        :return: {"queue_position", "estimated_start_seconds"} yoki None (navbatda bo'lmasa)
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            if record is None:
+                cursor.execute('SELECT status FROM downloads WHERE id = ?', (download_id,))
+                record = cursor.fetchone()
+            if record is None or record['status'] != 'queued':
+                return None
+
+            cursor.execute(
+                f"SELECT id, priority, client_id FROM downloads WHERE status = 'queued' "
+                f"ORDER BY client_id, {_ORDER_SQL}, queued_at",
+                (config.DOWNLOAD_PRIORITY_AGING,)
+            )
+            queues: Dict[Optional[str], deque] = {}
+            for row in cursor.fetchall():
+                queues.setdefault(row['client_id'], deque()).append(dict(row))
+            cursor.execute(
+                f"SELECT client_id, COUNT(*) FROM downloads "
+                f"WHERE status IN ({', '.join('?' * len(_FETCH_STATUSES))}) GROUP BY client_id",
+                _FETCH_STATUSES
+            )
+            active = {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        position = self._claim_position(download_id, queues, active)
+
+        with self._lock:
+            running = len(self._running)
+            avg_duration = self.avg_duration or config.DOWNLOAD_DEFAULT_DURATION
+
+        free_workers = max(self.workers - running, 0)
+        if position <= free_workers:
+            estimated = 0
+        else:
+            # Oldindagi vazifalar ishchilar soniga bo'lingan "to'lqinlar"da bajariladi;
+            # hozir ishlayotganlar o'rtacha yarim yo'lda deb hisoblanadi
+            waves = math.ceil((position - free_workers) / self.workers)
+            estimated = (waves - 0.5) * avg_duration
+
+        return {
+            "queue_position": position,
+            "estimated_start_seconds": round(estimated),
+        }
+
+    def _claim_position(self, download_id: str, queues: Dict[Optional[str], deque],
+                        active: Dict[Optional[str], int]) -> int:
+        """DRR holatining nusxasida _claim ni takrorlab, vazifa nechanchi bo'lib olinishini topish"""
+        with self._claim_lock:
+            state = self._drr.copy()
+
+        total = sum(len(jobs) for jobs in queues.values())
+        for position in range(1, total + 1):
+            waiting = {client for client, jobs in queues.items() if jobs}
+            eligible = _eligible_heads({client: jobs[0] for client, jobs in queues.items() if jobs}, active)
+            if not eligible:
+                # Hamma mijoz kvotasida: hozir ishlayotganlari tugagach navbat davom etadi
+                active = {}
+                eligible = {client: jobs[0] for client, jobs in queues.items() if jobs}
+            record = state.pick(eligible, waiting)
+            if record is None or record['id'] == download_id:
+                return position
+            queues[record['client_id']].popleft()
+            active[record['client_id']] = active.get(record['client_id'], 0) + 1
+        return total
+
+    def client_usage(self, client_id: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Mijozlar bo'yicha hisoblagichlar, joriy navbat/faol vazifalar va kvotalar
+
+        :param client_id: Berilsa, faqat shu mijoz
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        statuses = ('queued',) + _FETCH_STATUSES + ('processing',)
+        sql = (f"SELECT client_id, status, COUNT(*) AS count FROM downloads "
+               f"WHERE status IN ({', '.join('?' * len(statuses))})")
+        params = list(statuses)
+        if client_id is not None:
+            sql += " AND client_id = ?"
+            params.append(client_id)
+        cursor.execute(sql + " GROUP BY client_id, status", params)
+        rows = cursor.fetchall()
+        conn.close()
+
+        live = {}
+        for row in rows:
+            current = live.setdefault(row['client_id'], {"queued": 0, "active": 0, "processing": 0})
+            key = "queued" if row['status'] == 'queued' else "processing" if row['status'] == 'processing' else "active"
+            current[key] += row['count']
+
+        with self._claim_lock, self._lock:
+            clients = [client_id] if client_id is not None else set(self._clients) | set(live)
+            # Mijozi yozilmagan eski yozuvlar "-" ostida
+            return {
+                client or "-": dict(
+                    self._clients.get(client, {}),
+                    **live.get(client, {"queued": 0, "active": 0, "processing": 0}),
+                    max_active=client_limit(client, "max_active"),
+                    max_queued=client_limit(client, "max_queued"),
+                    group_max_active=client_limit(client and client_group(client), "group_max_active"),
+                    group_max_queued=client_limit(client and client_group(client), "group_max_queued"),
+                    deficit=self._drr.deficit.get(client, 0),
+                )
+                for client in clients
+            }
+
+    def stats(self) -> dict:
+        queued = self._queued_count()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "heavy_running": sum(1 for p in self._running.values() if p >= config.DOWNLOAD_HEAVY_PRIORITY),
+                "queued": queued,
+                "max_queued": self.max_queued,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dedup_in_flight": self.dedup_in_flight,
+                "dedup_completed": self.dedup_completed,
+                "resumed": self.resumed,
+                "abandoned": self.abandoned,
+                "avg_duration": round(self.avg_duration, 2) if self.avg_duration is not None else None,
+            }
+
+
+# Singleton instance
+_download_queue = None
+
+def get_download_queue() -> DownloadQueue:
+    """DownloadQueue singleton olish"""
+    global _download_queue
+
+    if _download_queue is None:
+        _download_queue = DownloadQueue()
+
+    return _download_queue
@@ -1,19 +1,119 @@
+import copy
 import os
-import asyncio
-from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError
 from fastapi import HTTPException
 from database.operations import update_download_progress
-from utils.quality_mapper import get_best_format_for_quality
+from utils.quality_mapper import get_best_format_for_quality, select_format
+from services.info_service import get_cached_formats, remember_formats
 from utils.proxy_manager import get_proxy
+from utils.url_canonical import cache_key, canonical_url
+from utils.resolved_info import get_resolved_info_store
+from utils.ydl_pool import get_ydl_pool
+from services.artifact_store import get_artifact_store
+from services.bandwidth import get_bandwidth_scheduler
 import config
 
-async def download_video(download_id: str, url: str, format_id: str = None, quality: str = None, output_dir: str = "downloads", use_proxy: bool = True):
+def audio_format_spec(audio_format: str = None, bitrate: int = None) -> str:
+    """MP3 sifatidagi audio profili: original yoki mp3-<bitreyt>"""
+    if audio_format == "original":
+        return "original"
+    return f"mp3-{bitrate or config.AUDIO_DEFAULT_BITRATE}"
+
+def download_profile(quality: str = None, audio_format: str = None) -> str:
+    """Postprocessing profili: sifat yuklangan fayllardan keyin qaysi ffmpeg qadamlari ishlashini belgilaydi"""
+    if quality == "360p":
+        return "download"
+    if quality == "MP3":
+        spec = audio_format or audio_format_spec()
+        return "audio_original" if spec == "original" else f"audio_{spec.replace('-', '_')}"
+    return "download_merge"
+
+def download_dedup_key(url: str, format_id: str = None, quality: str = None, audio_format: str = None) -> str:
+    """Bir xil natija beradigan yuklashlar kaliti: (video, sifat yoki format, postprocessing)"""
+    return f"{cache_key(url)}|{quality or format_id}|{download_profile(quality, audio_format)}"
+
+def audio_source_key(url: str, format_id: str = None, quality: str = None, audio_format: str = None):
+    """MP3 ga o'giriladigan original audio kaliti (shu videoning o'zgartirilmagan audiosi) yoki None"""
+    if quality != "MP3":
+        return None
+    source_key = download_dedup_key(url, None, quality, "original")
+    return None if source_key == download_dedup_key(url, format_id, quality, audio_format) else source_key
+
+def _download_components(ydl, info: dict, state: dict) -> list:
+    """
+    Tanlangan formatlarni (video, audio) alohida fayllarga yuklash, birlashtirmasdan
+    
+    :return: [{"path", "vcodec", "acodec"}] - postprocessing rejasi kodeklarga qarab tuziladi
+    """
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    formats = selected.get('requested_formats') or [selected]
+    state['count'] = len(formats)
+    
+    streams = []
+    for index, fmt in enumerate(formats):
+        state['index'] = index
+        ydl.params['format'] = fmt['format_id']
+        ydl.format_selector = ydl.build_format_selector(fmt['format_id'])
+        result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+        streams.append({
+            "path": result['requested_downloads'][0]['filepath'],
+            "vcodec": fmt.get('vcodec'),
+            "acodec": fmt.get('acodec'),
+        })
+    return streams
+
+def fetch_download(download_id: str, url: str, format_id: str = None, quality: str = None, use_proxy: bool = True,
+                   audio_format: str = None, priority: int = config.DOWNLOAD_DEFAULT_PRIORITY) -> dict:
+    """
+    1-bosqich: formatni tanlash va tarmoqdan yuklash (navbat ishchisi threadida)
+    
+    ffmpeg bu yerda ishlamaydi: birlashtirish va o'girish keyingi bosqichda.
+    
+    MP3 uchun shu videoning original audiosi omborda bo'lsa, tarmoqqa chiqilmaydi;
+    aks holda yuklangan original keyingi bitreytlar uchun omborga yoziladi.
+    
+    :param priority: Navbat sinfi (tarmoq kengligidagi ulush vazni)
+    :return: Keyingi bosqichlar uchun {"artifact_key", "profile", "streams", "inputs", "output_base", "title",
+             "video_key", "cache_hit"}
+    """
+    # Playlist yoki vaqt parametrlari yuklashga ta'sir qilmasligi uchun
+    url = canonical_url(url)
+    # Fayl nomi so'ralgan sifat/format va profil bo'yicha (tanlangan format keyin aniqlanadi)
+    artifact_key = download_dedup_key(url, format_id, quality, audio_format)
+    profile = download_profile(quality, audio_format)
+    video_key = cache_key(url)
+    artifacts = get_artifact_store()
+    
+    # O'giriladigan audio uchun manba: shu videoning o'zgartirilmagan audiosi
+    source_key = audio_source_key(url, format_id, quality, audio_format)
+    
     try:
+        source = artifacts.lookup(source_key) if source_key else None
+        if source is not None:
+            update_download_progress(download_id, status='starting', cache_hit='source')
+            return {
+                "artifact_key": artifact_key,
+                "profile": profile,
+                "streams": [{"path": source['path'], "vcodec": "none", "acodec": None}],
+                # Ombordagi fayl o'chirilmaydi
+                "inputs": [],
+                "output_base": artifacts.output_base(artifact_key),
+                "title": source['title'],
+                "video_key": video_key,
+                "cache_hit": "source",
+            }
+        
+        selection = None
         if format_id is None and quality is not None:
-            if quality == "360p":
+            # Avval keshdagi format ro'yxatidan tarmoqsiz tanlash (audio jufti bilan)
+            cached_formats = get_cached_formats(url)
+            if cached_formats:
+                selection = select_format(cached_formats, quality)
+            
+            if selection is not None:
+                format_id = selection['format_id']
+            elif quality == "360p":
                 format_id = "18"
-                if not format_id:
-                    format_id = get_best_format_for_quality(url, quality, require_audio=True)
             else:
                 format_id = get_best_format_for_quality(url, quality)
             
@@ -22,14 +122,32 @@ async def download_video(download_id: str, url: str, format_id: str = None, qual
                 update_download_progress(download_id, status='error', error_message=error_msg)
                 raise HTTPException(status_code=404, detail=error_msg)
         
-        update_download_progress(download_id, format_id=format_id, status='starting')
+        if selection is not None:
+            update_download_progress(
+                download_id,
+                format_id=selection['format_spec'],
+                selected_quality=selection['quality'],
+                status='starting'
+            )
+        else:
+            update_download_progress(download_id, format_id=format_id, status='starting')
+        
+        # Bir nechta format ketma-ket yuklanadi: progress umumiy hisoblanadi
+        state = {'index': 0, 'count': 1, 'done_bytes': 0, 'seen_bytes': None}
+        bandwidth = get_bandwidth_scheduler()
         
         def custom_progress_hook(d):
             if d['status'] == 'downloading':
+                # Birinchi chaqiriqda .part fayldagi (davom ettirilgan) baytlar hisobga olinmaydi
+                seen = d.get('downloaded_bytes') or 0
+                if state['seen_bytes'] is not None:
+                    bandwidth.consume(download_id, seen - state['seen_bytes'])
+                state['seen_bytes'] = seen
+                
                 progress_data = {
                     'status': 'downloading',
-                    'downloaded_bytes': d.get('downloaded_bytes'),
-                    'total_bytes': d.get('total_bytes'),
+                    'downloaded_bytes': state['done_bytes'] + (d.get('downloaded_bytes') or 0),
+                    'total_bytes': d.get('total_bytes') and state['done_bytes'] + d['total_bytes'],
                     'eta': d.get('eta'),
                     'speed': d.get('speed'),
                     'filename': d.get('filename')
@@ -37,63 +155,98 @@ async def download_video(download_id: str, url: str, format_id: str = None, qual
                 
                 total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
                 if total_bytes and d.get('downloaded_bytes'):
-                    progress_data['progress'] = d.get('downloaded_bytes') / total_bytes * 100
+                    fraction = d.get('downloaded_bytes') / total_bytes
+                    progress_data['progress'] = (state['index'] + fraction) / state['count'] * 100
                     
                 update_download_progress(download_id, **progress_data)
                 
             elif d['status'] == 'finished':
-                download_info = d.get('info_dict', {})
-                if ('_mp4' in d.get('filename', '') and 'Merger' in download_info.get('__class__', '')) or 'requested_formats' not in download_info:
-                    update_download_progress(
-                        download_id, 
-                        status='finished',
-                        progress=100,
-                        filename=d.get('filename')
-                    )
-        
-        ydl_opts = {
-            'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
-            'progress_hooks': [custom_progress_hook],
-            'quiet': False,
-            'no_warnings': False,
-            'cookiefile': 'youtube.com_cookies.txt',
-        }
+                state['done_bytes'] += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                state['seen_bytes'] = None
         
         if quality == "360p":
-            ydl_opts['format'] = format_id
+            ydl_format = selection['format_spec'] if selection is not None else format_id
         elif quality == "MP3":
-            ydl_opts['format'] = 'bestaudio/best'
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
+            ydl_format = 'bestaudio/best'
+            if selection is not None:
+                ydl_format = f"{selection['format_spec']}/bestaudio/best"
         else:
-            ydl_opts['format'] = f"{format_id}+bestaudio/best" if format_id else 'bestvideo+bestaudio/best'
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegVideoConvertor',
-                'preferedformat': 'mp4',
-            }]
+            # mp4/m4a juftlari afzal: ular ffmpeg da qayta kodlashsiz birlashtiriladi
+            if format_id:
+                ydl_format = f"{format_id}+bestaudio[ext=m4a]/{format_id}+bestaudio/best"
+            else:
+                ydl_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best'
+            if selection is not None:
+                ydl_format = f"{selection['format_spec']}/{ydl_format}"
         
-        if use_proxy:
-            proxy = get_proxy()
-            if proxy:
-                ydl_opts['proxy'] = proxy
+        proxy = get_proxy() if use_proxy else None
+        store = get_resolved_info_store()
         
-        def download_task():
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+        with get_ydl_pool().checkout(
+            "download",
+            proxy=proxy,
+            format=ydl_format,
+            progress_hooks=[custom_progress_hook],
+            outtmpl=artifacts.output_template(artifact_key, part="f%(format_id)s")
+        ) as ydl:
+            # Ulush (ratelimit) shu obyektning params iga yoziladi; havzaga qaytarishda tiklanadi
+            bandwidth.register(download_id, priority, ydl.params)
+            try:
+                info = None
+                streams = None
+                resolved = store.get(video_key, proxy)
+                if resolved is not None:
+                    try:
+                        # Oldingi extract_info natijasi bilan qayta extract qilmasdan yuklash
+                        streams = _download_components(ydl, resolved, state)
+                        info = resolved
+                    except DownloadError:
+                        # Imzolangan URL rad etildi: yangidan extract qilinadi
+                        store.discard(video_key, proxy)
                 
-                if info and 'requested_downloads' in info and info['requested_downloads']:
-                    filename = info['requested_downloads'][0].get('filepath', '').split('/')[-1]
-                    update_download_progress(download_id, filename=filename)
-                
-                return info
+                if streams is None:
+                    info = ydl.sanitize_info(ydl.extract_info(url, download=False), True)
+                    store.put(video_key, info, proxy)
+                    remember_formats(video_key, info.get('formats'))
+                    streams = _download_components(ydl, info, state)
+            finally:
+                bandwidth.release(download_id)
+        
+        inputs = [stream['path'] for stream in streams]
+        if source_key:
+            # Original audio omborda qoladi: keyingi bitreyt yoki "original" so'rovi tarmoqsiz bajariladi
+            stream = streams[0]
+            kept = artifacts.output_base(source_key) + os.path.splitext(stream['path'])[1]
+            os.replace(stream['path'], kept)
+            artifacts.register(source_key, kept, info.get('title'), video_key, download_profile(quality, "original"))
+            stream['path'] = kept
+            inputs = []
         
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, download_task)
-        update_download_progress(download_id, status='completed', progress=100)
+        return {
+            "artifact_key": artifact_key,
+            "profile": profile,
+            "streams": streams,
+            "inputs": inputs,
+            "output_base": artifacts.output_base(artifact_key),
+            "title": info.get('title'),
+            "video_key": video_key,
+            "cache_hit": "miss",
+        }
         
     except Exception as e:
         update_download_progress(download_id, status='error', error_message=str(e))
-        raise e
\ No newline at end of file
+        raise e
+
+def finalize_download(fetched: dict, output: str, rename: bool = False) -> str:
+    """
+    3-bosqich: yakuniy faylni omborga yozish
+    
+    :param rename: ffmpeg qadami bo'lmasa, yuklangan fayl yakuniy nomga ko'chiriladi
+    :return: /downloads/{filename} uchun alias
+    """
+    if rename and fetched['inputs'][0] != output:
+        os.replace(fetched['inputs'][0], output)
+    
+    return get_artifact_store().register(
+        fetched['artifact_key'], output, fetched['title'], fetched['video_key'], fetched['profile']
+    )
\ No newline at end of file
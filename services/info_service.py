@@ -1,67 +1,173 @@
-from yt_dlp import YoutubeDL
+import logging
+import threading
+import time
 from fastapi import HTTPException
-from database.operations import get_from_cache, save_to_cache
-from utils.quality_mapper import map_resolution_to_standard
+from database.operations import get_from_cache, get_cache_entry, save_to_cache
+from utils.quality_mapper import build_quality_formats, compact_formats
+from utils.single_flight import SingleFlight
+from utils.bounded_executor import BoundedExecutor, QueueFullError
+from utils.url_canonical import cache_key, canonical_url
+from utils.resolved_info import get_resolved_info_store
+from utils.ydl_pool import get_ydl_pool
+import config
+
+logger = logging.getLogger('info_service')
+
+# Bir xil URL uchun parallel extract_info chaqiruvlarini birlashtirish
+_info_flight = SingleFlight()
+
+# extract_info sinxron va sekin: alohida, chegaralangan poolda bajariladi
+_info_executor = BoundedExecutor(
+    "info",
+    max_workers=config.INFO_POOL_WORKERS,
+    max_queue=config.INFO_QUEUE_MAX
+)
+
+# Fonda yangilanayotgan kalitlar (har bir kalit uchun bitta yangilash)
+_refresh_lock = threading.Lock()
+_refreshing = set()
+_refresh_stats = {
+    "stale_served": 0,
+    "refreshes_scheduled": 0,
+    "refresh_errors": 0
+}
 
 def get_video_info(url: str) -> dict:
-    cached_data = get_from_cache(url)
+    cached_data = get_cached_video_info(url)
+    if cached_data:
+        return cached_data
+    
+    key = cache_key(url)
+    return _info_flight.do(key, _extract_video_info, key, canonical_url(url))
+
+def get_cached_video_info(url: str):
+    """
+    Faqat keshdan javob berish (extract_info chaqirilmaydi)
+    
+    :return: Video ma'lumotlari yoki None
+    """
+    # Turli ko'rinishdagi URL lar (youtu.be, shorts, &t=...) bitta kalitga tushadi
+    key = cache_key(url)
+    entry = get_cache_entry(key)
+    if entry is None:
+        return None
+    
+    cached_data, timestamp = entry
+    if time.time() - timestamp <= config.CACHE_TIMEOUT:
+        return cached_data
+    
+    # Soft TTL o'tgan, lekin hard TTL ichida: eskisini berib, fonda yangilaymiz
+    if config.CACHE_STALE_WHILE_REVALIDATE:
+        _schedule_refresh(key, canonical_url(url))
+        with _refresh_lock:
+            _refresh_stats["stale_served"] += 1
+        return cached_data
+    
+    return None
+
+async def get_video_info_async(url: str) -> dict:
+    """
+    Video ma'lumotlari (event loop bloklanmaydi)
+    
+    Kesh event loopda tekshiriladi; bir xil URL ni kutayotganlar leaderning natijasini
+    await qiladi, info poolidan faqat leader extract_info uchun thread oladi.
+    
+    :raises asyncio.TimeoutError: INFO_TIMEOUT dan oshsa
+    :raises QueueFullError: Pool navbati to'lgan bo'lsa
+    """
+    cached_data = get_cached_video_info(url)
     if cached_data:
         return cached_data
     
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'writeinfojson': True,
-        'skip_download': True
-    }
+    key = cache_key(url)
+    return await _info_flight.do_async(key, run_info_task, _extract_video_info, key, canonical_url(url))
+
+async def run_info_task(fn, *args):
+    """Sinxron extract_info vazifasini info poolida INFO_TIMEOUT bilan bajarish"""
+    return await _info_executor.run(fn, *args, timeout=config.INFO_TIMEOUT)
+
+def _schedule_refresh(key: str, url: str):
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+        _refresh_stats["refreshes_scheduled"] += 1
+    
+    try:
+        _info_executor.submit(_refresh_task, key, url)
+    except QueueFullError:
+        # Pool band bo'lsa yangilash keyingi so'rovga qoldiriladi
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+def _refresh_task(key: str, url: str):
+    try:
+        _info_flight.do(key, _extract_video_info, key, url)
+    except Exception as e:
+        with _refresh_lock:
+            _refresh_stats["refresh_errors"] += 1
+        logger.warning(f"Keshni fonda yangilashda xatolik: {key}, Xatolik: {str(e)}")
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+def get_info_flight_stats() -> dict:
+    """Birlashtirilgan va leader chaqiruvlar statistikasi"""
+    return _info_flight.stats()
+
+def get_info_executor_stats() -> dict:
+    """Info pool navbati va kutish vaqti metrikalari"""
+    return _info_executor.stats()
+
+def get_info_refresh_stats() -> dict:
+    """Stale-while-revalidate statistikasi"""
+    with _refresh_lock:
+        return dict(_refresh_stats, refreshing=len(_refreshing))
+
+def _formats_cache_key(key: str) -> str:
+    return f"formats:{key}"
+
+def remember_formats(key: str, formats):
+    """
+    Format ro'yxatini offline format tanlash uchun keshga yozish
+    
+    Format ID lar (itag) barqaror, imzolangan URL lar esa saqlanmaydi.
+    """
+    if formats:
+        save_to_cache(_formats_cache_key(key), compact_formats(formats))
+
+def get_cached_formats(url: str):
+    """
+    Video uchun saqlangan format ro'yxati (tarmoqqa murojaatsiz)
+    
+    :return: Formatlar ro'yxati yoki None
+    """
+    key = cache_key(url)
+    entry = get_cache_entry(_formats_cache_key(key))
+    if entry is not None:
+        return entry[0]
+    
+    resolved = get_resolved_info_store().get(key)
+    if resolved is not None and resolved.get('formats'):
+        return compact_formats(resolved['formats'])
+    
+    return None
+
+def _extract_video_info(key: str, url: str) -> dict:
+    # Leader kutish paytida boshqa chaqiruv keshni to'ldirgan bo'lishi mumkin
+    cached_data = get_from_cache(key)
+    if cached_data:
+        return cached_data
     
     try:
-        with YoutubeDL(ydl_opts) as ydl:
+        with get_ydl_pool().checkout("info") as ydl:
             info = ydl.extract_info(url, download=False)
             
-            seen_qualities = set()
-            formats = []
-            
-            quality_order = {
-                "MP3": 0, "144p": 1, "240p": 2, "360p": 3, "480p": 4,
-                "720p": 5, "1080p": 6, "2K": 7, "4K": 8
-            }
-            
-            if "formats" in info:
-                sorted_formats = sorted(
-                    info.get("formats", []),
-                    key=lambda x: (
-                        0 if x.get("acodec") != "none" and x.get("vcodec") != "none" else 1,
-                        -(x.get("height") or 0)
-                    )
-                )
-                
-                for format_data in sorted_formats:
-                    quality = map_resolution_to_standard(format_data)
-                    
-                    if quality is None or quality in seen_qualities:
-                        continue
-                    
-                    filesize = format_data.get("filesize")
-                    
-                    if filesize is None:
-                        filesize = format_data.get("file_size")
-                    if filesize is None:
-                        filesize = format_data.get("filesize_approx")
-                    
-                    if filesize is None and info.get("duration") and format_data.get("tbr"):
-                        filesize = int((format_data.get("tbr", 0) * info.get("duration", 0) * 1000) / 8)
-                    
-                    formats.append({
-                        "format_id": format_data.get("format_id"),
-                        "quality": quality,
-                        "ext": format_data.get("ext", ""),
-                        "filesize": filesize
-                    })
-                    
-                    seen_qualities.add(quality)
+            # Keyingi format tanlash va yuklash qaytadan extract qilmasligi uchun
+            get_resolved_info_store().put(key, ydl.sanitize_info(info, True))
+            remember_formats(key, info.get("formats"))
             
-            formats = sorted(formats, key=lambda x: quality_order.get(x["quality"], 999))
+            formats = build_quality_formats(info.get("formats") or [], info.get("duration"))
             
             result = {
                 "url": url,
@@ -75,7 +181,7 @@ def get_video_info(url: str) -> dict:
                 "formats": formats
             }
             
-            save_to_cache(url, result)
+            save_to_cache(key, result)
             
             return result
     except Exception as e:
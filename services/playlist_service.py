@@ -0,0 +1,155 @@
+import asyncio
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from database.operations import get_from_cache, save_to_cache
+from services.info_service import get_cached_video_info, get_video_info_async, run_info_task
+from utils.single_flight import SingleFlight
+from utils.ydl_pool import get_ydl_pool
+from utils.url_canonical import canonicalize_collection, collection_url, cache_key, canonical_url
+import config
+
+# Bir xil sahifa uchun parallel extract_info chaqiruvlarini birlashtirish
+_page_flight = SingleFlight()
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Noto'g'ri cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Noto'g'ri cursor")
+    return offset
+
+
+def _flat_entry(entry: dict) -> Optional[dict]:
+    """extract_flat natijasidagi yozuvni qisqa ko'rinishga keltirish"""
+    video_url = entry.get("url") or entry.get("webpage_url") or entry.get("id")
+    if not video_url:
+        return None
+
+    key = cache_key(video_url)
+    if not key.startswith("youtube:"):
+        # Ichma-ich playlist yoki tanilmagan yozuv
+        return None
+
+    thumbnails = entry.get("thumbnails") or []
+    thumbnail = entry.get("thumbnail") or (thumbnails[-1].get("url") if thumbnails else None)
+
+    return {
+        "video_id": key.split(":", 1)[1],
+        "url": canonical_url(video_url),
+        "title": entry.get("title"),
+        "duration": entry.get("duration"),
+        "thumbnail": thumbnail,
+        "author": entry.get("uploader") or entry.get("channel"),
+        "view_count": entry.get("view_count"),
+    }
+
+
+def _extract_page(kind: str, collection_id: str, offset: int, limit: int) -> dict:
+    page_key = f"{kind}:{collection_id}:{offset}:{limit}"
+    cached_page = get_from_cache(page_key)
+    if cached_page:
+        return cached_page
+
+    # Keyingi sahifa bor-yo'qligini bilish uchun bitta ortiqcha yozuv so'raladi
+    try:
+        with get_ydl_pool().checkout("playlist", playliststart=offset + 1, playlistend=offset + limit + 1) as ydl:
+            info = ydl.extract_info(collection_url(kind, collection_id), download=False)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    raw_entries = list(info.get("entries") or [])
+    has_more = len(raw_entries) > limit
+    entries = [e for e in (_flat_entry(raw) for raw in raw_entries[:limit] if raw) if e]
+
+    page = {
+        "id": collection_id,
+        "type": "playlist" if kind == "youtube_playlist" else "channel",
+        "title": info.get("title"),
+        "author": info.get("uploader") or info.get("channel"),
+        "entry_count": info.get("playlist_count"),
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": str(offset + limit) if has_more else None,
+        "entries": entries,
+    }
+
+    save_to_cache(page_key, page)
+    return page
+
+
+def _page_params(url: str, cursor: Optional[str], limit: Optional[int]) -> Tuple[str, str, int, int]:
+    collection = canonicalize_collection(url)
+    if collection is None:
+        raise HTTPException(status_code=400, detail="URL YouTube playlist yoki kanal bo'lishi kerak")
+
+    offset = _decode_cursor(cursor)
+    limit = min(max(limit or config.PLAYLIST_PAGE_SIZE, 1), config.PLAYLIST_MAX_PAGE_SIZE)
+    kind, collection_id = collection
+    return kind, collection_id, offset, limit
+
+
+def _with_cached_formats(page: dict) -> dict:
+    # Oldin to'liq olingan videolar uchun formatlar video keshidan qo'shiladi
+    entries = []
+    for entry in page["entries"]:
+        full_info = get_cached_video_info(entry["url"])
+        entries.append(dict(entry, formats=full_info.get("formats") if full_info else None))
+
+    return dict(page, entries=entries)
+
+
+def get_playlist_page(url: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> dict:
+    """
+    Playlist yoki kanal yozuvlarini sahifalab olish (format ma'lumotlarisiz)
+
+    :param cursor: Oldingi sahifadagi next_cursor (birinchi sahifa uchun None)
+    :param limit: Sahifadagi yozuvlar soni
+    """
+    kind, collection_id, offset, limit = _page_params(url, cursor, limit)
+    page_key = f"{kind}:{collection_id}:{offset}:{limit}"
+
+    page = _page_flight.do(page_key, _extract_page, kind, collection_id, offset, limit)
+    return _with_cached_formats(page)
+
+
+async def get_playlist_page_async(url: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> dict:
+    """
+    get_playlist_page ning asyncio varianti: keshdagi sahifa poolsiz beriladi,
+    bir xil sahifani kutayotganlardan faqat leader info poolida thread oladi
+    """
+    kind, collection_id, offset, limit = _page_params(url, cursor, limit)
+    page_key = f"{kind}:{collection_id}:{offset}:{limit}"
+
+    page = await asyncio.to_thread(get_from_cache, page_key)
+    if not page:
+        page = await _page_flight.do_async(
+            page_key, run_info_task, _extract_page, kind, collection_id, offset, limit
+        )
+    return await asyncio.to_thread(_with_cached_formats, page)
+
+
+async def resolve_playlist_entries(page: dict) -> dict:
+    """
+    Sahifadagi yozuvlar uchun format ma'lumotlarini olish
+
+    Natijalar video keshiga yoziladi, keyingi /youtube so'rovlari keshdan javob oladi.
+    """
+    semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+    async def resolve(entry: dict) -> dict:
+        if entry.get("formats") is not None:
+            return entry
+        async with semaphore:
+            try:
+                info = await get_video_info_async(entry["url"])
+                return dict(entry, formats=info.get("formats"))
+            except Exception as e:
+                return dict(entry, error=str(getattr(e, "detail", e)) or "Vaqt tugadi")
+
+    entries = await asyncio.gather(*(resolve(entry) for entry in page["entries"]))
+    return dict(page, entries=list(entries))
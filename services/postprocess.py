@@ -0,0 +1,153 @@
+import os
+import subprocess
+import time
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+from typing import List, Optional, Tuple
+
+# run_postprocess alohida jarayonda (ProcessPoolExecutor) bajariladi, shuning uchun
+# bu modul yengil importlar bilan cheklanadi: yt-dlp, baza va config kerak emas.
+
+# mp4 oilasidagi konteynerlar: bunday juftlar hech narsani o'zgartirmasdan birlashtiriladi
+_MP4_CONTAINERS = ('.mp4', '.m4a', '.m4v', '.mov')
+# mp4 ga qayta kodlamasdan (stream copy) joylanadigan kodeklar
+_MP4_VIDEO_CODECS = {'avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'hevc', 'av01', 'vp09', 'vp9'}
+_MP4_AUDIO_CODECS = {'mp4a', 'aac', 'mp3', 'ac-3', 'ec-3', 'opus', 'flac', 'alac'}
+
+# Postprocessing yo'llari (arzonidan qimmatiga)
+PATH_DIRECT = "direct"  # mp4/m4a fayllar: qayta nomlash yoki -c copy bilan birlashtirish
+PATH_REMUX = "remux"  # faqat konteyner o'zgaradi (masalan, VP9/Opus webm -> mp4), -c copy
+PATH_TRANSCODE = "transcode"  # kamida bitta oqim qayta kodlanadi
+
+
+def _step(name: str, args: List[str], output: str, fallback: Optional[List[str]] = None) -> dict:
+    return {"name": name, "args": args, "output": output, "fallback": fallback}
+
+
+def _ext(stream: dict) -> str:
+    return os.path.splitext(stream['path'])[1].lower()
+
+
+def _codec_ok(codec: Optional[str], allowed: set, stream: dict) -> bool:
+    if codec is None:
+        # Kodek noma'lum: konteyner mp4 bo'lsa, ichidagi oqim ham mos deb hisoblanadi
+        return _ext(stream) in _MP4_CONTAINERS
+    codec = codec.lower().split('.')[0]
+    return codec == 'none' or codec in allowed
+
+
+def plan_steps(profile: str, streams: List[dict], output_base: str) -> Tuple[str, List[dict], str]:
+    """
+    Yuklangan oqimlardan yakuniy faylgacha bo'lgan eng arzon ffmpeg yo'li
+
+    :param profile: download_profile() natijasi
+    :param streams: Yuklangan fayllar {"path", "vcodec", "acodec"} (video birinchi, audio keyin)
+    :param output_base: Kengaytmasiz yakuniy fayl yo'li
+    :return: (yakuniy fayl yo'li, qadamlar, yo'l); qadamlar bo'sh bo'lsa fayl faqat qayta nomlanadi
+    """
+    inputs = [stream['path'] for stream in streams]
+
+    if profile.startswith("audio_mp3_"):
+        output = f"{output_base}.mp3"
+        bitrate = profile.rsplit("_", 1)[1]
+        args = ["-i", inputs[0], "-vn", "-c:a", "libmp3lame", "-b:a", f"{bitrate}k"]
+        return output, [_step("extract_audio", args, output)], PATH_TRANSCODE
+
+    if profile != "download_merge" and len(streams) == 1:
+        # 360p birlashgan format yoki original audio (m4a/opus) o'zgarishsiz beriladi
+        return f"{output_base}{_ext(streams[0])}", [], PATH_DIRECT
+
+    # Qolgan hollarda video va audio bitta mp4 ga birlashtiriladi: 360p uchun ham birlashgan format
+    # bo'lmasa (yoki yaqin sifatga tushilsa) select_format alohida juft (masalan, 134+140) qaytaradi
+
+    output = f"{output_base}.mp4"
+    video_ok = all(_codec_ok(stream.get('vcodec'), _MP4_VIDEO_CODECS, stream) for stream in streams)
+    audio_ok = all(_codec_ok(stream.get('acodec'), _MP4_AUDIO_CODECS, stream) for stream in streams)
+
+    input_args = []
+    for path in inputs:
+        input_args += ["-i", path]
+    if len(inputs) > 1:
+        input_args += ["-map", "0:v:0", "-map", "1:a:0"]
+
+    # Faqat mos kelmagan oqim qayta kodlanadi
+    transcode_args = input_args + ["-c:v", "copy" if video_ok else "libx264",
+                                   "-c:a", "copy" if audio_ok else "aac"]
+
+    if not (video_ok and audio_ok):
+        return output, [_step("transcode", transcode_args, output)], PATH_TRANSCODE
+
+    if all(_ext(stream) in _MP4_CONTAINERS for stream in streams):
+        if len(inputs) == 1:
+            return output, [], PATH_DIRECT
+        return output, [_step("merge", input_args + ["-c", "copy"], output)], PATH_DIRECT
+
+    # Kodeklar mos, faqat konteyner o'zgaradi; ffmpeg rad etsa, oxirgi chora - qayta kodlash
+    full_transcode = input_args + ["-c:v", "libx264", "-c:a", "aac"]
+    return output, [_step("remux", input_args + ["-c", "copy"], output, fallback=full_transcode)], PATH_REMUX
+
+
+def _temp_path(output: str) -> str:
+    base, ext = os.path.splitext(output)
+    return f"{base}.pp{ext}"
+
+
+def _children_cpu() -> float:
+    """Shu jarayon ishga tushirgan (tugagan) ffmpeg jarayonlarining CPU vaqti"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _ffmpeg(task: dict, args: List[str], output: str) -> subprocess.CompletedProcess:
+    temp = _temp_path(output)
+    command = [task["ffmpeg"], "-y", "-nostdin", "-loglevel", "error", *args,
+               "-threads", str(task["threads"]), temp]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode == 0:
+        os.replace(temp, output)
+    elif os.path.exists(temp):
+        os.remove(temp)
+    return result
+
+
+def run_postprocess(task: dict) -> dict:
+    """
+    ffmpeg qadamlarini ketma-ket bajarish (jarayonlar havzasida)
+
+    :param task: {"steps", "inputs", "output", "ffmpeg", "threads", "path"}
+    :return: {"output", "started_at", "seconds", "cpu_seconds", "steps": {nomi: sekund}, "path"}
+    :raises RuntimeError: ffmpeg xatolik bilan tugasa
+    """
+    started_at = time.time()
+    cpu_started = _children_cpu()
+    path = task["path"]
+    timings = {}
+    for step in task["steps"]:
+        step_started = time.perf_counter()
+        result = _ffmpeg(task, step["args"], step["output"])
+        if result.returncode != 0 and step.get("fallback"):
+            # Stream copy qabul qilinmadi: qayta kodlash
+            path = PATH_TRANSCODE
+            result = _ffmpeg(task, step["fallback"], step["output"])
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg {step['name']} xatolik bilan tugadi: {result.stderr.strip()[-500:]}")
+        timings[step["name"]] = round(time.perf_counter() - step_started, 3)
+
+    # Oraliq fayllar (alohida formatlar) endi kerak emas
+    leftovers = set(task["inputs"]) | {step["output"] for step in task["steps"]}
+    for leftover in leftovers - {task["output"]}:
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    return {
+        "output": task["output"],
+        "started_at": started_at,
+        "seconds": round(time.time() - started_at, 3),
+        "cpu_seconds": round(_children_cpu() - cpu_started, 3),
+        "steps": timings,
+        "path": path,
+    }
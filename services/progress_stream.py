@@ -0,0 +1,235 @@
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from database.operations import get_download_progress
+from database.progress_buffer import get_progress_buffer
+from services.download_queue import get_download_queue
+from services.bandwidth import get_bandwidth_scheduler
+from utils.client_identity import client_group
+import config
+
+_FINAL_STATUSES = ('completed', 'error')
+
+
+class ProgressSubscription:
+    """
+    Bitta ulanishning progress obunasi:
+    - ProgressBuffer yangilanishlari (yuklash threadlaridan) o'zgargan ID lar to'plamiga yig'iladi
+    - Kadrlar PROGRESS_STREAM_FPS dan tez yuborilmaydi, oraliqdagi yangilanishlar bitta kadrga qo'shiladi
+    - Ergashuvchi yuklash yetakchining yangilanishlari bilan yangilanadi
+    - Yuklash tugaganda (completed/error) 'final' kadr yuboriladi va ID obunadan chiqariladi
+    """
+
+    def __init__(self, fps: float = config.PROGRESS_STREAM_FPS, resync: float = config.PROGRESS_STREAM_RESYNC,
+                 max_ids: int = config.PROGRESS_STREAM_MAX_IDS, until_done: bool = True):
+        """
+        :param fps: Sekundiga kadrlar
+        :param resync: Yangilanish bo'lmasa, kuzatilayotgan barcha ID lar qayta o'qiladigan oraliq
+        :param max_ids: Kuzatiladigan ID lar chegarasi
+        :param until_done: True - barcha yuklashlar tugagach oqim yopiladi (SSE)
+        """
+        self.interval = 1.0 / fps
+        self.resync = resync
+        self.max_ids = max_ids
+        self.until_done = until_done
+
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._lock = threading.Lock()
+        self._active: Set[str] = set()
+        # Yangilanadigan ID (o'zi yoki yetakchisi) -> obunadagi ID lar
+        self._watched: Dict[str, Set[str]] = {}
+        self._changed: Set[str] = set()
+        self.closed = False
+
+        get_progress_buffer().subscribe(self._on_update)
+
+    def _on_update(self, download_id: str):
+        # Yuklash threadida: faqat belgilab, event loopni uyg'otish
+        with self._lock:
+            targets = self._watched.get(download_id)
+            if not targets:
+                return
+            self._changed |= targets
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Event loop yopilgan
+            pass
+
+    def add(self, download_ids: Iterable[str]) -> List[str]:
+        """
+        ID larni obunaga qo'shish (joriy holati keyingi kadrda yuboriladi)
+
+        :return: Qo'shilgan ID lar (max_ids dan oshganlari tashlanadi)
+        """
+        added = []
+        with self._lock:
+            for download_id in download_ids:
+                if download_id in self._active:
+                    continue
+                if len(self._active) >= self.max_ids:
+                    break
+                self._active.add(download_id)
+                self._watched.setdefault(download_id, set()).add(download_id)
+                self._changed.add(download_id)
+                added.append(download_id)
+        if added:
+            self._event.set()
+        return added
+
+    def remove(self, download_ids: Iterable[str]):
+        with self._lock:
+            for download_id in download_ids:
+                self._forget(download_id)
+
+    def _forget(self, download_id: str):
+        # self._lock ushlab turilganda chaqiriladi
+        self._active.discard(download_id)
+        self._changed.discard(download_id)
+        for key in list(self._watched):
+            self._watched[key].discard(download_id)
+            if not self._watched[key]:
+                del self._watched[key]
+
+    def close(self):
+        """Obunani to'xtatish (events() sikli ham tugaydi)"""
+        if self.closed:
+            return
+        self.closed = True
+        get_progress_buffer().unsubscribe(self._on_update)
+        self._event.set()
+
+    @staticmethod
+    def _read(download_ids: Set[str]) -> List[Tuple[str, Optional[dict]]]:
+        frames = []
+        for download_id in download_ids:
+            progress = get_download_progress(download_id)
+            if progress is not None and progress.get('status') == 'queued':
+                queue_id = progress.get('leader_id') or download_id
+                progress.update(get_download_queue().queue_status(queue_id) or {})
+            if progress is not None and progress.get('status') not in _FINAL_STATUSES:
+                progress['bandwidth'] = get_bandwidth_scheduler().allocation(progress.get('leader_id') or download_id)
+            frames.append((download_id, progress))
+        return frames
+
+    async def events(self) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        (hodisa, ma'lumot) juftlari: 'progress', 'final' yoki 'missing' (ID topilmadi)
+        """
+        try:
+            while not self.closed and (self._active or not self.until_done):
+                try:
+                    await asyncio.wait_for(self._event.wait(), timeout=self.resync)
+                except asyncio.TimeoutError:
+                    # Bazaga to'g'ridan-to'g'ri yozilgan holatlar (navbatdan olish) ham yetib kelsin
+                    with self._lock:
+                        self._changed |= self._active
+                self._event.clear()
+
+                with self._lock:
+                    changed, self._changed = self._changed & self._active, set()
+                if not changed:
+                    continue
+
+                frames = await asyncio.to_thread(self._read, changed)
+                for download_id, progress in frames:
+                    if progress is None:
+                        with self._lock:
+                            self._forget(download_id)
+                        yield "missing", {"download_id": download_id}
+                        continue
+
+                    final = progress.get('status') in _FINAL_STATUSES
+                    with self._lock:
+                        if final:
+                            self._forget(download_id)
+                        elif download_id in self._active and progress.get('leader_id'):
+                            self._watched.setdefault(progress['leader_id'], set()).add(download_id)
+                    yield ("final" if final else "progress"), {"download_id": download_id, "data": progress}
+
+                # Kadrlar oralig'i: shu vaqtdagi yangilanishlar keyingi kadrga qo'shiladi
+                await asyncio.sleep(self.interval)
+        finally:
+            self.close()
+
+
+class StreamConnections:
+    """
+    Ochiq SSE va WebSocket ulanishlari soni mijoz guruhi (IP yoki API kalit) bo'yicha
+
+    slowapi faqat yangi so'rovlarni cheklaydi: uzoq yashaydigan ulanishlar shu yerda sanaladi.
+    """
+
+    def __init__(self, max_per_client: int = config.PROGRESS_STREAM_MAX_CONNECTIONS):
+        self.max_per_client = max_per_client
+        self._lock = threading.Lock()
+        self._open: Dict[str, int] = {}
+        self.rejected = 0
+
+    def acquire(self, client: str) -> bool:
+        """Ulanishni hisobga olish; chegara to'lgan bo'lsa False"""
+        group = client_group(client)
+        with self._lock:
+            if self._open.get(group, 0) >= self.max_per_client:
+                self.rejected += 1
+                return False
+            self._open[group] = self._open.get(group, 0) + 1
+            return True
+
+    def release(self, client: str):
+        group = client_group(client)
+        with self._lock:
+            count = self._open.get(group, 0) - 1
+            if count > 0:
+                self._open[group] = count
+            else:
+                self._open.pop(group, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": sum(self._open.values()),
+                "clients": len(self._open),
+                "max_per_client": self.max_per_client,
+                "rejected": self.rejected,
+            }
+
+
+def sse_frame(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def stream_progress_sse(download_ids: List[str], client: str) -> AsyncIterator[str]:
+    """
+    Server-Sent Events oqimi: barcha yuklashlar tugagach 'done' hodisasi bilan yopiladi
+
+    :param client: client_identity() - ochiq ulanishlar chegarasi uchun
+    """
+    # Ulanish oqim boshlanganda sanaladi: javob yuborilmasa, release ham kerak bo'lmaydi
+    connections = get_stream_connections()
+    if not connections.acquire(client):
+        yield sse_frame("error", {"error": f"Ochiq ulanishlar juda ko'p ({connections.max_per_client})"})
+        return
+    try:
+        subscription = ProgressSubscription()
+        subscription.add(download_ids)
+        async for event, payload in subscription.events():
+            yield sse_frame(event, payload)
+        yield sse_frame("done", {"download_ids": download_ids})
+    finally:
+        connections.release(client)
+
+
+# Singleton instance
+_stream_connections = None
+
+def get_stream_connections() -> StreamConnections:
+    """StreamConnections singleton olish"""
+    global _stream_connections
+
+    if _stream_connections is None:
+        _stream_connections = StreamConnections()
+
+    return _stream_connections
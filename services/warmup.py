@@ -0,0 +1,63 @@
+import logging
+from yt_dlp.extractor import get_info_extractor
+from database.connection import get_db_connection
+from database.operations import preload_memory_cache
+from utils.startup_profiler import get_startup_profiler
+from utils.url_canonical import canonical_url
+from utils.ydl_pool import get_ydl_pool
+import config
+
+logger = logging.getLogger('warmup')
+
+
+def _preload_extractors() -> int:
+    """YouTube extractor modullarini import qilish va URL regexlarini kompilyatsiya qilish"""
+    sample_url = canonical_url("https://youtu.be/dQw4w9WgXcQ")
+    for ie_key in config.WARMUP_EXTRACTORS:
+        ie_class = get_info_extractor(ie_key)
+        getattr(ie_class, 'real_class', ie_class)
+        ie_class.suitable(sample_url)
+    return len(config.WARMUP_EXTRACTORS)
+
+
+def _warm_database() -> int:
+    """Baza faylini va sqlite3 modulini qizdirish, eng so'nggi kesh yozuvlarini xotiraga olish"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM downloads")
+    cursor.execute("SELECT COUNT(*) FROM cache")
+    conn.close()
+
+    return preload_memory_cache(config.WARMUP_CACHE_PRELOAD)
+
+
+def _prewarm_ydl_pool() -> int:
+    pool = get_ydl_pool()
+    built = 0
+    for profile, count in config.WARMUP_YDL_PROFILES.items():
+        built += pool.prewarm(profile, count=count, extractors=config.WARMUP_EXTRACTORS)
+    return built
+
+
+def run_warmup() -> dict:
+    """
+    Birinchi so'rov to'laydigan kechiktirilgan ishlarni oldindan bajarish
+
+    Har bir qadam alohida o'lchanadi; xatolik ishga tushishni to'xtatmaydi.
+    """
+    profiler = get_startup_profiler()
+    steps = (
+        ("warmup.extractors", _preload_extractors),
+        ("warmup.database", _warm_database),
+        ("warmup.ydl_pool", _prewarm_ydl_pool),
+    )
+
+    result = {}
+    for name, step in steps:
+        with profiler.phase(name):
+            try:
+                result[name] = step()
+            except Exception as e:
+                logger.error(f"{name} bosqichida xatolik: {str(e)}")
+                result[name] = None
+    return result
@@ -0,0 +1,13 @@
+import pytest
+import config
+from database import progress_buffer
+from database.connection import init_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Har bir test uchun alohida SQLite baza va bo'sh ProgressBuffer"""
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "video_api.sql"))
+    monkeypatch.setattr(progress_buffer, "_progress_buffer", None)
+    init_db()
+    return tmp_path
@@ -0,0 +1,87 @@
+import pytest
+from database.operations import get_download_progress, update_download_progress
+from services import artifact_store
+from services.artifact_store import ArtifactStore
+from services.download_queue import DownloadQueue
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+SHORT_URL = "https://youtu.be/dQw4w9WgXcQ"
+
+
+@pytest.fixture
+def store(db, monkeypatch):
+    (db / "downloads").mkdir()
+    store = ArtifactStore(root=str(db / "downloads"), max_bytes=1 << 30, min_free_bytes=0)
+    monkeypatch.setattr(artifact_store, "_artifact_store", store)
+    return store
+
+
+@pytest.fixture
+def queue(store):
+    return DownloadQueue(workers=1)
+
+
+def test_same_video_and_quality_follows_in_flight_leader(queue):
+    queue.enqueue("leader", URL, quality="720p", use_proxy=False)
+    result = queue.enqueue("follower", SHORT_URL, quality="720p", use_proxy=False)
+
+    assert result["deduplicated"] == "in_flight"
+    assert result["leader_id"] == "leader"
+    assert get_download_progress("follower")["status"] == "queued"
+
+    # Boshqa sifat alohida yuklanadi
+    assert "deduplicated" not in queue.enqueue("other", URL, quality="1080p", use_proxy=False)
+
+
+def test_follower_sees_leader_progress(queue):
+    queue.enqueue("leader", URL, quality="720p", use_proxy=False)
+    queue.enqueue("follower", URL, quality="720p", use_proxy=False)
+
+    update_download_progress("leader", status="downloading", progress=40.0, downloaded_bytes=400)
+
+    progress = get_download_progress("follower")
+    assert progress["id"] == "follower"
+    assert progress["status"] == "downloading"
+    assert progress["progress"] == 40.0
+    assert progress["leader_id"] == "leader"
+
+
+def test_leader_result_is_copied_to_followers(queue):
+    queue.enqueue("leader", URL, quality="720p", use_proxy=False)
+    queue.enqueue("follower", URL, quality="720p", use_proxy=False)
+
+    update_download_progress("leader", status="completed", progress=100, filename="video [abcd1234].mp4")
+    queue._job_done("leader", True)
+
+    progress = get_download_progress("follower")
+    assert progress["status"] == "completed"
+    assert progress["filename"] == "video [abcd1234].mp4"
+
+
+def test_leader_error_is_copied_to_followers(queue):
+    queue.enqueue("leader", URL, quality="720p", use_proxy=False)
+    queue.enqueue("follower", URL, quality="720p", use_proxy=False)
+
+    update_download_progress("leader", status="error", error_message="Video mavjud emas")
+    queue._job_done("leader", False)
+
+    progress = get_download_progress("follower")
+    assert progress["status"] == "error"
+    assert progress["error_message"] == "Video mavjud emas"
+
+
+def test_completed_leader_with_file_answers_immediately(queue, store, db):
+    queue.enqueue("leader", URL, quality="720p", use_proxy=False)
+    path = db / "video.mp4"
+    path.write_bytes(b"x" * 16)
+    alias = store.register("video|720p|download_merge", str(path), "video")
+    update_download_progress("leader", status="completed", progress=100, filename=alias)
+    queue._job_done("leader", True)
+
+    result = queue.enqueue("again", URL, quality="720p", use_proxy=False)
+    assert result == {"deduplicated": "completed", "leader_id": "leader"}
+    assert get_download_progress("again")["filename"] == alias
+
+    # Fayl o'chirilgan bo'lsa, qayta yuklanadi
+    path.unlink()
+    assert "deduplicated" not in queue.enqueue("fresh", URL, quality="720p", use_proxy=False)
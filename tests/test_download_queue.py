@@ -0,0 +1,118 @@
+import pytest
+import config
+from database.connection import get_db_connection
+from database.operations import create_download_record
+from services.download_queue import DownloadQueue
+from utils.bounded_executor import QueueFullError
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_ACTIVE", 100)
+    monkeypatch.setattr(config, "DOWNLOAD_GROUP_MAX_ACTIVE", 100)
+    monkeypatch.setattr(config, "DOWNLOAD_MAX_HEAVY", 100)
+    monkeypatch.setattr(config, "DOWNLOAD_DRR_QUANTUM", 2)
+    monkeypatch.setattr(config, "DOWNLOAD_DRR_COST", {0: 1, 1: 1, 2: 2, 3: 4, 4: 8})
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_QUOTAS", {})
+    return DownloadQueue(workers=2)
+
+
+def add_job(download_id, client_id, priority=2, queued_at=None):
+    create_download_record(download_id, f"https://example.com/{download_id}", "best",
+                           status='queued', priority=priority, client_id=client_id)
+    # Bir xil queued_at bo'lmasligi uchun tartib qo'lda beriladi
+    conn = get_db_connection()
+    conn.execute("UPDATE downloads SET queued_at = ? WHERE id = ?",
+                 (queued_at if queued_at is not None else int(download_id[1:]), download_id))
+    conn.commit()
+    conn.close()
+
+
+def claim_all(queue):
+    order = []
+    while (job := queue._claim()) is not None:
+        order.append(job['id'])
+    return order
+
+
+def test_drr_alternates_between_clients(queue):
+    for index in range(3):
+        add_job(f"a{index}", "ip:1.1.1.1")
+    for index in range(2):
+        add_job(f"b{index}", "ip:2.2.2.2")
+
+    assert claim_all(queue) == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_drr_charges_heavy_jobs_more(queue):
+    add_job("a0", "ip:1.1.1.1", priority=4)
+    add_job("a1", "ip:1.1.1.1", priority=4)
+    for index in range(6):
+        add_job(f"b{index}", "ip:2.2.2.2", priority=1)
+
+    # 4K vazifasi narxi 8: A to'rt aylanishda kredit yig'guncha B har aylanishda ikkitadan oladi
+    assert claim_all(queue) == ["b0", "b1", "b2", "b3", "b4", "b5", "a0", "a1"]
+
+
+def test_client_max_active_quota(queue, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_ACTIVE", 1)
+    add_job("a0", "ip:1.1.1.1")
+    add_job("a1", "ip:1.1.1.1")
+    add_job("b0", "ip:2.2.2.2")
+
+    assert claim_all(queue) == ["a0", "b0"]
+    assert queue.queue_status("a1")["queue_position"] == 1
+
+
+def test_quota_override_per_client(queue, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_ACTIVE", 1)
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_QUOTAS", {"key:bot": {"max_active": 3}})
+    for index in range(3):
+        add_job(f"a{index}", "key:bot")
+
+    assert claim_all(queue) == ["a0", "a1", "a2"]
+
+
+def test_group_cap_ignores_rotated_client_ids(queue, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_ACTIVE", 1)
+    monkeypatch.setattr(config, "DOWNLOAD_GROUP_MAX_ACTIVE", 2)
+    for index, header in enumerate("xyz"):
+        add_job(f"a{index}", f"ip:1.1.1.1/{header}")
+    add_job("b3", "ip:2.2.2.2")
+
+    order = claim_all(queue)
+    assert len([download_id for download_id in order if download_id.startswith("a")]) == 2
+    assert "b3" in order
+
+
+def test_queue_status_predicts_claim_order(queue, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_ACTIVE", 2)
+    for index in range(4):
+        add_job(f"a{index}", "ip:1.1.1.1")
+    add_job("b4", "ip:2.2.2.2")
+    add_job("b5", "ip:2.2.2.2", priority=4)
+
+    predicted = {
+        download_id: queue.queue_status(download_id)["queue_position"]
+        for download_id in ("a0", "a1", "a2", "a3", "b4", "b5")
+    }
+    order = claim_all(queue)
+    assert [download_id for download_id, _ in sorted(predicted.items(), key=lambda item: item[1])][:len(order)] == order
+
+
+def test_enqueue_rejects_over_client_and_group_quota(queue, monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_CLIENT_MAX_QUEUED", 2)
+    monkeypatch.setattr(config, "DOWNLOAD_GROUP_MAX_QUEUED", 3)
+
+    queue.enqueue("a0", "https://example.com/a0", "best", client_id="ip:1.1.1.1/x")
+    queue.enqueue("a1", "https://example.com/a1", "best", client_id="ip:1.1.1.1/x")
+    with pytest.raises(QueueFullError):
+        queue.enqueue("a2", "https://example.com/a2", "best", client_id="ip:1.1.1.1/x")
+
+    # Boshqa X-Client-Id bilan ham IP bo'yicha umumiy chegaradan oshib bo'lmaydi
+    queue.enqueue("a3", "https://example.com/a3", "best", client_id="ip:1.1.1.1/y")
+    with pytest.raises(QueueFullError):
+        queue.enqueue("a4", "https://example.com/a4", "best", client_id="ip:1.1.1.1/z")
+
+    queue.enqueue("b0", "https://example.com/b0", "best", client_id="ip:2.2.2.2")
+    assert queue.client_usage("ip:1.1.1.1/x")["ip:1.1.1.1/x"]["rejected"] == 1
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import time
+from services import info_service
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def test_cache_hit_is_served_without_pool(monkeypatch):
+    async def no_pool(fn, *args):
+        raise AssertionError("kesh bo'lsa info pooli ishlatilmaydi")
+
+    monkeypatch.setattr(info_service, "get_cached_video_info", lambda url: {"title": "cached"})
+    monkeypatch.setattr(info_service, "run_info_task", no_pool)
+
+    assert asyncio.run(info_service.get_video_info_async(URL)) == {"title": "cached"}
+
+
+def test_concurrent_requests_use_one_pool_thread(monkeypatch):
+    threads = []
+
+    def extract(key, url):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return {"key": key, "url": url}
+
+    monkeypatch.setattr(info_service, "get_cached_video_info", lambda url: None)
+    monkeypatch.setattr(info_service, "_extract_video_info", extract)
+
+    async def main():
+        urls = [URL, "https://youtu.be/dQw4w9WgXcQ"] * 6
+        return await asyncio.gather(*(info_service.get_video_info_async(url) for url in urls))
+
+    results = asyncio.run(main())
+
+    assert len(threads) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]["key"] == "youtube:dQw4w9WgXcQ"
@@ -0,0 +1,73 @@
+from services.postprocess import plan_steps, PATH_DIRECT, PATH_REMUX, PATH_TRANSCODE
+
+
+def stream(path, vcodec=None, acodec=None):
+    return {"path": path, "vcodec": vcodec, "acodec": acodec}
+
+
+MP4_VIDEO = stream("/d/x.f137.mp4", "avc1.640028", "none")
+M4A_AUDIO = stream("/d/x.f140.m4a", "none", "mp4a.40.2")
+WEBM_VIDEO = stream("/d/x.f248.webm", "vp9", "none")
+OPUS_AUDIO = stream("/d/x.f251.webm", "none", "opus")
+
+
+def step_names(steps):
+    return [step["name"] for step in steps]
+
+
+def test_download_single_combined_file_is_renamed():
+    output, steps, path = plan_steps("download", [stream("/d/x.f18.mp4", "avc1", "mp4a")], "/d/out")
+    assert (output, steps, path) == ("/d/out.mp4", [], PATH_DIRECT)
+
+
+def test_download_split_pair_is_merged():
+    # 360p uchun birlashgan format bo'lmasa, alohida juft ham birlashtiriladi
+    output, steps, path = plan_steps("download", [MP4_VIDEO, M4A_AUDIO], "/d/out")
+    assert output == "/d/out.mp4"
+    assert step_names(steps) == ["merge"]
+    assert path == PATH_DIRECT
+
+
+def test_merge_mp4_pair_uses_stream_copy():
+    output, steps, path = plan_steps("download_merge", [MP4_VIDEO, M4A_AUDIO], "/d/out")
+    assert output == "/d/out.mp4"
+    assert step_names(steps) == ["merge"]
+    assert steps[0]["args"][-2:] == ["-c", "copy"]
+    assert path == PATH_DIRECT
+
+
+def test_merge_webm_pair_is_remuxed_with_transcode_fallback():
+    output, steps, path = plan_steps("download_merge", [WEBM_VIDEO, OPUS_AUDIO], "/d/out")
+    assert output == "/d/out.mp4"
+    assert step_names(steps) == ["remux"]
+    assert "libx264" in steps[0]["fallback"]
+    assert path == PATH_REMUX
+
+
+def test_merge_incompatible_codec_is_transcoded():
+    vorbis = stream("/d/x.f171.webm", "none", "vorbis")
+    output, steps, path = plan_steps("download_merge", [MP4_VIDEO, vorbis], "/d/out")
+    assert step_names(steps) == ["transcode"]
+    # Faqat mos kelmagan audio qayta kodlanadi
+    args = steps[0]["args"]
+    assert args[args.index("-c:v") + 1] == "copy"
+    assert args[args.index("-c:a") + 1] == "aac"
+    assert path == PATH_TRANSCODE
+
+
+def test_merge_single_mp4_needs_no_steps():
+    output, steps, path = plan_steps("download_merge", [stream("/d/x.f22.mp4", "avc1", "mp4a")], "/d/out")
+    assert (output, steps, path) == ("/d/out.mp4", [], PATH_DIRECT)
+
+
+def test_audio_original_keeps_container():
+    output, steps, path = plan_steps("audio_original", [OPUS_AUDIO], "/d/out")
+    assert (output, steps, path) == ("/d/out.webm", [], PATH_DIRECT)
+
+
+def test_audio_mp3_extracts_with_profile_bitrate():
+    output, steps, path = plan_steps("audio_mp3_192", [M4A_AUDIO], "/d/out")
+    assert output == "/d/out.mp3"
+    assert step_names(steps) == ["extract_audio"]
+    assert steps[0]["args"][-2:] == ["-b:a", "192k"]
+    assert path == PATH_TRANSCODE
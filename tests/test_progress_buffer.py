@@ -0,0 +1,100 @@
+import pytest
+from database.connection import get_db_connection
+from database.operations import create_download_record
+from database.progress_buffer import ProgressBuffer
+
+
+@pytest.fixture
+def buffer(db):
+    create_download_record("d1", "https://example.com/d1", "best", status='starting')
+    create_download_record("d2", "https://example.com/d2", "best", status='starting')
+    return ProgressBuffer(interval=60)
+
+
+def stored(download_id):
+    conn = get_db_connection()
+    record = conn.execute('SELECT * FROM downloads WHERE id = ?', (download_id,)).fetchone()
+    conn.close()
+    return dict(record)
+
+
+def test_progress_updates_stay_in_memory_until_flush(buffer):
+    for percent in range(1, 51):
+        buffer.update("d1", {"status": "downloading", "progress": float(percent), "downloaded_bytes": percent})
+
+    assert stored("d1")["status"] == "starting"
+    assert buffer.get("d1")["progress"] == 50.0
+
+    assert buffer.flush() == 1
+    record = stored("d1")
+    assert record["status"] == "downloading"
+    assert record["progress"] == 50.0
+    assert buffer.stats()["rows_flushed"] == 1
+    assert buffer.flush() == 0
+
+
+def test_flush_batches_all_dirty_rows(buffer):
+    buffer.update("d1", {"status": "downloading", "progress": 10.0})
+    buffer.update("d2", {"status": "downloading", "progress": 20.0})
+
+    assert buffer.flush() == 2
+    assert (stored("d1")["progress"], stored("d2")["progress"]) == (10.0, 20.0)
+    assert buffer.stats()["flushes"] == 1
+
+
+def test_terminal_status_writes_through_with_pending_progress(buffer):
+    buffer.update("d1", {"status": "downloading", "progress": 90.0, "total_bytes": 1000})
+    buffer.update("d1", {"status": "completed", "progress": 100, "filename": "video.mp4"})
+
+    record = stored("d1")
+    assert record["status"] == "completed"
+    assert record["filename"] == "video.mp4"
+    assert record["total_bytes"] == 1000
+    # Xotiradagi nusxa olib tashlanadi: keyingi o'qishlar bazadan
+    assert buffer.get("d1") is None
+    assert buffer.flush() == 0
+
+
+def test_non_progress_fields_write_through(buffer):
+    buffer.update("d1", {"status": "downloading", "progress": 5.0})
+    buffer.update("d1", {"error_message": "Tarmoq xatosi", "status": "error"})
+
+    record = stored("d1")
+    assert record["status"] == "error"
+    assert record["error_message"] == "Tarmoq xatosi"
+    assert record["progress"] == 5.0
+    assert buffer.stats()["written_through"] == 1
+
+
+def test_failed_flush_keeps_pending_progress(buffer, monkeypatch):
+    buffer.update("d1", {"status": "downloading", "progress": 30.0})
+
+    def broken_write(cursor, download_id, fields):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(buffer, "_write", broken_write)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    monkeypatch.delattr(buffer, "_write")
+
+    buffer.update("d1", {"status": "downloading", "progress": 35.0})
+    assert buffer.flush() == 1
+    assert stored("d1")["progress"] == 35.0
+
+
+def test_subscribers_are_notified(buffer):
+    seen = []
+    listener = seen.append
+    buffer.subscribe(listener)
+    buffer.update("d1", {"status": "downloading", "progress": 1.0})
+    buffer.update("d2", {"status": "completed"})
+    buffer.unsubscribe(listener)
+    buffer.update("d1", {"status": "downloading", "progress": 2.0})
+
+    assert seen == ["d1", "d2"]
+
+
+def test_unknown_download_is_ignored(buffer):
+    buffer.update("missing", {"status": "downloading", "progress": 1.0})
+    assert buffer.get("missing") is None
+    assert buffer.flush() == 0
@@ -0,0 +1,79 @@
+import pytest
+from utils.quality_mapper import select_format
+
+
+def video(format_id, height, ext="mp4", tbr=1000, acodec="none"):
+    return {"format_id": format_id, "height": height, "ext": ext, "tbr": tbr,
+            "vcodec": "avc1" if ext == "mp4" else "vp9", "acodec": acodec}
+
+
+def audio(format_id, ext="m4a", abr=128):
+    return {"format_id": format_id, "ext": ext, "abr": abr, "vcodec": "none",
+            "acodec": "mp4a" if ext == "m4a" else "opus"}
+
+
+FORMATS = [
+    audio("140", "m4a", 128),
+    audio("251", "webm", 160),
+    video("18", 360, acodec="mp4a"),
+    video("134", 360, tbr=600),
+    video("243", 360, ext="webm", tbr=500),
+    video("136", 720, tbr=2500),
+    video("247", 720, ext="webm", tbr=2000),
+    video("137", 1080, tbr=4500),
+]
+
+
+def test_exact_quality_prefers_combined_format():
+    selection = select_format(FORMATS, "360p")
+    assert selection["format_spec"] == "18"
+    assert selection["audio_format_id"] is None
+    assert selection["exact"] is True
+
+
+def test_video_only_format_is_paired_with_matching_audio():
+    selection = select_format(FORMATS, "720p")
+    # mp4 video m4a bilan: qayta kodlashsiz birlashadi (webm 251 bitreyti yuqori bo'lsa ham)
+    assert selection["format_spec"] == "136+140"
+    assert selection["quality"] == "720p"
+
+
+def test_webm_video_is_paired_with_webm_audio():
+    formats = [f for f in FORMATS if f["format_id"] not in ("136", "137", "18", "134")]
+    selection = select_format(formats, "720p")
+    assert selection["format_spec"] == "247+251"
+
+
+def test_360p_without_combined_format_returns_split_pair():
+    formats = [f for f in FORMATS if f["format_id"] != "18"]
+    selection = select_format(formats, "360p")
+    # "worst" sifat: bitta sifat ichida mp4 afzal, keyin past bitreyt
+    assert selection["format_spec"] == "134+140"
+    assert selection["exact"] is True
+
+
+def test_missing_quality_falls_back_to_nearest():
+    selection = select_format(FORMATS, "480p")
+    # 360p va 720p bir xil uzoqlikda: pastrog'i tanlanadi
+    assert selection["quality"] == "360p"
+    assert selection["exact"] is False
+
+    selection = select_format(FORMATS, "4K")
+    assert selection["quality"] == "1080p"
+    assert selection["format_spec"] == "137+140"
+
+
+def test_mp3_picks_best_audio_only_format():
+    selection = select_format(FORMATS, "MP3")
+    assert selection["format_spec"] == "251"
+    assert selection["quality"] == "MP3"
+
+
+def test_no_video_formats():
+    assert select_format([audio("140")], "720p") is None
+    assert select_format([video("18", 360, acodec="mp4a")], "MP3") is None
+
+
+def test_unsupported_quality():
+    with pytest.raises(ValueError):
+        select_format(FORMATS, "8K")
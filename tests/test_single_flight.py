@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+import pytest
+from utils.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    """callers ta thread bir vaqtda flight.do(key, fn) chaqiradi: [(natija, xato), ...]"""
+    results = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            outcome = (flight.do(key, fn), None)
+        except Exception as e:
+            outcome = (None, e)
+        with lock:
+            results.append(outcome)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    def extract():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"title": "video"}
+
+    results = run_concurrently(flight, "url", extract, 8)
+
+    assert len(calls) == 1
+    assert results == [({"title": "video"}, None)] * 8
+    assert flight.stats() == {"leader_calls": 1, "coalesced_calls": 7, "leader_errors": 0, "in_flight": 0}
+
+
+def test_leader_error_propagates_to_all_waiters():
+    flight = SingleFlight()
+    error = RuntimeError("Video mavjud emas")
+
+    def extract():
+        time.sleep(0.2)
+        raise error
+
+    results = run_concurrently(flight, "url", extract, 5)
+
+    assert [outcome[1] for outcome in results] == [error] * 5
+    assert flight.stats()["leader_errors"] == 1
+    # Xatodan keyin kalit bo'shaydi: keyingi chaqiruv qayta bajariladi
+    assert flight.do("url", lambda: "ok") == "ok"
+
+
+def test_async_waiters_share_result_and_error():
+    flight = SingleFlight()
+    calls = []
+
+    async def extract(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        if value == "bad":
+            raise ValueError("Noto'g'ri URL")
+        return value.upper()
+
+    async def main():
+        good = await asyncio.gather(*(flight.do_async("a", extract, "good") for _ in range(5)))
+        bad = await asyncio.gather(*(flight.do_async("b", extract, "bad") for _ in range(5)),
+                                   return_exceptions=True)
+        return good, bad
+
+    good, bad = asyncio.run(main())
+
+    assert calls == ["good", "bad"]
+    assert good == ["GOOD"] * 5
+    assert all(isinstance(result, ValueError) for result in bad)
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def extract():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do_async("a", extract))
+        second = asyncio.ensure_future(flight.do_async("a", extract))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_thread_caller_joins_async_leader():
+    flight = SingleFlight()
+
+    async def extract():
+        await asyncio.sleep(0.2)
+        return "shared"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("a", extract))
+        await asyncio.sleep(0.01)
+        follower = await asyncio.to_thread(flight.do, "a", lambda: "own")
+        return await leader, follower
+
+    assert asyncio.run(main()) == ("shared", "shared")
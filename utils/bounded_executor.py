@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Navbat to'lgan, yangi vazifa qabul qilinmaydi"""
+
+
+class BoundedExecutor:
+    """
+    Chegaralangan thread pool:
+    - Ishchilar soni va navbat uzunligi cheklangan
+    - Navbatda kutish va bajarilish vaqtlari o'lchanadi
+    - Async koddan timeout bilan chaqirish mumkin
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        :param name: Pool nomi (thread nomlari va metrikalar uchun)
+        :param max_workers: Bir vaqtda ishlaydigan vazifalar soni
+        :param max_queue: Navbatda kutishi mumkin bo'lgan vazifalar soni
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Vazifani navbatga qo'yish
+
+        :raises QueueFullError: Navbat to'lgan bo'lsa
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"{self.name} navbati to'lgan ({self.max_queue})")
+            self.queued += 1
+            self.submitted += 1
+
+        enqueued_at = time.monotonic()
+
+        def task():
+            started_at = time.monotonic()
+            wait_time = started_at - enqueued_at
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_time_total += wait_time
+                self.wait_time_max = max(self.wait_time_max, wait_time)
+
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.run_time_total += time.monotonic() - started_at
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+        future = self._executor.submit(task)
+
+        def on_done(f: Future):
+            # Boshlanmasdan bekor qilingan vazifa navbatdan chiqadi
+            if f.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+        future.add_done_callback(on_done)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Vazifani event loop ni bloklamasdan bajarish
+
+        :param timeout: Kutish chegarasi (sekundda)
+        :raises asyncio.TimeoutError: Vaqt tugasa
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Navbat chuqurligi va kutish vaqti metrikalari"""
+        with self._lock:
+            started = self.completed + self.failed + self.running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_wait_seconds": round(self.wait_time_total / started, 4) if started else 0.0,
+                "max_wait_seconds": round(self.wait_time_max, 4),
+                "avg_run_seconds": round(self.run_time_total / (self.completed + self.failed), 4)
+                if (self.completed + self.failed) else 0.0,
+            }
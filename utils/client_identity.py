@@ -0,0 +1,46 @@
+import re
+from fastapi import Request
+from slowapi.util import get_remote_address
+
+# config bu modulni limiter uchun import qiladi, shuning uchun config bu yerda funksiya ichida olinadi
+
+API_KEY_HEADER = "X-API-Key"
+CLIENT_ID_HEADER = "X-Client-Id"
+
+_CLIENT_ID_RE = re.compile(r'[^A-Za-z0-9._:-]')
+
+
+def _api_key_client(request: Request):
+    import config
+    key = request.headers.get(API_KEY_HEADER)
+    if key and key in config.API_KEYS:
+        return f"key:{config.API_KEYS[key]}"
+    return None
+
+
+def is_api_key_client(client: str) -> bool:
+    """client_identity() natijasi ma'lum API kalitga tegishlimi"""
+    return client.startswith("key:")
+
+
+def client_identity(request: Request) -> str:
+    """
+    Navbat va kvotalar uchun mijoz: ma'lum API kalit yoki IP, X-Client-Id bo'lsa unga qo'shiladi
+
+    X-Client-Id tekshirilmaydi, shuning uchun u faqat bitta IP (yoki API kalit) ichidagi
+    mijozlarni ajratadi (masalan, bitta serverdan keladigan bot foydalanuvchilari);
+    guruh bo'yicha umumiy kvota client_group() orqali qo'llanadi.
+    """
+    group = _api_key_client(request) or f"ip:{get_remote_address(request)}"
+    header = _CLIENT_ID_RE.sub('', request.headers.get(CLIENT_ID_HEADER, ''))[:64]
+    return f"{group}/{header}" if header else group
+
+
+def client_group(client: str) -> str:
+    """client_identity() natijasining X-Client-Id siz qismi: ip:<manzil> yoki key:<nom>"""
+    return client.split("/", 1)[0]
+
+
+def rate_limit_key(request: Request) -> str:
+    """slowapi kaliti: API kalitli mijozlar alohida, qolganlari IP bo'yicha (X-Client-Id limitni ko'paytirmaydi)"""
+    return _api_key_client(request) or get_remote_address(request)
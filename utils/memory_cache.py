@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class MemoryCache:
+    """
+    Jarayon ichidagi LRU + TTL kesh:
+    - Yozuvlar soni va taxminiy hajm (bayt) bo'yicha chegaralangan
+    - Eng uzoq ishlatilmagan yozuvlar birinchi chiqariladi
+    - Muddati o'tgan yozuvlar o'qishda tashlab yuboriladi
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600):
+        """
+        :param max_entries: Maksimal yozuvlar soni
+        :param max_bytes: Maksimal taxminiy hajm (bayt)
+        :param ttl: Yozuv yashash muddati (sekundda)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # key -> (value, size, timestamp)
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Yozuvni vaqt belgisi bilan olish
+
+        :return: (qiymat, timestamp) yoki None
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, timestamp = entry
+            if time.time() - timestamp > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, timestamp
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: int, timestamp: Optional[float] = None):
+        """
+        Yozuv qo'shish yoki yangilash
+
+        :param size: Qiymatning taxminiy hajmi (bayt)
+        :param timestamp: Qiymat olingan vaqt (TTL shu vaqtdan hisoblanadi)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            # Bitta yozuv butun keshdan katta bo'lsa, saqlamaymiz
+            if size > self.max_bytes:
+                return
+
+            self._data[key] = (value, size, timestamp)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._data))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Kesh hajmini sozlash uchun statistika"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
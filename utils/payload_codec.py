@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Any, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # ixtiyoriy bog'liqlik: bo'lmasa zlib ishlatiladi
+    zstandard = None
+
+import config
+
+logger = logging.getLogger('payload_codec')
+
+# Birinchi bayt - format versiyasi
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+FORMAT_ZSTD_DICT = 0x03
+
+_dict_lock = threading.Lock()
+_zstd_dict = None
+_dict_loaded = False
+
+# Zstd (de)kompressor obyektlari thread-safe emas: har bir thread o'zinikini oladi
+_local = threading.local()
+
+
+def _load_dictionary():
+    """CACHE_ZSTD_DICT_PATH dagi lug'atni bir marta yuklash"""
+    global _zstd_dict, _dict_loaded
+    with _dict_lock:
+        if _dict_loaded:
+            return _zstd_dict
+        _dict_loaded = True
+        if zstandard is None or not os.path.exists(config.CACHE_ZSTD_DICT_PATH):
+            return None
+        try:
+            with open(config.CACHE_ZSTD_DICT_PATH, 'rb') as f:
+                _zstd_dict = zstandard.ZstdCompressionDict(f.read())
+        except Exception as e:
+            logger.error(f"Zstd lug'atini yuklashda xatolik: {str(e)}")
+            _zstd_dict = None
+        return _zstd_dict
+
+
+def _zstd_codec(kind: str, with_dict: bool):
+    """Joriy thread uchun keshlangan zstd kompressor yoki dekompressorni olish"""
+    dictionary = _load_dictionary() if with_dict else None
+    cache_key = (kind, with_dict, id(dictionary))
+    codecs = getattr(_local, 'codecs', None)
+    if codecs is None:
+        codecs = _local.codecs = {}
+
+    codec = codecs.get(cache_key)
+    if codec is None:
+        if kind == 'compress':
+            codec = zstandard.ZstdCompressor(level=config.CACHE_COMPRESSION_LEVEL, dict_data=dictionary)
+        else:
+            codec = zstandard.ZstdDecompressor(dict_data=dictionary)
+        codecs[cache_key] = codec
+    return codec
+
+
+def encode_payload(data: Any) -> Tuple[bytes, int]:
+    """
+    Kesh qiymatini siqilgan blob ko'rinishiga keltirish
+
+    :return: (versiya bayti + siqilgan ixcham JSON, siqilmagan hajm)
+    """
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    if zstandard is not None:
+        if _load_dictionary() is not None:
+            compressed = _zstd_codec('compress', True).compress(raw)
+            return bytes([FORMAT_ZSTD_DICT]) + compressed, len(raw)
+        return bytes([FORMAT_ZSTD]) + _zstd_codec('compress', False).compress(raw), len(raw)
+
+    return bytes([FORMAT_ZLIB]) + zlib.compress(raw, 6), len(raw)
+
+
+def decode_payload(value) -> Tuple[Any, int]:
+    """
+    Kesh qiymatini o'qish: eski JSON matn qatorlar va yangi blob lar
+
+    :return: (ma'lumot, siqilmagan hajm)
+    :raises ValueError: Format noma'lum yoki o'qib bo'lmasa
+    """
+    if isinstance(value, str):
+        return json.loads(value), len(value)
+
+    value = bytes(value)
+    if not value:
+        raise ValueError("Bo'sh kesh qiymati")
+
+    version, body = value[0], value[1:]
+
+    if version == FORMAT_ZLIB:
+        raw = zlib.decompress(body)
+    elif version in (FORMAT_ZSTD, FORMAT_ZSTD_DICT):
+        if zstandard is None:
+            raise ValueError("zstandard o'rnatilmagan")
+        with_dict = version == FORMAT_ZSTD_DICT
+        if with_dict and _load_dictionary() is None:
+            raise ValueError("Zstd lug'ati topilmadi")
+        raw = _zstd_codec('decompress', with_dict).decompress(body)
+    elif version in (ord('{'), ord('[')):
+        # BLOB sifatida saqlangan eski JSON
+        raw = value
+    else:
+        raise ValueError(f"Noma'lum kesh formati: {version}")
+
+    return json.loads(raw), len(raw)
+
+
+def train_dictionary(samples: List[bytes], dict_size: int = 64 * 1024) -> bytes:
+    """
+    Odatiy kesh qiymatlari asosida zstd lug'atini o'rgatish
+
+    :param samples: Siqilmagan JSON namunalar
+    :param dict_size: Lug'at hajmi (bayt)
+    """
+    if zstandard is None:
+        raise RuntimeError("Lug'at o'rgatish uchun zstandard kerak")
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+
+def sample_payloads_from_cache(limit: int = 2000) -> List[bytes]:
+    """Kesh jadvalidan siqilmagan JSON namunalarni olish"""
+    from database.connection import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT data FROM cache ORDER BY last_access DESC LIMIT ?', (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    samples = []
+    for row in rows:
+        try:
+            data, _ = decode_payload(row['data'])
+        except Exception:
+            continue
+        samples.append(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return samples
+
+
+def save_dictionary(dictionary: bytes, path: Optional[str] = None):
+    """
+    Lug'atni faylga yozish
+
+    Diqqat: lug'at almashtirilsa, eski lug'at bilan yozilgan yozuvlar o'qilmaydi
+    va keshdan tushib qolgan deb hisoblanadi.
+    """
+    global _dict_loaded
+    with open(path or config.CACHE_ZSTD_DICT_PATH, 'wb') as f:
+        f.write(dictionary)
+    with _dict_lock:
+        _dict_loaded = False
+
+
+if __name__ == "__main__":
+    # python -m utils.payload_codec - kesh jadvalidan lug'at o'rgatish
+    samples = sample_payloads_from_cache()
+    if len(samples) < 10:
+        print(f"Lug'at uchun namunalar yetarli emas: {len(samples)}")
+    else:
+        save_dictionary(train_dictionary(samples))
+        print(f"Lug'at saqlandi: {config.CACHE_ZSTD_DICT_PATH} ({len(samples)} namuna)")
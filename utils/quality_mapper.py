@@ -1,99 +1,253 @@
-from yt_dlp import YoutubeDL
+import logging
+import re
+from bisect import bisect_left
+from utils.url_canonical import cache_key
+from utils.resolved_info import get_resolved_info_store
+from utils.ydl_pool import get_ydl_pool
+import config
+
+logger = logging.getLogger('quality_mapper')
+
+# Balandlik chegaralari (o'sish tartibida) va ularga mos sifatlar
+_HEIGHT_BOUNDS = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+_HEIGHT_LABELS = ("144p", "240p", "360p", "480p", "720p", "1080p", "2K", "4K")
+
+# format_note / resolution dagi belgilar; bir nechtasi bo'lsa, ro'yxatda birinchisi tanlanadi
+_NOTE_TOKENS = (
+    ("144p", "144p"), ("240p", "240p"), ("360p", "360p"), ("480p", "480p"),
+    ("720p", "720p"), ("1080p", "1080p"), ("1440p", "2K"), ("2k", "2K"),
+    ("2160p", "4K"), ("4k", "4K"),
+)
+_NOTE_PRIORITY = {"144p": 0, "240p": 1, "360p": 2, "480p": 3, "720p": 4, "1080p": 5,
+                  "1440p": 6, "2k": 6, "2160p": 7, "4k": 7}
+_NOTE_LABELS = dict(_NOTE_TOKENS)
+_NOTE_RE = re.compile(r'144p|240p|360p|480p|720p|1080p|1440p|2160p|2[kK]|4[kK]')
+
+# Alohida video/audio oqimli formatlar har qanday birlashgan formatdan keyin turadi
+_SEPARATE_STREAMS_RANK = 1 << 40
+
+QUALITY_ORDER = {
+    "MP3": 0, "144p": 1, "240p": 2, "360p": 3, "480p": 4,
+    "720p": 5, "1080p": 6, "2K": 7, "4K": 8
+}
+
+def _quality_from_text(text):
+    best = None
+    for match in _NOTE_RE.finditer(text):
+        token = match.group(0)
+        token = token.lower() if token[-1] in "kK" else token
+        if best is None or _NOTE_PRIORITY[token] < _NOTE_PRIORITY[best]:
+            best = token
+            if _NOTE_PRIORITY[best] == 0:
+                break
+    return _NOTE_LABELS[best] if best is not None else None
 
 def map_resolution_to_standard(format_data):
-    resolution = format_data.get('resolution')
-    format_note = format_data.get('format_note', '')
-    height = format_data.get('height')
-    
     if format_data.get('vcodec') == 'none' and format_data.get('acodec') != 'none':
         return "MP3"
     
+    height = format_data.get('height')
     if height is not None:
-        if height <= 144:
-            return "144p"
-        elif height <= 240:
-            return "240p"
-        elif height <= 360:
-            return "360p"
-        elif height <= 480:
-            return "480p"
-        elif height <= 720:
-            return "720p"
-        elif height <= 1080:
-            return "1080p"
-        elif height <= 1440:
-            return "2K"
-        elif height <= 2160:
-            return "4K"
+        index = bisect_left(_HEIGHT_BOUNDS, height)
+        if index < len(_HEIGHT_LABELS):
+            return _HEIGHT_LABELS[index]
     
+    format_note = format_data.get('format_note', '')
     if isinstance(format_note, str) and format_note:
-        if '144p' in format_note:
-            return "144p"
-        elif '240p' in format_note:
-            return "240p"
-        elif '360p' in format_note:
-            return "360p"
-        elif '480p' in format_note:
-            return "480p"
-        elif '720p' in format_note:
-            return "720p"
-        elif '1080p' in format_note:
-            return "1080p"
-        elif '1440p' in format_note or '2k' in format_note.lower():
-            return "2K"
-        elif '2160p' in format_note or '4k' in format_note.lower():
-            return "4K"
+        quality = _quality_from_text(format_note)
+        if quality is not None:
+            return quality
     
+    resolution = format_data.get('resolution')
     if isinstance(resolution, str) and resolution:
-        if '144p' in resolution:
-            return "144p"
-        elif '240p' in resolution:
-            return "240p"
-        elif '360p' in resolution:
-            return "360p"
-        elif '480p' in resolution:
-            return "480p"
-        elif '720p' in resolution:
-            return "720p"
-        elif '1080p' in resolution:
-            return "1080p"
-        elif '1440p' in resolution or '2k' in resolution.lower():
-            return "2K"
-        elif '2160p' in resolution or '4k' in resolution.lower():
-            return "4K"
+        return _quality_from_text(resolution)
     return None
 
-def get_best_format_for_quality(url: str, quality: str):
-    quality_format_map = {
-        "144p": "worst[height<=144]",
-        "240p": "worst[height<=240][height>144]",
-        "360p": "worst[height<=360][height>240]",
-        "480p": "worst[height<=480][height>360]",
-        "720p": "best[height<=720][height>480]",
-        "1080p": "best[height<=1080][height>720]",
-        "2K": "best[height<=1440][height>1080]",
-        "4K": "best[height<=2160][height>1440]",
-        "MP3": "bestaudio/best"
-    }
+def _estimate_filesize(format_data, duration):
+    filesize = format_data.get("filesize")
     
-    if quality not in quality_format_map:
+    if filesize is None:
+        filesize = format_data.get("file_size")
+    if filesize is None:
+        filesize = format_data.get("filesize_approx")
+    
+    if filesize is None and duration and format_data.get("tbr"):
+        filesize = int((format_data.get("tbr", 0) * duration * 1000) / 8)
+    
+    return filesize
+
+def build_quality_formats(formats, duration=None):
+    """
+    Har bir sifat uchun eng yaxshi formatni bitta o'tishda tanlash
+    
+    Tanlov: avval audio+video birga bo'lgan, keyin eng baland format;
+    teng bo'lsa ro'yxatda oldin kelgani.
+    
+    :param formats: yt-dlp info['formats']
+    :param duration: Video davomiyligi (hajmni taxmin qilish uchun)
+    :return: QUALITY_ORDER bo'yicha tartiblangan formatlar ro'yxati
+    """
+    best = {}
+    max_height = _HEIGHT_BOUNDS[-1]
+    for format_data in formats:
+        get = format_data.get
+        vcodec = get("vcodec")
+        acodec = get("acodec")
+        height = get("height")
+        
+        # Tez yo'l: audio yoki balandligi ma'lum video; qolganlari to'liq tekshiruvdan o'tadi
+        if vcodec == 'none' and acodec != 'none':
+            quality = "MP3"
+        elif height is not None and height <= max_height:
+            quality = _HEIGHT_LABELS[bisect_left(_HEIGHT_BOUNDS, height)]
+        else:
+            quality = map_resolution_to_standard(format_data)
+            if quality is None:
+                continue
+        
+        # (audio+video birga, balandlik) juftligini bitta songa keltirish: kichigi yaxshi
+        rank = (0 if acodec != "none" and vcodec != "none" else _SEPARATE_STREAMS_RANK) - (height or 0)
+        current = best.get(quality)
+        if current is None or rank < current[0]:
+            best[quality] = (rank, format_data)
+    
+    result = []
+    for quality in sorted(best, key=lambda q: QUALITY_ORDER.get(q, 999)):
+        format_data = best[quality][1]
+        result.append({
+            "format_id": format_data.get("format_id"),
+            "quality": quality,
+            "ext": format_data.get("ext", ""),
+            "filesize": _estimate_filesize(format_data, duration)
+        })
+    return result
+
+# Offline tanlov uchun saqlanadigan format maydonlari (imzolangan URL larsiz)
+_COMPACT_FORMAT_FIELDS = (
+    "format_id", "ext", "height", "width", "fps", "vcodec", "acodec", "tbr", "abr", "vbr",
+    "filesize", "filesize_approx", "format_note", "resolution", "protocol", "dynamic_range",
+)
+
+# Sifat ichida qaysi formatni afzal ko'rish: QUALITY_FORMAT_MAP dagi "worst"/"best"
+_QUALITY_PREFERENCE = {
+    quality: "worst" if selector.startswith("worst") else "best"
+    for quality, selector in config.QUALITY_FORMAT_MAP.items()
+}
+
+_VIDEO_QUALITIES = [q for q in config.SUPPORTED_QUALITIES if q != "MP3"]
+
+# Video konteyneriga mos audio kengaytmalari (birlashtirishda qayta kodlashsiz)
+_AUDIO_EXT_FOR_VIDEO = {"mp4": ("m4a", "mp4"), "webm": ("webm",)}
+
+def compact_formats(formats):
+    """Format ro'yxatini offline tanlov uchun ixcham ko'rinishda saqlash"""
+    return [
+        {field: format_data[field] for field in _COMPACT_FORMAT_FIELDS if format_data.get(field) is not None}
+        for format_data in formats
+        if format_data.get("format_id")
+    ]
+
+def _bitrate(format_data):
+    return format_data.get("tbr") or format_data.get("abr") or format_data.get("vbr") or 0
+
+def _has_audio(format_data):
+    return format_data.get("acodec") not in (None, "none")
+
+def _has_video(format_data):
+    return format_data.get("vcodec") not in (None, "none")
+
+def _best_audio(formats, video_ext=None):
+    audio_only = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    if not audio_only:
+        return None
+    
+    preferred_exts = _AUDIO_EXT_FOR_VIDEO.get(video_ext, ())
+    return max(audio_only, key=lambda f: (f.get("ext") in preferred_exts, _bitrate(f)))
+
+def select_format(formats, quality):
+    """
+    Saqlangan format ro'yxatidan tarmoqsiz format tanlash
+    
+    Sifat ichida audio+video birga bo'lgan format afzal, keyin eng baland, keyin mp4
+    (m4a audio bilan qayta kodlashsiz birlashadi); bitreyt bo'yicha QUALITY_FORMAT_MAP
+    dagi best/worst ga qarab tanlanadi.
+    Aniq sifat bo'lmasa, eng yaqin mavjud sifat qaytariladi.
+    
+    :return: {"format_id", "audio_format_id", "format_spec", "quality", "exact"} yoki None
+    """
+    if quality not in _QUALITY_PREFERENCE:
         raise ValueError(f"Unsupported quality: {quality}")
     
-    format_selector = quality_format_map[quality]
+    if quality == "MP3":
+        audio = _best_audio(formats)
+        if audio is None:
+            return None
+        return {
+            "format_id": audio["format_id"],
+            "audio_format_id": None,
+            "format_spec": audio["format_id"],
+            "quality": "MP3",
+            "exact": True
+        }
     
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'format': format_selector,
+    buckets = {}
+    for format_data in formats:
+        if not _has_video(format_data):
+            continue
+        bucket = map_resolution_to_standard(format_data)
+        if bucket in _QUALITY_PREFERENCE and bucket != "MP3":
+            buckets.setdefault(bucket, []).append(format_data)
+    
+    if not buckets:
+        return None
+    
+    # Eng yaqin sifat: indeks farqi kichigi, teng bo'lsa pastrog'i
+    target = _VIDEO_QUALITIES.index(quality)
+    chosen_quality = min(
+        buckets,
+        key=lambda q: (abs(_VIDEO_QUALITIES.index(q) - target), _VIDEO_QUALITIES.index(q))
+    )
+    
+    direction = 1 if _QUALITY_PREFERENCE[chosen_quality] == "best" else -1
+    video = min(
+        buckets[chosen_quality],
+        key=lambda f: (0 if _has_audio(f) else 1, -(f.get("height") or 0), f.get("ext") != "mp4",
+                       -direction * _bitrate(f))
+    )
+    
+    audio = None if _has_audio(video) else _best_audio(formats, video.get("ext"))
+    format_spec = video["format_id"] if audio is None else f"{video['format_id']}+{audio['format_id']}"
+    
+    return {
+        "format_id": video["format_id"],
+        "audio_format_id": audio["format_id"] if audio else None,
+        "format_spec": format_spec,
+        "quality": chosen_quality,
+        "exact": chosen_quality == quality
     }
+
+def get_best_format_for_quality(url: str, quality: str):
+    if quality not in config.QUALITY_FORMAT_MAP:
+        raise ValueError(f"Unsupported quality: {quality}")
+    
+    format_selector = config.QUALITY_FORMAT_MAP[quality]
+    
+    video_key = cache_key(url)
+    store = get_resolved_info_store()
+    resolved = store.get(video_key)
     
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        with get_ydl_pool().checkout("probe", format=format_selector) as ydl:
+            if resolved is not None:
+                # Oldingi extract_info natijasidan tarmoqsiz format tanlash
+                info = ydl.process_ie_result(resolved, download=False)
+            else:
+                info = ydl.extract_info(url, download=False)
+                store.put(video_key, ydl.sanitize_info(info, True))
             if 'format_id' in info:
                 return info['format_id']
             else:
                 return None
     except Exception as e:
-        print(f"Error getting format for quality {quality}: {str(e)}")
+        logger.warning(f"{quality} sifat formatini aniqlab bo'lmadi: {url}, Xatolik: {str(e)}")
         return None
\ No newline at end of file
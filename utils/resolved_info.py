@@ -0,0 +1,134 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import config
+
+# googlevideo havolalaridagi imzo muddati: ?expire=1700000000 yoki /expire/1700000000/
+_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d{9,11})')
+
+# Yuklash uchun kerak bo'lmagan va xotirani ko'p egallaydigan maydonlar
+_DROP_KEYS = ('automatic_captions', 'subtitles', 'heatmap')
+
+
+def signed_url_expiry(info: dict) -> Optional[float]:
+    """Formatlar ichidagi eng yaqin imzo muddatini topish (unix vaqt)"""
+    expiry = None
+    for format_data in info.get('formats') or []:
+        for field in ('url', 'manifest_url', 'fragment_base_url'):
+            value = format_data.get(field)
+            if not isinstance(value, str):
+                continue
+            match = _EXPIRE_RE.search(value)
+            if match:
+                expires_at = float(match.group(1))
+                expiry = expires_at if expiry is None else min(expiry, expires_at)
+    return expiry
+
+
+class ResolvedInfoStore:
+    """
+    yt-dlp natijasini (info dict) qisqa muddat saqlash:
+    - Info, format tanlash va yuklash uchun bitta extract_info yetadi
+    - Muddat imzolangan stream URL lar amal qilish muddatiga bog'liq
+    - Kalit (video kaliti, chiqish proxysi): URL lar IP ga bog'langan bo'ladi
+    """
+
+    def __init__(self, max_entries: int = config.RESOLVED_INFO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (video_key, proxy) -> (info, expires_at)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.expired = 0
+
+    def _expires_at(self, info: dict) -> float:
+        now = time.time()
+        default = now + config.RESOLVED_INFO_DEFAULT_TTL
+        expiry = signed_url_expiry(info)
+        if expiry is None:
+            return default
+        return min(expiry - config.RESOLVED_INFO_SAFETY_MARGIN, now + config.RESOLVED_INFO_MAX_TTL)
+
+    def put(self, video_key: str, info: dict, proxy: Optional[str] = None):
+        """
+        Natijani saqlash
+
+        :param info: sanitize_info(..., remove_private_keys=True) qilingan info dict
+        :param proxy: extract_info bajarilgan proxy (None - to'g'ridan-to'g'ri)
+        """
+        if not info or info.get('_type', 'video') != 'video':
+            return
+
+        expires_at = self._expires_at(info)
+        if expires_at <= time.time():
+            return
+
+        info = {k: v for k, v in info.items() if k not in _DROP_KEYS}
+        key = (video_key, proxy or "")
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (info, expires_at)
+            self.stores += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, video_key: str, proxy: Optional[str] = None) -> Optional[dict]:
+        """
+        Saqlangan natijaning nusxasini olish (yt-dlp info dict ni o'zgartiradi)
+
+        :return: info dict yoki None
+        """
+        key = (video_key, proxy or "")
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            info, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+        return copy.deepcopy(info)
+
+    def discard(self, video_key: str, proxy: Optional[str] = None):
+        with self._lock:
+            self._data.pop((video_key, proxy or ""), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "expired": self.expired,
+            }
+
+
+# Singleton instance
+_resolved_info_store = None
+
+def get_resolved_info_store() -> ResolvedInfoStore:
+    """ResolvedInfoStore singleton olish"""
+    global _resolved_info_store
+
+    if _resolved_info_store is None:
+        _resolved_info_store = ResolvedInfoStore()
+
+    return _resolved_info_store
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """Bajarilayotgan bitta chaqiruv holati"""
+
+    def __init__(self):
+        # Thread (do) va asyncio (do_async) kutuvchilar uchun umumiy natija
+        self.future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Bir xil kalit bo'yicha parallel chaqiruvlarni birlashtirish:
+    - Birinchi chaqiruvchi (leader) funksiyani bajaradi
+    - Qolganlar uning natijasini yoki xatosini kutib olishadi
+    - do() va do_async() bir xil kalitlar bo'yicha o'zaro birlashadi
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leader_calls = 0
+        self.coalesced_calls = 0
+        self.leader_errors = 0
+
+    def _join(self, key: Hashable):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced_calls += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leader_calls += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+            if error is not None:
+                self.leader_errors += 1
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Funksiyani kalit bo'yicha bir marta bajarish
+
+        :param key: Birlashtirish kaliti (masalan, URL)
+        :param fn: Bajariladigan funksiya
+        :return: Funksiya natijasi (barcha kutayotganlar uchun bir xil)
+        """
+        call, is_leader = self._join(key)
+        if not is_leader:
+            return call.future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        do() ning asyncio varianti: leader fn (coroutine) ni vazifa sifatida ishga tushiradi,
+        kutayotganlar thread egallamasdan natijani await qiladi
+
+        Chaqiruvchi bekor qilinsa (mijoz uzildi), umumiy vazifa boshqalar uchun davom etadi.
+        """
+        call, is_leader = self._join(key)
+        if is_leader:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done: self._finish_task(key, call, done))
+        return await asyncio.shield(asyncio.wrap_future(call.future))
+
+    def _finish_task(self, key: Hashable, call: _Call, task: asyncio.Future):
+        if task.cancelled():
+            self._finish(key, call, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._finish(key, call, error=task.exception())
+        else:
+            self._finish(key, call, task.result())
+
+    def in_flight(self) -> int:
+        """Hozir bajarilayotgan chaqiruvlar soni"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Leader va birlashtirilgan chaqiruvlar hisoblagichlari"""
+        with self._lock:
+            return {
+                "leader_calls": self.leader_calls,
+                "coalesced_calls": self.coalesced_calls,
+                "leader_errors": self.leader_errors,
+                "in_flight": len(self._calls),
+            }
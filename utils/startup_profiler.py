@@ -0,0 +1,191 @@
+import importlib.machinery
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('startup')
+
+# Faqat har bir fayl uchun alohida yaratiladigan loaderlar o'lchanadi
+_TIMED_LOADERS = (importlib.machinery.SourceFileLoader,
+                  importlib.machinery.SourcelessFileLoader,
+                  importlib.machinery.ExtensionFileLoader)
+
+
+class StartupProfiler:
+    """
+    Ishga tushish vaqtini o'lchash:
+    - sys.meta_path orqali har bir modul importining o'z va umumiy vaqti
+    - Lifespan bosqichlari (bazani ochish, qizdirish va h.k.)
+    - Umumiy vaqtni byudjet bilan solishtirish
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.budget = None
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._installed = False
+        # modul nomi -> (o'z vaqti, umumiy vaqti)
+        self._imports: Dict[str, tuple] = {}
+        self._phases: Dict[str, float] = {}
+
+    # --- importlib meta path finder ---
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, 'searching', False):
+            return None
+
+        self._local.searching = True
+        try:
+            spec = None
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self._local.searching = False
+
+        if spec is not None and isinstance(spec.loader, _TIMED_LOADERS):
+            self._wrap_loader(fullname, spec.loader)
+        return spec
+
+    def _wrap_loader(self, fullname: str, loader):
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            stack = self._stack()
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self._imports[fullname] = (elapsed - children, elapsed)
+
+        loader.exec_module = timed_exec_module
+
+    def _stack(self) -> List[float]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def install(self):
+        """Import o'lchashni yoqish (boshqa importlardan oldin chaqiriladi)"""
+        if not self._installed:
+            sys.meta_path.insert(0, self)
+            self._installed = True
+
+    def uninstall(self):
+        if self._installed:
+            try:
+                sys.meta_path.remove(self)
+            except ValueError:
+                pass
+            self._installed = False
+
+    # --- bosqichlar ---
+
+    @contextmanager
+    def phase(self, name: str):
+        """Ishga tushish bosqichi vaqtini o'lchash"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] = time.perf_counter() - started
+
+    def finish(self, budget: Optional[float] = None) -> dict:
+        """
+        O'lchashni yakunlash va hisobotni logga yozish
+
+        :param budget: Ruxsat etilgan ishga tushish vaqti (sekundda)
+        """
+        self.uninstall()
+        self.finished = time.perf_counter()
+        self.budget = budget
+
+        report = self.report()
+        slowest = ", ".join(f"{item['module']} {item['self_ms']} ms" for item in report["imports"]["slowest"][:5])
+        message = (f"Ishga tushish: {report['total_ms']} ms (importlar {report['imports']['total_ms']} ms, "
+                   f"{report['imports']['modules']} modul); eng sekin: {slowest}")
+        if report["within_budget"] is False:
+            logger.warning(f"{message}; byudjet {report['budget_ms']} ms dan oshdi")
+        else:
+            logger.info(message)
+        return report
+
+    def report(self, top: int = 20) -> dict:
+        """Importlar (o'z vaqti bo'yicha eng sekinlari) va bosqichlar hisoboti"""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        with self._lock:
+            imports = dict(self._imports)
+            phases = dict(self._phases)
+
+        total = end - self.started
+        # Eng yuqori darajadagi importlar yig'indisi (ichma-ich importlar ikki marta sanalmaydi)
+        imports_total = sum(own for own, _ in imports.values())
+        slowest = sorted(imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+
+        return {
+            "total_ms": round(total * 1000, 1),
+            "budget_ms": round(self.budget * 1000, 1) if self.budget is not None else None,
+            "within_budget": total <= self.budget if self.budget is not None else None,
+            "imports": {
+                "modules": len(imports),
+                "total_ms": round(imports_total * 1000, 1),
+                "slowest": [
+                    {"module": name, "self_ms": round(own * 1000, 2), "total_ms": round(cumulative * 1000, 2)}
+                    for name, (own, cumulative) in slowest
+                ],
+            },
+            "phases": {name: round(elapsed * 1000, 1) for name, elapsed in phases.items()},
+        }
+
+
+# Singleton instance
+_startup_profiler = None
+
+def get_startup_profiler() -> StartupProfiler:
+    """StartupProfiler singleton olish"""
+    global _startup_profiler
+
+    if _startup_profiler is None:
+        _startup_profiler = StartupProfiler()
+
+    return _startup_profiler
+
+
+if __name__ == "__main__":
+    # python -m utils.startup_profiler - sovuq ishga tushishni o'lchash (CI uchun)
+    import asyncio
+    import json
+
+    # main bilan bir xil singleton bo'lishi uchun modul nomi orqali olinadi
+    from utils import startup_profiler
+
+    profiler = startup_profiler.get_startup_profiler()
+    profiler.install()
+
+    import main
+
+    async def _startup():
+        async with main.lifespan(main.app):
+            pass
+
+    asyncio.run(_startup())
+    result = profiler.report()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    sys.exit(0 if result["within_budget"] is not False else 1)
@@ -0,0 +1,124 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# YouTube video ID: 11 ta belgi
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+_YOUTUBE_HOSTS = {"youtube.com", "youtube-nocookie.com"}
+_HOST_PREFIXES = ("www.", "m.", "music.")
+
+# youtube.com/<segment>/<id> ko'rinishidagi yo'llar
+_PATH_ID_SEGMENTS = {"shorts", "embed", "v", "e", "live"}
+
+# youtube.com/<segment>/<nom> ko'rinishidagi kanal yo'llari
+_CHANNEL_SEGMENTS = {"channel", "c", "user"}
+_PLAYLIST_ID_RE = re.compile(r'^[0-9A-Za-z_-]{2,64}$')
+
+
+def _parse(url: str):
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None, None, []
+
+    host = _normalize_host(parsed.hostname or "")
+    segments = [s for s in parsed.path.split("/") if s]
+    return parsed, host, segments
+
+
+def _normalize_host(host: str) -> str:
+    host = host.lower()
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+
+def canonicalize_url(url: str) -> Optional[Tuple[str, str]]:
+    """
+    URL ni (extractor, video_id) juftligiga keltirish
+
+    youtu.be/X, youtube.com/watch?v=X&t=30s, m.youtube.com/watch?v=X&si=...,
+    youtube.com/shorts/X va embed havolalari bir xil kalitga tushadi.
+
+    :param url: Foydalanuvchi yuborgan URL
+    :return: ("youtube", video_id) yoki None (tanilmagan URL)
+    """
+    parsed, host, segments = _parse(url)
+    if parsed is None:
+        return None
+
+    video_id = None
+
+    if host == "youtu.be":
+        if segments:
+            video_id = segments[0]
+    elif host in _YOUTUBE_HOSTS:
+        if segments and segments[0] == "watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(segments) >= 2 and segments[0] in _PATH_ID_SEGMENTS:
+            video_id = segments[1]
+
+    if video_id and _VIDEO_ID_RE.match(video_id):
+        return "youtube", video_id
+
+    return None
+
+
+def cache_key(url: str) -> str:
+    """
+    Kesh va yuklashlar uchun kalit: "youtube:<video_id>"
+
+    Tanilmagan URL lar o'zgarishsiz qaytariladi.
+    """
+    key = canonicalize_url(url)
+    if key is None:
+        return url
+    return f"{key[0]}:{key[1]}"
+
+
+def canonical_url(url: str) -> str:
+    """
+    yt-dlp ga beriladigan toza URL (t, si, list kabi parametrlarsiz)
+    """
+    key = canonicalize_url(url)
+    if key is None:
+        return url
+    return f"https://www.youtube.com/watch?v={key[1]}"
+
+
+def canonicalize_collection(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Playlist yoki kanal URL ini (tur, id) juftligiga keltirish
+
+    :return: ("youtube_playlist", list_id), ("youtube_channel", "@nom") yoki None
+    """
+    parsed, host, segments = _parse(url)
+    if parsed is None or host not in _YOUTUBE_HOSTS or not segments:
+        return None
+
+    if segments[0] == "playlist":
+        list_id = parse_qs(parsed.query).get("list", [None])[0]
+        if list_id and _PLAYLIST_ID_RE.match(list_id):
+            return "youtube_playlist", list_id
+        return None
+
+    if segments[0].startswith("@"):
+        return "youtube_channel", segments[0]
+
+    if len(segments) >= 2 and segments[0] in _CHANNEL_SEGMENTS:
+        return "youtube_channel", f"{segments[0]}/{segments[1]}"
+
+    return None
+
+
+def collection_url(kind: str, collection_id: str) -> str:
+    """yt-dlp ga beriladigan playlist yoki kanal (videolar bo'limi) URL i"""
+    if kind == "youtube_playlist":
+        return f"https://www.youtube.com/playlist?list={collection_id}"
+    return f"https://www.youtube.com/{collection_id}/videos"
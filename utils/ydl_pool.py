@@ -0,0 +1,275 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import YoutubeDLError
+
+import config
+
+logger = logging.getLogger('ydl_pool')
+
+_DOWNLOAD_OPTS = {
+    'quiet': False,
+    'no_warnings': False,
+    'cookiefile': 'youtube.com_cookies.txt',
+    # Uzilgan yuklash .part fayldagi baytdan davom etadi
+    'continuedl': True,
+    'nopart': False,
+}
+
+# Profil - YoutubeDL qurilayotganda beriladigan o'zgarmas sozlamalar
+PROFILES = {
+    "info": {
+        'quiet': True,
+        'no_warnings': True,
+        'writeinfojson': True,
+        'skip_download': True,
+    },
+    "probe": {
+        'quiet': True,
+        'no_warnings': True,
+    },
+    "playlist": {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+    },
+    # Faqat tarmoqdan yuklash: birlashtirish va o'girish services.download_pipeline da
+    "download": dict(_DOWNLOAD_OPTS),
+}
+
+
+class _PooledInstance:
+    def __init__(self, ydl: YoutubeDL):
+        self.ydl = ydl
+        # Qurilgandan keyingi holat: har qaytarishda shunga tiklanadi
+        self.params = copy.deepcopy(ydl.params)
+        self.format_selector = ydl.format_selector
+        self.returned_at = time.monotonic()
+
+
+class YdlPool:
+    """
+    Tayyor YoutubeDL obyektlari havzasi:
+    - Kalit (profil, proxy): extractorlar, cookie fayli va tarmoq sozlamalari bir marta quriladi
+    - checkout() vaqtida format, chiqish shabloni va progress hooklar beriladi
+    - Qaytarishda holat tiklanadi, ortiqcha obyektlar yopiladi
+    """
+
+    def __init__(self, max_idle_per_key: int = config.YDL_POOL_MAX_IDLE_PER_KEY,
+                 max_idle: int = config.YDL_POOL_MAX_IDLE):
+        """
+        :param max_idle_per_key: Bitta (profil, proxy) uchun saqlanadigan bo'sh obyektlar
+        :param max_idle: Jami saqlanadigan bo'sh obyektlar
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self.max_idle = max_idle
+
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[tuple, List[_PooledInstance]]" = OrderedDict()
+        self._idle_count = 0
+        self.in_use = 0
+
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.evicted = 0
+        self.construct_time_total = 0.0
+
+    def _build(self, profile: str, proxy: str) -> _PooledInstance:
+        params = copy.deepcopy(PROFILES[profile])
+        if proxy:
+            params['proxy'] = proxy
+
+        started = time.perf_counter()
+        ydl = YoutubeDL(params)
+        # Lazy qismlar ham oldindan: cookie fayli va HTTP handlerlar
+        ydl.cookiejar
+        ydl._request_director
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.created += 1
+            self.construct_time_total += elapsed
+        return _PooledInstance(ydl)
+
+    def _acquire(self, key: tuple) -> _PooledInstance:
+        with self._lock:
+            instances = self._idle.get(key)
+            if instances:
+                instance = instances.pop()
+                self._idle_count -= 1
+                if not instances:
+                    del self._idle[key]
+                self.reused += 1
+                self.in_use += 1
+                return instance
+            self.in_use += 1
+
+        try:
+            return self._build(*key)
+        except Exception:
+            with self._lock:
+                self.in_use -= 1
+            raise
+
+    def _reset(self, instance: _PooledInstance):
+        ydl = instance.ydl
+        if ydl.params.get('cookiefile'):
+            ydl.save_cookies()
+
+        ydl.params.clear()
+        ydl.params.update(copy.deepcopy(instance.params))
+        ydl.format_selector = instance.format_selector
+        ydl._progress_hooks.clear()
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._num_videos = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+        ydl._printed_messages.clear()
+
+    def _release(self, key: tuple, instance: _PooledInstance, healthy: bool):
+        to_close = []
+        if healthy:
+            try:
+                self._reset(instance)
+            except Exception as e:
+                logger.warning(f"YoutubeDL holatini tiklab bo'lmadi: {str(e)}")
+                healthy = False
+
+        with self._lock:
+            self.in_use -= 1
+            instances = self._idle.setdefault(key, [])
+            if not healthy or len(instances) >= self.max_idle_per_key:
+                if not instances:
+                    del self._idle[key]
+                self.discarded += 1
+                to_close.append(instance)
+            else:
+                instance.returned_at = time.monotonic()
+                instances.append(instance)
+                self._idle.move_to_end(key)
+                self._idle_count += 1
+
+                # Eng uzoq ishlatilmagan kalitdan boshlab chiqarish
+                while self._idle_count > self.max_idle:
+                    oldest_key, oldest = next(iter(self._idle.items()))
+                    to_close.append(oldest.pop(0))
+                    self._idle_count -= 1
+                    self.evicted += 1
+                    if not oldest:
+                        del self._idle[oldest_key]
+
+        for old in to_close:
+            self._close(old)
+
+    @staticmethod
+    def _close(instance: _PooledInstance):
+        try:
+            instance.ydl.close()
+        except Exception as e:
+            logger.warning(f"YoutubeDL ni yopishda xatolik: {str(e)}")
+
+    @contextmanager
+    def checkout(self, profile: str, proxy: Optional[str] = None, format: Optional[str] = None,
+                 progress_hooks: Iterable[Callable] = (), **params) -> Iterator[YoutubeDL]:
+        """
+        Havzadan YoutubeDL olish (with bloki tugagach qaytariladi)
+
+        :param profile: PROFILES dagi profil nomi
+        :param proxy: Chiqish proxysi (kalitning bir qismi)
+        :param format: Shu so'rov uchun format selektori
+        :param progress_hooks: Shu so'rov uchun progress hooklar
+        :param params: Qo'shimcha sozlamalar (outtmpl, playliststart, ...)
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Noma'lum YoutubeDL profili: {profile}")
+
+        key = (profile, proxy or "")
+        instance = self._acquire(key)
+        healthy = True
+        try:
+            ydl = instance.ydl
+            if params:
+                ydl.params.update(params)
+                if 'outtmpl' in params:
+                    ydl._parse_outtmpl()
+            if format is not None:
+                ydl.params['format'] = format
+                ydl.format_selector = ydl.build_format_selector(format)
+            for hook in progress_hooks:
+                ydl.add_progress_hook(hook)
+            yield ydl
+        except YoutubeDLError:
+            # Oddiy yuklab olish/extract xatolari obyekt holatini buzmaydi
+            raise
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            self._release(key, instance, healthy)
+
+    def prewarm(self, profile: str, proxy: Optional[str] = None, count: int = 1,
+                extractors: Iterable[str] = ()) -> int:
+        """
+        Havzani oldindan to'ldirish
+
+        :param extractors: Har bir obyektda oldindan yaratiladigan extractorlar (masalan, "Youtube")
+        :return: Qurilgan obyektlar soni
+        """
+        key = (profile, proxy or "")
+        built = 0
+        for _ in range(count):
+            with self._lock:
+                if len(self._idle.get(key, ())) >= self.max_idle_per_key:
+                    break
+                self.in_use += 1
+            try:
+                instance = self._build(*key)
+            except Exception:
+                with self._lock:
+                    self.in_use -= 1
+                raise
+            for ie_key in extractors:
+                instance.ydl.get_info_extractor(ie_key)
+            self._release(key, instance, True)
+            built += 1
+        return built
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            avg_construct = self.construct_time_total / self.created if self.created else 0.0
+            return {
+                "idle": self._idle_count,
+                "in_use": self.in_use,
+                "max_idle": self.max_idle,
+                "max_idle_per_key": self.max_idle_per_key,
+                "keys": {f"{profile}|{proxy or '-'}": len(items) for (profile, proxy), items in self._idle.items()},
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "evicted": self.evicted,
+                "avg_construct_ms": round(avg_construct * 1000, 2),
+                # Qayta ishlatilgan har bir obyekt bitta qurilishni tejaydi
+                "saved_seconds": round(self.reused * avg_construct, 3),
+            }
+
+
+# Singleton instance
+_ydl_pool = None
+
+def get_ydl_pool() -> YdlPool:
+    """YdlPool singleton olish"""
+    global _ydl_pool
+
+    if _ydl_pool is None:
+        _ydl_pool = YdlPool()
+
+    return _ydl_pool